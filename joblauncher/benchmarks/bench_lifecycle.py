@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Launch-lifecycle benchmark of the client against the local JobManager stand-in.
+
+For each concurrency level, launches that many jobs at the same time, then keeps polling their
+status, and reports the latency of every lifecycle step together with the launches and status
+polls per second the client sustains.
+
+    python benchmarks/bench_lifecycle.py --levels 1,10,100,1000
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+# Runs from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.utils import parallel_map
+
+STEPS = ('session_create', 'session_schedule', 'session_status', 'launch', 'job_status', 'session_delete')
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timed(function, samples, lock):
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with lock:
+                samples.append(time.time() - start)
+    return wrapper
+
+
+def run_level(launcher, concurrency, poll_duration):
+    samples = dict((step, []) for step in STEPS)
+    lock = threading.Lock()
+
+    def launch(_):
+        job = launcher.spawn()
+        for step in ('session_create', 'session_schedule', 'session_status', 'session_delete'):
+            setattr(job, step, timed(getattr(job, step), samples[step], lock))
+        job.launched_job_url = timed(job.resource_url, samples['launch'], lock)()
+        return job
+
+    start = time.time()
+    jobs = parallel_map(launch, list(range(concurrency)), concurrency)
+    launch_wall = time.time() - start
+
+    def poll(job):
+        polls = 0
+        get_status = timed(job.get_single_job_status, samples['job_status'], lock)
+        expiry = time.time() + poll_duration
+        while time.time() < expiry:
+            get_status()
+            polls += 1
+        return polls
+
+    start = time.time()
+    polls = sum(parallel_map(poll, jobs, concurrency))
+    poll_wall = time.time() - start
+
+    parallel_map(lambda job: job.session_delete(), jobs, concurrency)
+
+    return {
+        'concurrency': concurrency,
+        'launches_per_second': concurrency / launch_wall,
+        'status_polls_per_second': polls / poll_wall,
+        'latency': dict((step, {'count': len(values),
+                                'p50': percentile(values, .5),
+                                'p95': percentile(values, .95),
+                                'p99': percentile(values, .99),
+                                'max': max(values) if values else float('nan')})
+                        for step, values in samples.items()),
+    }
+
+
+def print_report(result):
+    print('\n%d concurrent jobs: %.1f launches/s, %.1f status polls/s' % (
+        result['concurrency'], result['launches_per_second'], result['status_polls_per_second']))
+    print('  %-18s %8s %10s %10s %10s %10s' % ('step', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for step in STEPS:
+        latency = result['latency'][step]
+        print('  %-18s %8d %10.2f %10.2f %10.2f %10.2f' % (
+            step, latency['count'], 1000 * latency['p50'], 1000 * latency['p95'],
+            1000 * latency['p99'], 1000 * latency['max']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', default='1,10,100,1000', help='comma-separated concurrency levels')
+    parser.add_argument('--scheduling-delay', type=float, default=.05, help='seconds spent queued')
+    parser.add_argument('--starting-delay', type=float, default=.02, help='seconds spent starting')
+    parser.add_argument('--job-duration', type=float, default=60, help='seconds a job takes to complete')
+    parser.add_argument('--poll-duration', type=float, default=2, help='seconds of status polling per level')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    with FakeJobManager(scheduling_delay=args.scheduling_delay, starting_delay=args.starting_delay,
+                        job_duration=args.job_duration) as fake:
+        launcher = joblauncher.JobLauncher(service_url=fake.url,
+                                           wait_policy=WaitPolicy(initial_interval=.01, max_interval=.1))
+        for level in args.levels.split(','):
+            result = run_level(launcher, int(level), args.poll_duration)
+            results.append(result)
+            if not args.json:
+                print_report(result)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Startup benchmark of the command line interface.
+
+Runs the interpreter alone, the import of the package and the list, status and cancel commands
+in fresh processes, the way cron jobs and shell wrappers call them, and reports their wall time.
+Commands sending requests talk to the local JobManager stand-in. Exits with status 1 when the
+median of a command exceeds the one of the interpreter alone by more than the budget.
+
+    python benchmarks/bench_startup.py --repeat 20 --budget 100
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Milliseconds the median of every command may exceed the one of the interpreter alone by
+BUDGET = 100
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Runs from a checkout without installing the package
+sys.path.insert(0, ROOT)
+
+from joblauncher.fake_server import FakeJobManager
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(argv):
+    start = time.time()
+    subprocess.check_call([sys.executable] + argv, cwd=ROOT, stdout=open(os.devnull, 'w'),
+                          stderr=open(os.devnull, 'w'))
+    return time.time() - start
+
+
+def cli(url, registry, *argv):
+    return ['-m', 'joblauncher', '--url', url, '--registry', registry, '--json'] + list(argv)
+
+
+def launch(url, registry):
+    output = subprocess.check_output([sys.executable] + cli(url, registry, 'launch', 'bench'), cwd=ROOT,
+                                     stderr=open(os.devnull, 'w'))
+    return json.loads(output.decode('utf-8'))['job_id']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='runs of every command')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help='milliseconds the median of a command may exceed the one of the interpreter by')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    registry = os.path.join(directory, 'jobs.sqlite')
+    results = []
+    try:
+        with FakeJobManager(job_duration=3600) as fake:
+            job_id = launch(fake.url, registry)
+            # Every cancel run deletes a session of its own, instead of finding an already deleted one
+            cancelled = [launch(fake.url, registry) for _ in range(args.repeat)]
+            commands = [
+                ('python', [['-c', 'pass']] * args.repeat),
+                ('import joblauncher', [['-c', 'import joblauncher']] * args.repeat),
+                ('list', [cli(fake.url, registry, 'list')] * args.repeat),
+                ('status', [cli(fake.url, registry, 'status', job_id)] * args.repeat),
+                ('cancel', [cli(fake.url, registry, 'cancel', cancelled_id) for cancelled_id in cancelled]),
+            ]
+            for name, argvs in commands:
+                samples = [run(argv) for argv in argvs]
+                results.append({'command': name, 'runs': len(samples), 'p50': percentile(samples, .5),
+                                'p90': percentile(samples, .9), 'max': max(samples)})
+    finally:
+        shutil.rmtree(directory)
+
+    baseline = results[0]['p50']
+    for result in results:
+        result['overhead'] = result['p50'] - baseline
+    over_budget = [result['command'] for result in results if 1000 * result['overhead'] > args.budget]
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print('  %-20s %6s %10s %10s %10s %12s' % ('command', 'runs', 'p50 ms', 'p90 ms', 'max ms', 'overhead ms'))
+        for result in results:
+            print('  %-20s %6d %10.1f %10.1f %10.1f %12.1f' % (
+                result['command'], result['runs'], 1000 * result['p50'], 1000 * result['p90'],
+                1000 * result['max'], 1000 * result['overhead']))
+    if over_budget:
+        print('Over the budget of %g ms: %s' % (args.budget, ', '.join(over_budget)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
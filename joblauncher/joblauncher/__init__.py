@@ -1,14 +1,68 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # pylint: disable=R0801,E1101
+import importlib
 import logging
+import sys
 
-from .job_launcher import JobLauncher
-from .utils import inherit_docstring_from
+# Public names, by the module defining them
+_EXPORTS = {
+    '.errors': ('JobLauncherError', 'TransportError', 'ConnectionFailedError', 'RequestTimeoutError', 'ServiceError',
+                'ServiceOverloadedError', 'SessionFailedError', 'CircuitOpenError', 'ChecksumError',
+                'ValidationError'),
+    '.config_sync': ('SyncReport', 'load_job_definitions', 'sync_configs'),
+    '.download': ('DownloadReport', 'OutputFile', 'download_file', 'download_many', 'download_outputs',
+                  'list_outputs'),
+    '.job_launcher': ('JobLauncher',),
+    '.job_registry': ('JobRegistry',),
+    '.log_tail': ('LogTail', 'follow_logs'),
+    '.metrics': ('Metrics', 'get_metrics', 'enable_metrics'),
+    '.packing': ('PackingPlan', 'pack_jobs'),
+    '.progress': ('ProgressRecorder', 'ProgressSeries'),
+    '.rate_limit': ('RateLimiter', 'get_rate_limiter', 'enable_rate_limiting'),
+    '.resource_allocator': ('WaitPolicy', 'session_statuses'),
+    '.retry': ('RetryPolicy',),
+    '.schema': ('SchemaRegistry', 'compile_schema', 'get_schema_registry', 'enable_validation'),
+    '.session_pool': ('SessionPool',),
+    '.status_monitor': ('StatusMonitor',),
+    '.subscription': ('Subscription', 'subscribe'),
+    '.sweep': ('SweepSpec', 'expand_sweep', 'launch_sweep', 'sweep_points'),
+    '.tracing': ('Tracer', 'get_tracer', 'enable_tracing', 'phase_report', 'read_spans'),
+    '.transport': ('Transport', 'get_transport', 'set_transport'),
+    '.utils': ('inherit_docstring_from',),
+    '.workflow': ('Workflow', 'WorkflowReport'),
+}
+if sys.version_info >= (3, 5):
+    # asyncio is only imported by the programs using the asynchronous launcher
+    _EXPORTS.update({
+        '.async_job_launcher': ('AsyncJobLauncher',),
+        '.async_resource_allocator': ('AsyncResourceAllocator',),
+        '.async_subscription': ('AsyncSubscription',),
+    })
+_MODULES = dict((name, module) for module, names in _EXPORTS.items() for name in names)
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # Modules are imported on first use of one of their names, so that the command line interface only
+        # loads what its commands need
+        module = _MODULES.get(name)
+        if module is None:
+            raise AttributeError("module 'joblauncher' has no attribute " + repr(name))
+        value = getattr(importlib.import_module(module, __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_MODULES))
+else:
+    for _name, _module in _MODULES.items():
+        globals()[_name] = getattr(importlib.import_module(_module, __name__), _name)
+    del _name, _module
 
 logger = logging.getLogger(__name__)
 
 logger.addHandler(logging.NullHandler())
 
 def init():
+    from .job_launcher import JobLauncher
     return JobLauncher()
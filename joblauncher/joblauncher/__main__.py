@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Runs the command line interface with python -m joblauncher
+"""
+
+import sys
+
+from joblauncher.cli import main
+
+sys.exit(main())
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Asyncio counterpart of the JobLauncher (Python 3.5+)
+"""
+
+import asyncio
+import logging
+
+from .async_resource_allocator import AsyncResourceAllocator
+from .async_subscription import AsyncSubscription
+from .job_launcher import JobLauncher
+from .utils import Status, HTTP_METHOD_GET
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncJobLauncher(AsyncResourceAllocator):
+    """
+    Asynchronous wrapper around AsyncResourceAllocator, mirroring JobLauncher. Methods talking
+    to the JobManager or to the launched job are coroutines returning the same results as
+    their JobLauncher counterparts.
+    """
+    def __init__(self, resource=None, executor=None):
+
+        if isinstance(resource, str):
+            super(AsyncJobLauncher, self).__init__(executor=executor, resource_url=resource)
+        else:
+            super(AsyncJobLauncher, self).__init__(executor=executor)
+
+        self.launched_job_url = None
+
+    get_allocation_settings = JobLauncher.get_allocation_settings
+    edit_allocation_settings = JobLauncher.edit_allocation_settings
+    create_renderer_payload = JobLauncher.create_renderer_payload
+
+    async def create_job_renderer(self, payload=None):
+        """
+        Creates new renderer basing either on payload provided or default renderer if one is not provided
+        :return: Status object holding execution status of an HTTP request
+        """
+        if not payload:
+            payload = self.create_renderer_payload()
+        return await self.config_create(payload)
+
+    async def get_job_settings(self, renderer_id):
+        """
+        Returns the settings of selected job identified by renderer_id
+        :param renderer_id: Job identifier
+        :return: None or dict representation of selected job settings
+        """
+        renderer = await self.config_get(renderer_id)
+        if renderer:
+            return renderer
+        import pprint
+        pprint.pprint('Renderer not found.')
+        return None
+
+    async def edit_job_settings(self, renderer_id, **kwargs):
+        """
+        Updates the settings of selected job identified by renderer_id.
+        :param renderer_id: Job identifier
+        :param kwargs: key-value pairs with new settings of job identified
+        :return: Status object holding execution status of an HTTP request
+        """
+        renderer = await self.config_get(renderer_id)
+        if not renderer:
+            return Status(400, 'Renderer not found.', '')
+        for key, value in kwargs.items():
+            if key in renderer:
+                renderer[key] = value
+        renderer["id"] = renderer_id
+        return await self.config_update(renderer)
+
+    async def delete_job_settings(self, renderer_id):
+        """
+        Deletes job settings from RenderingResourceManager
+        :param renderer_id: Job identifier
+        :return: Status object holding execution status of an HTTP request
+        """
+        return await self.config_delete({"id": renderer_id})
+
+    async def schedule_and_launch_job(self, renderer_id=None, wait_policy=None):
+        """
+        Method used for scheduling required resources and launching specific job
+        :param renderer_id: Job identifier
+        :param wait_policy: WaitPolicy used while waiting for the resources to get running
+        :return: Status object holding execution status of an HTTP request
+        """
+        if renderer_id is not None:
+            self._renderer = renderer_id
+
+        resource = await self.resource_url(wait_policy)
+        if resource is not None:
+            self.launched_job_url = resource
+            print('Job scheduled and launched!')
+            logger.info('Job scheduled and launched!')
+            return Status(200, 'Job scheduled and launched!', '')
+        print('Failed to schedule and launch the job!')
+        logger.info('Failed to schedule and launch the job!')
+        return Status(400, 'Failed to schedule and launch the job!', '')
+
+    async def deallocate_and_cancel_job(self):
+        """
+        Delete session which results in job cancel and deallocation of the resources on the cluster via JobManager.
+        :return: Status object holding execution status of an HTTP request
+        """
+        self.launched_job_url = None
+        self._resource_url = None
+        response = await self.session_delete()
+        if response.code == 200:
+            print('Resources deallocated and job canceled successfully!')
+            logger.info('Resources deallocated and job canceled successfully!')
+        else:
+            print('Failed to deallocate resources and cancel the job.')
+            logger.info('Failed to deallocate resources and cancel the job.')
+        return response
+
+    async def get_single_job_status(self):
+        """
+        Single API call to check what is the status of scheduled and launched job
+        :return: Progress in percents
+        """
+        if not self.launched_job_url:
+            print('Job was not scheduled and launched!')
+            logger.info('Job was not scheduled and launched!')
+            return -1
+        return await self._job_progress()
+
+    async def get_continuous_job_status(self, interval=.5):
+        """
+        Shows a progress bar indicating the status of scheduled and launched job, until it completes
+        :param interval: seconds between two status requests
+        """
+        from tqdm import tqdm
+        with tqdm(total=100) as pbar:
+            while True:
+                progress = await self._job_progress()
+                pbar.update(progress - pbar.n)
+                if progress >= 100:
+                    print('Job completed!')
+                    logger.info('Job completed!')
+                    break
+                await asyncio.sleep(interval)
+
+    def subscribe(self, callback=None, monitor=None, modes=settings.SUBSCRIPTION_MODES):
+        """
+        Subscribes to the progress of the launched job, pushed by its resource connector when it supports it
+        :param callback: optional callback(job_status, event) called on progress changes, completion and failure
+        :param monitor: StatusMonitor polling the job if pushing is not possible, a private one if None
+        :param modes: push mechanisms tried in order
+        :return: started AsyncSubscription, to iterate over with async for
+        """
+        return AsyncSubscription(self, callback, monitor, self._transport, modes).start()
+
+    async def _job_progress(self):
+        """
+        Queries the resource connector of the launched job over the pooled transport
+        :return: Progress in percents
+        """
+        response = await self._http_request(HTTP_METHOD_GET, self.launched_job_url, None,
+                                            settings.DEFAULT_RESOURCE_CONNECTOR_STATUS,
+                                            send_cookies=False)
+        return int(response.contents['progress'])
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Asyncio counterpart of the resource allocator (Python 3.5+).
+
+Blocking HTTP calls run on a bounded pool of worker threads sharing the pooled transport,
+while every wait between them is an asyncio sleep, so thousands of allocations can be
+in flight on a single event loop.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import joblauncher.settings as settings
+from joblauncher.errors import HTTP_OVERLOAD_CODES, ServiceOverloadedError, SessionFailedError, \
+    is_transient, service_error
+from joblauncher.resource_allocator import ResourceAllocator, SESSION_STATUS_RUNNING, logger
+from joblauncher.utils import http_request, HTTP_METHOD_GET, HTTP_METHOD_PUT, \
+    HTTP_METHOD_DELETE, HTTP_METHOD_POST, HTTP_STATUS_OK, Status
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Returns the executor shared by the asynchronous allocators. Its size bounds the number
+    of HTTP requests in flight at the same time.
+    """
+    global _default_executor
+    if _default_executor is None:
+        with _default_executor_lock:
+            if _default_executor is None:
+                _default_executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_MAX_CONCURRENT_REQUESTS)
+    return _default_executor
+
+
+class AsyncResourceAllocator(ResourceAllocator):
+    """
+    The asynchronous resource allocator manages sessions and jobs on the cluster.
+    Every session_* and config_* method is a coroutine returning the same Status as
+    ResourceAllocator.
+    """
+
+    def __init__(self, executor=None, **kwargs):
+        """
+        :param executor: concurrent.futures executor running the HTTP requests, the shared
+        one if None
+        :param kwargs: ResourceAllocator settings
+        """
+        super(AsyncResourceAllocator, self).__init__(**kwargs)
+        self._executor = executor
+
+    async def _http_request(self, method, url, body=None, command=None, send_cookies=True,
+                            headers=None):
+        executor = self._executor or get_executor()
+        cookies = self._cookies if send_cookies else None
+        call = functools.partial(http_request, method, url, body, command, cookies,
+                                 self._transport, headers=headers)
+        # Retries wait on the event loop rather than in the worker threads
+        delays = self._retry_policy.delays()
+        while True:
+            try:
+                status = await asyncio.get_event_loop().run_in_executor(executor, call)
+                if status.code in HTTP_OVERLOAD_CODES:
+                    raise ServiceOverloadedError(status)
+                return status
+            except Exception as error:
+                delay = self._retry_policy.retry_delay(error, method != HTTP_METHOD_POST, delays)
+                if delay is None:
+                    if isinstance(error, ServiceOverloadedError):
+                        return error.status
+                    raise
+            await asyncio.sleep(delay)
+
+    async def free(self):
+        """ Frees remote resources """
+        if self._cookies is not None:
+            await self.session_delete()
+
+    async def resource_url(self, wait_policy=None):
+        """
+        Return the URL of the resources' http server, resuming the session kept by an earlier
+        call interrupted by a transient failure
+        :param wait_policy: WaitPolicy used while the session is being scheduled and started,
+        defaults to the one of the allocator or else the one of its queue
+        """
+        try:
+            if self._resource_url is not None:
+                return self._resource_url
+
+            if self._cookies is None:
+                payload = {
+                    "renderer_id": self._renderer,
+                    "owner": "joblauncher"
+                }
+                status = await self.session_create(payload)
+                if status.code != 201:
+                    raise service_error(status)
+                self._cookies = status.cookies
+            else:
+                logger.info('Resuming the existing session')
+
+            payload = {
+                "params": "",
+                "environment": "",
+                "reservation": self._reservation,
+                "exclusive_allocation": self._exclusive_allocation,
+                "nb_nodes": self._nb_nodes,
+                "nb_cpus": self._nb_cpus,
+                "nb_gpus": self._nb_gpus,
+                "allocation_time": self._allocation_time
+            }
+            if not self._scheduled:
+                status = await self.session_schedule(payload)
+                if status.code != HTTP_STATUS_OK:
+                    raise service_error(status)
+                self._scheduled = True
+
+            waiter = self._session_wait_policy(wait_policy).start()
+            code = None
+            while True:
+                try:
+                    status = await self.session_status()
+                    code = self._session_code(status)
+                except Exception as error:
+                    if not is_transient(error):
+                        raise
+                    logger.info('Failed to get the session status, polling again: ' + str(error))
+                    status = error
+                if code == SESSION_STATUS_RUNNING and not isinstance(status, Exception):
+                    break
+                delay = waiter.next_delay(code)
+                if delay is None:
+                    if isinstance(status, Exception):
+                        # The session may still get running, it is kept for the next call
+                        raise status
+                    raise SessionFailedError('Failed to get rendering resource running')
+                await asyncio.sleep(delay)
+
+            self._resource_url = 'http://' + status.contents['hostname'] + ':' + \
+                                 status.contents['port']
+            return self._resource_url
+        except Exception as error:
+            if not is_transient(error):
+                await self.session_delete()
+            raise
+
+    async def session_create(self, payload):
+        """
+        Create a session
+        """
+        self._cookies = None
+        status = await self._http_request(HTTP_METHOD_POST, self._url_session, payload)
+        if status.code == 201:
+            self._cookies = status.cookies
+        return status
+
+    async def session_list(self):
+        """
+        List existing sessions
+        """
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_POST, self._url_session))
+
+    async def session_delete(self):
+        """
+        Delete a session
+        """
+        status = await self._http_request(HTTP_METHOD_DELETE, self._url_session)
+        if status.code in (HTTP_STATUS_OK, 404):
+            self._cookies = None
+            self._scheduled = False
+        return status
+
+    async def session_command(self, method, command, payload=None):
+        """
+        Execute a custom command
+        """
+        return await self._status_check(await self._http_request(
+            method, self._url_session, payload, command))
+
+    async def session_schedule(self, payload):
+        """
+        Schedule a job
+        """
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_PUT, self._url_session, payload, 'schedule'))
+
+    async def session_status(self):
+        """
+        Request for session status
+        """
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_GET, self._url_session, None, 'status'))
+
+    async def session_log(self):
+        """
+        Request for session log
+        """
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_GET, self._url_session, None, 'log'))
+
+    async def session_job(self):
+        """
+        Request for job information
+        """
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_GET, self._url_session, None, 'job'))
+
+    async def session_streaming_url(self):
+        """
+        Request for streaming url
+        """
+        if self._cookies is None:
+            payload = {'uri': settings.DEFAULT_STREAMER_URI}
+            return Status(HTTP_STATUS_OK, payload, None)
+        return await self._status_check(await self._http_request(
+            HTTP_METHOD_GET, self._url_session, None, 'imagefeed'))
+
+    async def config_create(self, payload):
+        """
+        Create configuration
+        """
+        return self._config_cached(HTTP_METHOD_POST, payload, await self._status_check(
+            await self._http_request(HTTP_METHOD_POST, self._url_config, payload)))
+
+    async def config_update(self, payload):
+        """
+        Update configuration
+        """
+        return self._config_cached(HTTP_METHOD_PUT, payload, await self._status_check(
+            await self._http_request(HTTP_METHOD_PUT, self._url_config, payload)))
+
+    async def config_list(self):
+        """
+        List existing configurations
+        """
+        return self._config_cached(HTTP_METHOD_GET, None, await self._status_check(
+            await self._http_request(HTTP_METHOD_GET, self._url_config)))
+
+    async def config_delete(self, payload):
+        """
+        Delete configuration
+        """
+        return self._config_cached(HTTP_METHOD_DELETE, payload, await self._status_check(
+            await self._http_request(HTTP_METHOD_DELETE, self._url_config, payload)))
+
+    async def config_get(self, renderer_id):
+        """
+        Returns the configuration of a renderer from the configuration cache, fetching or
+        revalidating the configuration list first if the cache is stale
+        :param renderer_id: Job identifier
+        :return: dict representation of the configuration, or None if not found
+        """
+        if self._config_cache.stale():
+            status = await self._status_check(await self._http_request(
+                HTTP_METHOD_GET, self._url_config, headers=self._config_validators()))
+            self._config_cached(HTTP_METHOD_GET, None, status)
+        return self._config_cache.get(renderer_id)
+
+    async def _status_check(self, status):
+        """
+        Handles the result of an executed statement
+        :param status Status of the executed statement
+        """
+        if status.code != HTTP_STATUS_OK:
+            if status.code >= 500 or status.code == 429:
+                error = service_error(status)
+                if not error.transient:
+                    # if the rendering resource is unreachable, then the session should
+                    # be destroyed
+                    await self.session_delete()
+                raise error
+        return status
+
+    async def _obtain_registry(self):
+        """ Returns the registry of PUT and GET objects of the application """
+        status = await self.session_command('GET', 'registry')
+        return status.contents, status.code
+
+    async def _schema(self, object_name):
+        """ Returns the JSON schema for the given object """
+        status = await self.session_command('GET', object_name + '/schema')
+        return status.contents, status.code
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Asyncio counterpart of the progress subscriptions (Python 3.5+)
+"""
+
+import asyncio
+
+from .status_monitor import EVENT_PROGRESS
+from .subscription import Subscription
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription whose events are iterated with async for:
+
+        async for event, progress in subscription:
+            ...
+    """
+
+    def __aiter__(self):
+        return _AsyncEvents(self, asyncio.get_event_loop())
+
+
+class _AsyncEvents(object):
+    """ Async iterator over the (event, progress) tuples delivered from now on, until the job is done """
+
+    def __init__(self, subscription, loop):
+        self._queue = asyncio.Queue()
+        self._done = False
+        subscription.status.add_callback(lambda status, event: loop.call_soon_threadsafe(
+            self._queue.put_nowait, (event, status.progress)))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+        event, progress = await self._queue.get()
+        self._done = event != EVENT_PROGRESS
+        return event, progress
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Command line interface of the job launcher.
+
+    joblauncher launch RENDERER_ID [--queue QUEUE] [--allocation-time TIME]
+    joblauncher status [JOB_ID ...]
+    joblauncher cancel JOB_ID [JOB_ID ...]
+    joblauncher list [--renderer RENDERER_ID] [--status STATUS]
+    joblauncher logs JOB_ID [--follow]
+    joblauncher sync PATH [--delete-missing] [--dry-run]
+    joblauncher trace-report PATH [--percentile PERCENTILE ...]
+
+Launched jobs are recorded in the job registry, the other commands find them there by job id. Every
+command prints JSON instead of text with --json, one document per line for logs. Importing the
+package does not load the HTTP stack, so the commands which send no request, like list, start fast.
+With --trace, the phases of the launched and cancelled jobs are appended to a trace file, in the
+Chrome trace format if its name ends with .json and as JSON lines otherwise; trace-report prints
+the latency percentiles of every phase of a trace file.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+
+import joblauncher.settings as settings
+from joblauncher.job_registry import JobRegistry, JOB_STATUS_CREATED, JOB_STATUS_SCHEDULED, JOB_STATUS_RUNNING, \
+    JOB_STATUS_POOLED, JOB_STATUS_DELETED
+
+# Every command imports the modules it needs only, so that the commands sending no request start fast
+
+
+def main(argv=None):
+    """
+    Runs a command
+    :param argv: command line arguments, those of the process if None
+    :return: exit status, 0 on success
+    """
+    args = _parser().parse_args(argv)
+    args.stdout = sys.stdout
+    if args.trace:
+        from joblauncher.tracing import FORMAT_CHROME, FORMAT_JSONL, enable_tracing
+        enable_tracing(path=args.trace, format=FORMAT_CHROME if args.trace.endswith('.json') else FORMAT_JSONL)
+    # The launcher reports progress with print(), which would mix with the output of the command
+    sys.stdout = sys.stderr
+    try:
+        return args.command(args)
+    except Exception as error:
+        _output(args, {'error': str(error)}, 'ERROR: ' + str(error))
+        return 1
+    finally:
+        sys.stdout = args.stdout
+        if args.trace:
+            enable_tracing(False)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='joblauncher', description='Launches and manages jobs of the JobManager')
+    parser.add_argument('--url', default=os.environ.get('JOBLAUNCHER_URL', settings.DEFAULT_ALLOCATOR_URI),
+                        help='URL of the JobManager, or $JOBLAUNCHER_URL')
+    parser.add_argument('--registry', default=os.environ.get('JOBLAUNCHER_REGISTRY', settings.JOB_REGISTRY_PATH),
+                        help='path of the job registry, or $JOBLAUNCHER_REGISTRY')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of text')
+    parser.add_argument('--trace', default=os.environ.get('JOBLAUNCHER_TRACE'),
+                        help='trace file the phases of the jobs are appended to, or $JOBLAUNCHER_TRACE')
+    commands = parser.add_subparsers(dest='command_name', metavar='COMMAND')
+    commands.required = True
+
+    command = commands.add_parser('launch', help='schedule and launch a job')
+    command.add_argument('renderer_id', help='identifier of the job configuration')
+    command.add_argument('--queue', help='queue of the allocation')
+    command.add_argument('--allocation-time', help='maximum duration of the allocation, e.g. 2:00:00')
+    command.set_defaults(command=_launch)
+
+    command = commands.add_parser('status', help='show the progress of jobs, every running one by default')
+    command.add_argument('job_ids', nargs='*', metavar='JOB_ID')
+    command.set_defaults(command=_status)
+
+    command = commands.add_parser('cancel', help='cancel jobs and deallocate their resources')
+    command.add_argument('job_ids', nargs='+', metavar='JOB_ID')
+    command.set_defaults(command=_cancel)
+
+    command = commands.add_parser('list', help='list the jobs of the registry')
+    command.add_argument('--renderer', help='only list the jobs of this renderer')
+    command.add_argument('--status', choices=(JOB_STATUS_CREATED, JOB_STATUS_SCHEDULED, JOB_STATUS_RUNNING,
+                                              JOB_STATUS_POOLED, JOB_STATUS_DELETED),
+                         help='only list the jobs with this status')
+    command.set_defaults(command=_list)
+
+    command = commands.add_parser('logs', help='print the log of a job')
+    command.add_argument('job_id', metavar='JOB_ID')
+    command.add_argument('--follow', action='store_true', help='keep printing new lines until the job is gone')
+    command.set_defaults(command=_logs)
+
+    command = commands.add_parser('sync', help='synchronise the job configurations with job definition files')
+    command.add_argument('path', help='job definition file, or directory of job definition files')
+    command.add_argument('--delete-missing', action='store_true',
+                         help='delete the configurations without a job definition')
+    command.add_argument('--dry-run', action='store_true', help='only show what would be changed')
+    command.set_defaults(command=_sync)
+
+    command = commands.add_parser('trace-report', help='print the latency percentiles of the phases of traced jobs')
+    command.add_argument('path', help='JSON lines or Chrome trace file')
+    command.add_argument('--percentile', type=float, action='append', dest='percentiles', metavar='PERCENTILE',
+                         help='percentile to report, repeatable, %s by default' % (settings.TRACING_PERCENTILES,))
+    command.set_defaults(command=_trace_report)
+    return parser
+
+
+def _output(args, data, text):
+    if args.json:
+        text = json.dumps(data, sort_keys=True)
+    print(text, file=args.stdout)
+    args.stdout.flush()
+
+
+def _request(method, url, cookies=None):
+    """
+    Sends a single request with the standard library, which loads much faster than the pooled transport
+    :param method: HTTP method
+    :param url: URL of the request
+    :param cookies: optional dict of the cookies sent with the request
+    :return: HTTP status code and body of the response
+    """
+    try:
+        from httplib import HTTPConnection, HTTPSConnection
+        from urlparse import urlsplit
+    except ImportError:
+        from http.client import HTTPConnection, HTTPSConnection
+        from urllib.parse import urlsplit
+    parts = urlsplit(url)
+    connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+    connection = connection_class(parts.netloc, timeout=settings.HTTP_READ_TIMEOUT)
+    headers = {}
+    if cookies:
+        headers['Cookie'] = '; '.join('%s=%s' % cookie for cookie in sorted(cookies.items()))
+    try:
+        connection.request(method, (parts.path or '/') + ('?' + parts.query if parts.query else ''),
+                           headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def _map(function, items):
+    """ Applies a function to every item, from a thread pool only when there are several items """
+    if len(items) < 2:
+        return [function(item) for item in items]
+    from joblauncher.utils import parallel_map
+    return parallel_map(function, items, settings.DEFAULT_MAX_PARALLEL_LAUNCHES)
+
+
+def _launcher(args, registry=None):
+    from joblauncher.job_launcher import JobLauncher
+    return JobLauncher(service_url=args.url, registry=registry)
+
+
+def _launch(args):
+    # The session is recorded as soon as it is created, so that it is not lost if the launch is interrupted
+    # while it waits in the queue
+    registry = JobRegistry(args.registry)
+    launcher = _launcher(args, registry)
+    if args.queue is not None:
+        launcher._queue = args.queue
+    if args.allocation_time is not None:
+        launcher._allocation_time = args.allocation_time
+    status = launcher.schedule_and_launch_job(args.renderer_id)
+    if status.code != 200:
+        _output(args, {'renderer_id': args.renderer_id, 'error': status.contents}, 'ERROR: ' + str(status.contents))
+        return 1
+    job_id = registry.record(launcher, JOB_STATUS_RUNNING, detached=True)
+    _output(args, {'job_id': job_id, 'renderer_id': args.renderer_id, 'launched_job_url': launcher.launched_job_url},
+            job_id)
+    return 0
+
+
+def _status(args):
+    registry = JobRegistry(args.registry)
+    if args.job_ids:
+        records = [_record(registry, job_id) for job_id in args.job_ids]
+    else:
+        records = registry.list(status=JOB_STATUS_RUNNING)
+
+    def status(record):
+        data = {'job_id': record['job_id'], 'renderer_id': record['renderer_id'], 'status': record['status']}
+        if record['status'] == JOB_STATUS_RUNNING:
+            try:
+                code, body = _request('GET', record['launched_job_url'] + settings.DEFAULT_RESOURCE_CONNECTOR_STATUS)
+                if code != 200:
+                    raise IOError('Job status request failed with HTTP %d: %s' %
+                                  (code, body.decode('utf-8', 'replace')))
+                data['progress'] = int(json.loads(body.decode('utf-8'))['progress'])
+            except Exception as error:
+                data['error'] = str(error)
+        return data
+
+    statuses = _map(status, records)
+    _output(args, statuses, '\n'.join(
+        '%-32s %-20s %-8s %s' % (data['job_id'], data['renderer_id'], data['status'],
+                                 '%d%%' % data['progress'] if 'progress' in data else data.get('error', ''))
+        for data in statuses))
+    return 1 if any('error' in data for data in statuses) else 0
+
+
+def _cancel(args):
+    registry = JobRegistry(args.registry)
+    records = [_record(registry, job_id) for job_id in args.job_ids]
+    if args.trace:
+        # The launcher traces the teardown phase of the jobs
+        launcher = _launcher(args, registry)
+        jobs = [launcher.reattach(job_id) for job_id in args.job_ids]
+        codes = [status.code for status in launcher.cancel_many(jobs)]
+    else:
+        def cancel(record):
+            code, _ = _request('DELETE', record['session_url'], json.loads(record['cookies']))
+            if code in (200, 404):
+                # The session is gone, either deleted now or earlier
+                registry.set_status(record['job_id'], JOB_STATUS_DELETED)
+            return code
+
+        codes = _map(cancel, records)
+    cancelled = [{'job_id': job_id, 'code': code} for job_id, code in zip(args.job_ids, codes)]
+    _output(args, cancelled, '\n'.join('%-32s %s' % (data['job_id'], 'cancelled' if data['code'] in (200, 404)
+                                                     else 'FAILED (%d)' % data['code']) for data in cancelled))
+    return 0 if all(data['code'] in (200, 404) for data in cancelled) else 1
+
+
+def _list(args):
+    records = JobRegistry(args.registry).list(args.renderer, args.status)
+    for record in records:
+        # Session cookies stay in the registry
+        del record['cookies']
+    _output(args, records, '\n'.join('%-32s %-20s %-8s %s' % (record['job_id'], record['renderer_id'],
+                                                              record['status'], record['launched_job_url'] or '')
+                                     for record in records))
+    return 0
+
+
+def _logs(args):
+    registry = JobRegistry(args.registry)
+    _record(registry, args.job_id)
+    job = _launcher(args, registry).reattach(args.job_id)
+    for line in job.tail_log(follow=args.follow):
+        _output(args, {'job_id': args.job_id, 'line': line}, line)
+    return 0
+
+
+def _sync(args):
+    report = _launcher(args).sync_configs(args.path, args.delete_missing, args.dry_run)
+    _output(args, {
+        'dry_run': report.dry_run,
+        'created': report.created,
+        'updated': report.updated,
+        'deleted': report.deleted,
+        'unchanged': report.unchanged,
+        'failed': [{'renderer_id': renderer_id, 'action': action, 'code': status.code, 'contents': status.contents}
+                   for renderer_id, action, status in report.failed]
+    }, str(report))
+    return 1 if report.failed else 0
+
+
+def _trace_report(args):
+    from joblauncher.tracing import phase_report, read_spans
+    percentiles = args.percentiles or settings.TRACING_PERCENTILES
+    report = phase_report(read_spans(args.path), percentiles)
+    columns = ['p%g' % percentile for percentile in percentiles] + ['max']
+    lines = ['%-20s %6s' % ('phase', 'count') + ''.join(' %10s' % (column + ' ms') for column in columns)]
+    for name, phase in sorted(report.items()):
+        lines.append('%-20s %6d' % (name, phase['count']) +
+                     ''.join(' %10.1f' % (1000 * phase[column]) for column in columns))
+    _output(args, report, '\n'.join(lines))
+    return 0
+
+
+def _record(registry, job_id):
+    record = registry.get(job_id)
+    if record is None:
+        raise LookupError('Job not found in the registry: ' + job_id)
+    return record
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Client-side cache of the renderer configurations, indexed by renderer id
+"""
+
+import threading
+import time
+
+import joblauncher.settings as settings
+
+
+class ConfigCache(object):
+    """
+    Holds the last known renderer configurations of the JobManager. Entries expire after a TTL,
+    after which the configuration list is revalidated with its ETag when the server sent one.
+    The allocator keeps it up to date write-through on config_create, config_update and
+    config_delete.
+    """
+
+    def __init__(self, ttl=settings.CONFIG_CACHE_TTL):
+        """
+        :param ttl: seconds during which cached configurations are used without any request
+        """
+        self.ttl = ttl
+        self.etag = None
+        self._renderers = None
+        self._expiry = 0
+        self._lock = threading.Lock()
+
+    def stale(self):
+        """ :return: True if the configurations must be fetched or revalidated before use """
+        return self._renderers is None or time.time() >= self._expiry
+
+    def get(self, renderer_id):
+        """
+        :param renderer_id: Job identifier
+        :return: copy of the cached configuration of the renderer, or None if unknown
+        """
+        with self._lock:
+            renderer = (self._renderers or {}).get(renderer_id)
+        if renderer is None:
+            return None
+        return dict(renderer)
+
+    def renderers(self):
+        """ :return: list of copies of every cached configuration """
+        with self._lock:
+            return [dict(renderer) for renderer in (self._renderers or {}).values()]
+
+    def load(self, renderers, etag=None):
+        """
+        Replaces the cached configurations with a full configuration list
+        :param renderers: list of configurations as returned by config_list()
+        :param etag: ETag of the list, if the server sent one
+        """
+        with self._lock:
+            self._renderers = dict((renderer['id'], renderer) for renderer in renderers or [])
+            self.etag = etag
+            self._expiry = time.time() + self.ttl
+
+    def touch(self):
+        """ Marks the cached configurations as fresh, after the server confirmed they did not change """
+        with self._lock:
+            self._expiry = time.time() + self.ttl
+
+    def put(self, payload):
+        """
+        Adds or updates a configuration after it was written to the server
+        :param payload: full or partial configuration, holding at least its id
+        """
+        with self._lock:
+            if self._renderers is None:
+                return
+            renderer = dict(self._renderers.get(payload['id'], {}))
+            renderer.update(payload)
+            self._renderers[payload['id']] = renderer
+            # The server state changed, so the ETag of the list no longer matches
+            self.etag = None
+
+    def remove(self, renderer_id):
+        """
+        Removes a configuration after it was deleted from the server
+        :param renderer_id: Job identifier
+        """
+        with self._lock:
+            if self._renderers is not None:
+                self._renderers.pop(renderer_id, None)
+                self.etag = None
+
+    def invalidate(self):
+        """ Forgets every cached configuration """
+        with self._lock:
+            self._renderers = None
+            self.etag = None
+            self._expiry = 0
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Declarative synchronisation of renderer configurations from job definition files
+"""
+
+import ast
+import io
+import json
+import os
+import tokenize
+
+import joblauncher.settings as settings
+from joblauncher.errors import ServiceError
+from joblauncher.utils import parallel_map, Status, HTTP_STATUS_OK
+
+SYNC_CREATE = 'create'
+SYNC_UPDATE = 'update'
+SYNC_DELETE = 'delete'
+
+# JSON literals accepted in .dict job definitions, next to the Python ones
+_LITERALS = {'true': 'True', 'false': 'False', 'null': 'None'}
+
+
+def load_job_definition(path):
+    """
+    Loads a job definition file: either JSON, or a Python dict literal such as
+    examples/bbic_stack_wrapper_settings.dict, which may hold comments and JSON booleans
+    :param path: path of the file
+    :return: dict representation of the renderer settings payload
+    """
+    with io.open(path, encoding='utf-8') as definition:
+        text = definition.read()
+    if path.endswith('.json'):
+        return json.loads(text)
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token[0] == tokenize.NAME and token[1] in _LITERALS:
+            token = (token[0], _LITERALS[token[1]]) + tuple(token[2:])
+        tokens.append(token[:2])
+    return ast.literal_eval(tokenize.untokenize(tokens).strip())
+
+
+def load_job_definitions(path_or_dicts):
+    """
+    Loads many job definitions
+    :param path_or_dicts: directory holding .dict and .json files, a single file, a payload dict,
+    or a list of any of those
+    :return: dict of renderer settings payloads, indexed by renderer id
+    """
+    if isinstance(path_or_dicts, (dict, str, type(u''))):
+        path_or_dicts = [path_or_dicts]
+    definitions = {}
+    for item in path_or_dicts:
+        if isinstance(item, dict):
+            payloads = [item]
+        elif os.path.isdir(item):
+            payloads = [load_job_definition(os.path.join(item, name)) for name in sorted(os.listdir(item))
+                        if name.endswith(('.dict', '.json'))]
+        else:
+            payloads = [load_job_definition(item)]
+        for payload in payloads:
+            if payload['id'] in definitions:
+                raise ValueError('Duplicate job definition: ' + payload['id'])
+            definitions[payload['id']] = payload
+    return definitions
+
+
+class SyncReport(object):
+    """
+    Outcome, or plan when dry-running, of a configuration synchronisation
+    """
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = []
+        self.failed = []
+
+    def __str__(self):
+        lines = ['Dry run, nothing was changed:' if self.dry_run else 'Configurations synchronised:']
+        for title, ids in (('create', self.created), ('update', self.updated),
+                           ('delete', self.deleted), ('unchanged', self.unchanged)):
+            lines.append('  %-9s %3d %s' % (title, len(ids), ', '.join(sorted(ids))))
+        for renderer_id, action, status in self.failed:
+            lines.append('  FAILED to %s %s: %s %s' % (action, renderer_id, status.code, status.contents))
+        return '\n'.join(lines)
+
+
+def _send(request, payload):
+    """ :return: Status of a configuration request, a failure being returned instead of being raised """
+    try:
+        return request(payload)
+    except Exception as error:
+        if isinstance(error, ServiceError):
+            return error.status
+        return Status(400, str(error), '')
+
+
+def sync_configs(allocator, path_or_dicts, delete_missing=False, dry_run=False,
+                 max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+    """
+    Reconciles the renderer configurations of the JobManager with job definitions. Fetches the
+    remote configurations once, then only sends the creations, updates and deletions needed, in
+    parallel.
+    :param allocator: ResourceAllocator connected to the JobManager
+    :param path_or_dicts: job definitions, see load_job_definitions()
+    :param delete_missing: delete remote configurations without a job definition
+    :param dry_run: only report what would be changed
+    :param max_parallel: maximum number of configuration requests sent at the same time
+    :return: SyncReport
+    """
+    definitions = load_job_definitions(path_or_dicts)
+    remote = dict((renderer['id'], renderer) for renderer in allocator.config_list().contents or [])
+
+    report = SyncReport(dry_run)
+    actions = []
+    for renderer_id, payload in sorted(definitions.items()):
+        current = remote.get(renderer_id)
+        if current is None:
+            actions.append((SYNC_CREATE, renderer_id, payload))
+            report.created.append(renderer_id)
+        elif any(current.get(key) != value for key, value in payload.items()):
+            actions.append((SYNC_UPDATE, renderer_id, payload))
+            report.updated.append(renderer_id)
+        else:
+            report.unchanged.append(renderer_id)
+    if delete_missing:
+        for renderer_id in sorted(set(remote) - set(definitions)):
+            actions.append((SYNC_DELETE, renderer_id, {'id': renderer_id}))
+            report.deleted.append(renderer_id)
+    if dry_run:
+        return report
+
+    requests = {SYNC_CREATE: allocator.config_create,
+                SYNC_UPDATE: allocator.config_update,
+                SYNC_DELETE: allocator.config_delete}
+    statuses = parallel_map(lambda action: _send(requests[action[0]], action[2]), actions, max_parallel)
+    for (action, renderer_id, _), status in zip(actions, statuses):
+        if status.code not in (HTTP_STATUS_OK, 201):
+            report.failed.append((renderer_id, action, status))
+    return report
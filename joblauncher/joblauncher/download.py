@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Parallel, resumable downloads of the outputs of completed jobs from their resource connectors
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+import joblauncher.settings as settings
+from joblauncher.errors import ChecksumError, ConnectionFailedError, JobLauncherError, RequestTimeoutError, \
+    service_error
+from joblauncher.log_tail import HTTP_STATUS_PARTIAL_CONTENT
+from joblauncher.retry import RetryPolicy
+from joblauncher.transport import get_transport
+from joblauncher.utils import Status, http_request, parallel_map, HTTP_METHOD_GET, HTTP_STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+# Suffixes of the file receiving the data of an interrupted download, and of the file recording its
+# completed segments
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+
+
+class OutputFile(object):
+    """ Output file of a job, as listed by its resource connector, and how it was downloaded """
+
+    def __init__(self, name, size=None, sha256=None):
+        """
+        :param name: path of the file relative to the outputs of the job
+        :param size: size of the file in bytes, if known
+        :param sha256: hexadecimal SHA-256 digest of the file, if known
+        """
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+        self.path = None
+        self.transferred = 0
+        self.reused = 0
+
+    def __repr__(self):
+        return 'OutputFile(%r, size=%r)' % (self.name, self.size)
+
+
+class DownloadReport(object):
+    """ Outputs downloaded from one job by download_many() """
+
+    def __init__(self, job, directory, files=None, error=None):
+        """
+        :param job: JobLauncher handle of the job
+        :param directory: directory the outputs were written to
+        :param files: list of the downloaded OutputFiles
+        :param error: exception which interrupted the download, None if it succeeded
+        """
+        self.job = job
+        self.directory = directory
+        self.files = files or []
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def transferred(self):
+        """ :return: bytes received from the resource connector """
+        return sum(output.transferred for output in self.files)
+
+    def __str__(self):
+        if self.error is not None:
+            return '%s: FAILED (%s)' % (self.directory, self.error)
+        return '%s: %d files, %d bytes transferred' % (self.directory, len(self.files), self.transferred)
+
+
+def list_outputs(job_url, transport=None):
+    """
+    Lists the output files of a completed job
+    :param job_url: launched job URL
+    :param transport: pooled Transport used for the request, the shared one if None
+    :return: list of OutputFiles
+    """
+    status = http_request(HTTP_METHOD_GET, job_url, None, settings.DEFAULT_RESOURCE_CONNECTOR_OUTPUTS, None,
+                          transport)
+    if status.code != HTTP_STATUS_OK:
+        raise service_error(status)
+    return [OutputFile(output['name'], output.get('size'), output.get('sha256')) for output in status.contents]
+
+
+def download_outputs(job, directory, names=None, transport=None, max_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+                     verify=True, retry_policy=None, segment_size=settings.DOWNLOAD_SEGMENT_SIZE):
+    """
+    Downloads the outputs of a completed job, one file after the other, each with parallel range requests
+    when the resource connector supports them. Interrupted downloads resume from their .part files.
+    :param job: JobLauncher handle of a completed job, or the launched job URL
+    :param directory: directory the outputs are written to, created if needed
+    :param names: names of the outputs to download, all of them if None
+    :param transport: pooled Transport used for the requests, the shared one if None
+    :param max_connections: range requests sent at the same time for a file
+    :param verify: check the SHA-256 digests announced by the resource connector
+    :param retry_policy: RetryPolicy of the requests, the default one if None
+    :param segment_size: bytes fetched by each range request
+    :return: list of the downloaded OutputFiles
+    """
+    job_url = getattr(job, 'launched_job_url', job)
+    if not job_url:
+        raise ValueError('Job was not scheduled and launched')
+    outputs = list_outputs(job_url, transport)
+    if names is not None:
+        outputs = [output for output in outputs if output.name in names]
+        missing = set(names) - set(output.name for output in outputs)
+        if missing:
+            raise LookupError('Outputs not found: ' + ', '.join(sorted(missing)))
+    for output in outputs:
+        output.path = _output_path(directory, output.name)
+        url = job_url + settings.DEFAULT_RESOURCE_CONNECTOR_OUTPUTS + '/' + quote(output.name)
+        output.transferred, output.reused = download_file(
+            url, output.path, output.size, output.sha256 if verify else None, transport, max_connections,
+            segment_size, retry_policy=retry_policy)
+    return outputs
+
+
+def download_many(jobs, directory, names=None, transport=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES,
+                  max_connections=settings.DOWNLOAD_MAX_CONNECTIONS, verify=True):
+    """
+    Downloads the outputs of many completed jobs at the same time, each into its own subdirectory, named
+    after the job id or else the launched job URL so that a second call resumes the same files
+    :param jobs: JobLauncher handles of completed jobs
+    :param directory: directory holding the subdirectories of the jobs
+    :param max_parallel: maximum number of jobs downloaded from at the same time
+    :return: list of DownloadReports, in input order
+    """
+    def download(job):
+        report = DownloadReport(job, os.path.join(directory, _job_directory(job)))
+        try:
+            report.files = download_outputs(job, report.directory, names, transport, max_connections, verify)
+        except Exception as error:
+            logger.info('Failed to download the outputs of %s: %s' % (report.directory, error))
+            report.error = error
+        return report
+    return parallel_map(download, list(jobs), max_parallel)
+
+
+def download_file(url, path, size=None, sha256=None, transport=None, max_connections=settings.DOWNLOAD_MAX_CONNECTIONS,
+                  segment_size=settings.DOWNLOAD_SEGMENT_SIZE, chunk_size=settings.DOWNLOAD_CHUNK_SIZE,
+                  retry_policy=None):
+    """
+    Streams a file to disk in chunks. When the server honours byte ranges, the file is split in segments
+    fetched in parallel into path.part, the completed ones being recorded in path.part.json so that an
+    interrupted download only fetches the missing segments again, as long as the file did not change.
+    Otherwise the file is downloaded from its start with a single request.
+    :param url: URL of the file
+    :param path: path the file is written to, once complete and verified
+    :param size: size of the file in bytes, asked to the server if None
+    :param sha256: expected hexadecimal SHA-256 digest of the file, None to skip the verification
+    :param transport: pooled Transport used for the requests, the shared one if None
+    :param max_connections: range requests sent at the same time
+    :param segment_size: bytes fetched by each range request
+    :param chunk_size: bytes written to disk at a time
+    :param retry_policy: RetryPolicy of the requests, the default one if None
+    :return: (bytes transferred, bytes reused from the file or an interrupted download)
+    """
+    transport = transport or get_transport()
+    retry_policy = retry_policy or RetryPolicy()
+    if size is not None and os.path.exists(path) and os.path.getsize(path) == size and \
+            (sha256 is None or _sha256(path) == sha256):
+        return 0, size
+
+    head = retry_policy.call(lambda: _request('HEAD', url, transport))
+    if head.status_code != HTTP_STATUS_OK:
+        raise _response_error(head)
+    if size is None and head.headers.get('Content-Length') is not None:
+        size = int(head.headers['Content-Length'])
+    ranges = size is not None and head.headers.get('Accept-Ranges') == 'bytes'
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    download = _FileDownload(url, path, size, head.headers.get('ETag'), transport, segment_size, chunk_size)
+    if ranges:
+        reused = download.resume()
+        try:
+            parallel_map(lambda segment: retry_policy.call(lambda: download.fetch(segment)), download.pending(),
+                         max_connections)
+        except _RangesIgnoredError as error:
+            logger.info(str(error) + ', downloading the whole file instead')
+            # The segments recorded so far must not be reused once the .part file is rewritten
+            download.discard()
+            ranges = False
+    if not ranges:
+        reused = 0
+        retry_policy.call(download.fetch_all)
+
+    if sha256 is not None and _sha256(download.part) != sha256:
+        download.discard()
+        raise ChecksumError('Checksum mismatch of %s, the download is discarded' % url)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(download.part, path)
+    download.discard()
+    return download.transferred, reused
+
+
+class _RangesIgnoredError(JobLauncherError):
+    """ The server announced byte ranges, but answered a range request with the whole file """
+
+
+class _FileDownload(object):
+    """ Segments of a file being downloaded, written to its .part file by many threads """
+
+    def __init__(self, url, path, size, etag, transport, segment_size, chunk_size):
+        self.url = url
+        self.part = path + PART_SUFFIX
+        self.state_path = path + STATE_SUFFIX
+        self.size = size
+        self.etag = etag
+        self.transport = transport
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.transferred = 0
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def resume(self):
+        """
+        Reuses the segments completed by an interrupted download of the same file, or else prepares an
+        empty .part file
+        :return: bytes reused
+        """
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            state = None
+        if state is not None and os.path.exists(self.part) and \
+                (state.get('size'), state.get('etag'), state.get('segment_size')) == \
+                (self.size, self.etag, self.segment_size):
+            self._done = set(state['done'])
+            logger.info('Resuming the download of %s, %d segments done' % (self.url, len(self._done)))
+        else:
+            with open(self.part, 'wb') as part:
+                part.truncate(self.size)
+            self._save()
+        return sum(end - start + 1 for index, start, end in self._segments() if index in self._done)
+
+    def pending(self):
+        """ :return: list of the (index, first byte, last byte) segments still to download """
+        return [segment for segment in self._segments() if segment[0] not in self._done]
+
+    def fetch(self, segment):
+        """ Downloads a segment, writing it at its offset of the .part file """
+        index, start, end = segment
+        response = _request(HTTP_METHOD_GET, self.url, self.transport, {'Range': 'bytes=%d-%d' % (start, end)})
+        try:
+            if response.status_code == HTTP_STATUS_OK:
+                raise _RangesIgnoredError('%s ignored the byte range request' % self.url)
+            if response.status_code != HTTP_STATUS_PARTIAL_CONTENT:
+                raise _response_error(response)
+            with open(self.part, 'r+b') as part:
+                part.seek(start)
+                received = self._copy(response, part)
+        finally:
+            response.close()
+        if received != end - start + 1:
+            raise ConnectionFailedError('Download of %s interrupted after %d of %d bytes of a segment' % (
+                self.url, received, end - start + 1), self.url)
+        with self._lock:
+            self._done.add(index)
+            self._save()
+
+    def fetch_all(self):
+        """ Downloads the whole file with a single request, starting over from its first byte """
+        response = _request(HTTP_METHOD_GET, self.url, self.transport)
+        try:
+            if response.status_code != HTTP_STATUS_OK:
+                raise _response_error(response)
+            with open(self.part, 'wb') as part:
+                received = self._copy(response, part)
+        finally:
+            response.close()
+        if self.size is not None and received != self.size:
+            raise ConnectionFailedError('Download of %s interrupted after %d of %d bytes' % (
+                self.url, received, self.size), self.url)
+
+    def discard(self):
+        """ Removes the .part and state files """
+        for path in (self.part, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _segments(self):
+        return [(index, start, min(start + self.segment_size, self.size) - 1)
+                for index, start in enumerate(range(0, self.size, self.segment_size))]
+
+    def _copy(self, response, output):
+        """ Writes a streamed response body chunk by chunk, converting the errors of requests """
+        import requests
+        received = 0
+        try:
+            for chunk in response.iter_content(self.chunk_size):
+                output.write(chunk)
+                received += len(chunk)
+                with self._lock:
+                    self.transferred += len(chunk)
+        except requests.exceptions.RequestException as error:
+            raise ConnectionFailedError('Download of %s interrupted: %s' % (self.url, error), self.url)
+        return received
+
+    def _save(self):
+        """ Records the completed segments, replacing the state file atomically """
+        temporary = self.state_path + '.tmp'
+        with open(temporary, 'w') as state_file:
+            json.dump({'url': self.url, 'size': self.size, 'etag': self.etag, 'segment_size': self.segment_size,
+                       'done': sorted(self._done)}, state_file)
+        if os.path.exists(self.state_path) and os.name == 'nt':
+            os.remove(self.state_path)
+        os.rename(temporary, self.state_path)
+
+
+def _request(method, url, transport, headers=None):
+    """ Sends a streamed request over the pooled transport, converting the errors of requests """
+    import requests
+    try:
+        return transport.session(url).request(method, url, headers=headers, stream=True, timeout=transport.timeout)
+    except requests.exceptions.ConnectionError as error:
+        raise ConnectionFailedError('Failed to connect to %s: %s' % (url, error), url,
+                                    False if isinstance(error, requests.exceptions.ConnectTimeout) else None)
+    except requests.exceptions.Timeout as error:
+        raise RequestTimeoutError('Request to %s timed out: %s' % (url, error), url)
+
+
+def _response_error(response):
+    """ :return: the ServiceError matching an error response of the requests library """
+    return service_error(Status(response.status_code, None, None, response.headers, raw=response.content,
+                                encoding=response.encoding))
+
+
+def _sha256(path, chunk_size=settings.DOWNLOAD_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as data:
+        for chunk in iter(lambda: data.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _output_path(directory, name):
+    """ Returns the path of an output, refusing names which escape the directory """
+    path = os.path.normpath(os.path.join(directory, name))
+    if os.path.isabs(name) or not path.startswith(os.path.normpath(directory) + os.sep):
+        raise ValueError('Invalid output name: ' + name)
+    return path
+
+
+def _job_directory(job):
+    """ Returns the name of the subdirectory of a job, stable across processes """
+    if getattr(job, 'job_id', None):
+        return job.job_id
+    url = getattr(job, 'launched_job_url', job) or ''
+    return re.sub(r'[^A-Za-z0-9.-]+', '_', url.split('://')[-1]).strip('_')
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Typed errors of the client, telling transient failures, worth retrying while keeping the session,
+from permanent ones
+"""
+
+# Response codes of a service failing temporarily
+HTTP_TRANSIENT_CODES = (429, 502, 503, 504)
+
+# Responses of a server shedding load, which are never answered by deleting the session
+HTTP_OVERLOAD_CODES = (429, 503)
+
+
+class JobLauncherError(Exception):
+    """ Base class of the errors raised by the client """
+    transient = False
+
+
+class TransportError(JobLauncherError):
+    """ No response was received """
+    transient = True
+
+    def __init__(self, message, url=None, request_sent=None):
+        """
+        :param message: description of the error
+        :param url: URL of the request
+        :param request_sent: False if the request surely did not reach the server, None if unknown
+        """
+        super(TransportError, self).__init__(message)
+        self.url = url
+        self.request_sent = request_sent
+
+
+class ConnectionFailedError(TransportError):
+    """ The connection to the server failed or was dropped """
+
+
+class RequestTimeoutError(TransportError):
+    """ The server did not answer in time """
+
+
+class CircuitOpenError(TransportError):
+    """ Raised instead of sending a request to a server which keeps failing """
+
+    def __init__(self, message, url=None):
+        super(CircuitOpenError, self).__init__(message, url, request_sent=False)
+
+
+class ServiceError(JobLauncherError):
+    """ The server answered with an error """
+
+    def __init__(self, status):
+        """
+        :param status: Status of the response
+        """
+        super(ServiceError, self).__init__(status.contents)
+        self.status = status
+        self.code = status.code
+
+    @property
+    def transient(self):
+        return self.code in HTTP_TRANSIENT_CODES
+
+
+class ServiceOverloadedError(ServiceError):
+    """ The server is shedding load and did not process the request """
+
+    @property
+    def retry_after(self):
+        """ :return: seconds the server asked to wait for, or None """
+        try:
+            return float((self.status.headers or {}).get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+
+class SessionFailedError(JobLauncherError):
+    """ The session ended up FAILED, or never got running """
+
+
+class ChecksumError(JobLauncherError):
+    """ Downloaded data does not match the checksum announced by the server """
+
+
+class ValidationError(JobLauncherError, ValueError):
+    """ Payloads do not match their JSON schema, none of them was sent """
+
+    def __init__(self, name, errors):
+        """
+        :param name: name of the schema
+        :param errors: dict mapping the index of every invalid payload to its error messages
+        """
+        index = min(errors)
+        message = 'Invalid %s payload #%d: %s' % (name, index, '; '.join(errors[index]))
+        if len(errors) > 1:
+            message += ' (and %d more invalid payloads)' % (len(errors) - 1)
+        super(ValidationError, self).__init__(message)
+        self.name = name
+        self.errors = errors
+
+
+def is_transient(error):
+    """
+    :param error: exception raised by the client
+    :return: True if the failure is temporary, in which case the session is kept
+    """
+    return isinstance(error, JobLauncherError) and error.transient
+
+
+def service_error(status):
+    """
+    :param status: Status of an error response
+    :return: the ServiceError matching its code
+    """
+    if status.code in HTTP_OVERLOAD_CODES:
+        return ServiceOverloadedError(status)
+    return ServiceError(status)
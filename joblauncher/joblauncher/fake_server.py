@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Local stand-in for the JobManager, serving both the rendering-resource-manager endpoints and the
+resource connectors of the launched jobs, for tests and benchmarks.
+
+Each launched job reports hostname 127.0.0.1 and a port suffixed with the path of its own resource
+connector, e.g. '8765/rc/<session>', so that launched_job_url resolves to that job on this server.
+"""
+
+import hashlib
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote
+
+import joblauncher.settings as settings
+from joblauncher.resource_allocator import SESSION_STATUS_STOPPED, SESSION_STATUS_SCHEDULING, \
+    SESSION_STATUS_SCHEDULED, SESSION_STATUS_GETTING_HOSTNAME, SESSION_STATUS_STARTING, \
+    SESSION_STATUS_RUNNING, SESSION_STATUS_FAILED
+
+SESSION_COOKIE = settings.DEFAULT_ALLOCATOR_SESSION_COOKIE
+
+# Seconds between two progress checks of the pushing resource connectors, and between two comments
+# keeping a silent event stream alive
+_PUSH_CHECK_INTERVAL = .01
+_EVENT_KEEPALIVE_INTERVAL = 1
+
+
+def linear_progress(fraction):
+    """ Progress growing at a constant rate """
+    return fraction
+
+
+def ease_out_progress(fraction):
+    """ Progress fast at first, then slowing down towards the end """
+    return 1 - (1 - fraction) ** 2
+
+
+class FakeSession(object):
+    """
+    Session held by the fake JobManager, whose state only depends on the time elapsed since it was
+    scheduled
+    """
+
+    def __init__(self, session_id, renderer_id, owner):
+        self.id = session_id
+        self.renderer_id = renderer_id
+        self.owner = owner
+        self.scheduled_at = None
+        self.job_submitted_at = None
+        self.fails = False
+        self.schedule = None
+
+    def code(self, manager, now):
+        """ Returns the SESSION_STATUS_* code of the session """
+        if self.scheduled_at is None:
+            return SESSION_STATUS_STOPPED
+        elapsed = now - self.scheduled_at
+        if elapsed < manager.scheduling_delay / 2:
+            return SESSION_STATUS_SCHEDULING
+        if elapsed < manager.scheduling_delay:
+            return SESSION_STATUS_SCHEDULED
+        if self.fails:
+            return SESSION_STATUS_FAILED
+        if elapsed < manager.scheduling_delay + manager.starting_delay / 2:
+            return SESSION_STATUS_GETTING_HOSTNAME
+        if elapsed < manager.scheduling_delay + manager.starting_delay:
+            return SESSION_STATUS_STARTING
+        return SESSION_STATUS_RUNNING
+
+    def progress(self, manager, now):
+        """ Returns the progress in percents of the job running in the session """
+        if self.code(manager, now) != SESSION_STATUS_RUNNING:
+            return 0
+        if self.renderer_id in manager.job_servers:
+            # The wrapper only runs the jobs submitted to it
+            if self.job_submitted_at is None:
+                return 0
+            elapsed = now - self.job_submitted_at
+        else:
+            elapsed = now - self.scheduled_at - manager.scheduling_delay - manager.starting_delay
+        if manager.job_duration <= 0:
+            return 100
+        return int(100 * manager.progress_curve(min(1.0, elapsed / manager.job_duration)))
+
+
+class FakeJobManager(object):
+    """
+    Serves the session, config, schedule, status, log, job and resource connector endpoints called by
+    the client from a local thread-per-request HTTP server
+    """
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 scheduling_delay=0,
+                 starting_delay=0,
+                 job_duration=0,
+                 failure_rate=0,
+                 failing_renderers=(),
+                 progress_curve=linear_progress,
+                 log_ranges=True,
+                 push_modes=(),
+                 outputs=None,
+                 output_ranges=True,
+                 output_faults=0,
+                 app_schemas=None,
+                 job_servers=(),
+                 seed=None):
+        """
+        :param host: interface to listen on
+        :param port: port to listen on, any free one if 0
+        :param scheduling_delay: seconds sessions spend in SCHEDULING then SCHEDULED
+        :param starting_delay: seconds sessions spend in GETTING_HOSTNAME then STARTING
+        :param job_duration: seconds jobs take to progress from 0 to 100%
+        :param failure_rate: probability for a scheduled session to end up FAILED
+        :param failing_renderers: renderer ids whose sessions always end up FAILED
+        :param progress_curve: function mapping the elapsed fraction of the job to its progress fraction
+        :param log_ranges: whether session logs honour byte Range requests
+        :param push_modes: push mechanisms of the resource connectors: 'events' serves server-sent events,
+        'long-poll' holds status requests sent with a Prefer: wait header until the progress changes
+        :param outputs: dict mapping output file names to the bytes served by the completed jobs
+        :param output_ranges: whether output files honour byte Range requests
+        :param output_faults: number of output file responses cut off halfway, to exercise resumption
+        :param app_schemas: dict mapping the objects of the application registry to their JSON schemas
+        :param job_servers: renderer ids whose wrapper starts idle and runs the jobs submitted to its
+        jobs endpoint, one at a time
+        :param seed: seed of the failure draws, for reproducible runs
+        """
+        self.scheduling_delay = scheduling_delay
+        self.starting_delay = starting_delay
+        self.job_duration = job_duration
+        self.failure_rate = failure_rate
+        self.failing_renderers = set(failing_renderers)
+        self.progress_curve = progress_curve
+        self.log_ranges = log_ranges
+        self.push_modes = set(push_modes)
+        self.outputs = dict(outputs or {})
+        self.output_ranges = output_ranges
+        self.output_faults = output_faults
+        self.app_schemas = dict(app_schemas or {})
+        self.job_servers = set(job_servers)
+        self.sessions = {}
+        self.configs = {}
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.manager = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        """ Service URL to give to ResourceAllocator(service_url=...) """
+        return 'http://%s:%d/nip' % (self.host, self.port)
+
+    def start(self):
+        """ Starts serving from a background thread """
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-job-manager')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops serving, closes the listening socket and every kept-alive connection """
+        self._server.shutdown()
+        self._server.server_close()
+        self._server.close_connections()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def handle(self, method, path, cookies, body, headers=None):
+        """
+        Answers a request
+        :return: (HTTP status code, contents, headers dict), where contents are sent JSON-encoded unless
+        the headers hold a Content-Type
+        """
+        prefix = '/nip/' + settings.DEFAULT_ALLOCATOR_NAME + '/' + settings.DEFAULT_ALLOCATOR_API_VERSION + '/'
+        parts = path.split('?')[0].strip('/').split('/')
+        if path.startswith(prefix):
+            resource = path[len(prefix):].split('?')[0].strip('/').split('/')
+            if resource[0] == settings.DEFAULT_ALLOCATOR_CONFIG_PREFIX:
+                return self._config(method, body)
+            if resource[0] == settings.DEFAULT_ALLOCATOR_SESSION_PREFIX:
+                return self._session(method, '/'.join(resource[1:]) or None, cookies, body, headers or {})
+        elif len(parts) >= 2 and parts[0] == 'rc':
+            return self._resource_connector(method, parts[1], '/' + '/'.join(parts[2:]), headers or {})
+        return 404, 'Not found', {}
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def _config(self, method, body):
+        self._count('config_' + method.lower())
+        with self._lock:
+            if method == 'GET':
+                return 200, list(self.configs.values()), {}
+            if not isinstance(body, dict) or 'id' not in body:
+                return 400, 'Missing configuration id', {}
+            if method == 'POST':
+                if body['id'] in self.configs:
+                    return 409, 'Configuration already exists', {}
+                self.configs[body['id']] = body
+                return 201, body, {}
+            if body['id'] not in self.configs:
+                return 404, 'Configuration not found', {}
+            if method == 'PUT':
+                self.configs[body['id']].update(body)
+                return 200, self.configs[body['id']], {}
+            if method == 'DELETE':
+                del self.configs[body['id']]
+                return 200, '', {}
+        return 405, 'Method not allowed', {}
+
+    def _session(self, method, command, cookies, body, headers):
+        self._count('session_' + (command or method.lower()))
+        now = time.time()
+        if method == 'POST' and command is None:
+            if not isinstance(body, dict) or 'renderer_id' not in body:
+                return 400, 'Missing renderer id', {}
+            session = FakeSession(uuid.uuid4().hex, body['renderer_id'], body.get('owner'))
+            with self._lock:
+                self.sessions[session.id] = session
+            return 201, {'contents': 'Session created'}, \
+                {'Set-Cookie': '%s=%s; Path=/' % (SESSION_COOKIE, session.id)}
+
+        if method == 'GET' and command is None:
+            with self._lock:
+                sessions = list(self.sessions.values())
+            return 200, [dict(self._session_status(session, now), id=session.id, renderer_id=session.renderer_id,
+                              owner=session.owner) for session in sessions], {}
+        session = self.sessions.get(cookies.get(SESSION_COOKIE))
+        if session is None:
+            return 404, 'Session not found', {}
+        if method == 'DELETE' and command is None:
+            with self._lock:
+                del self.sessions[session.id]
+            return 200, {'contents': 'Session deleted'}, {}
+        if method == 'PUT' and command == 'schedule':
+            session.schedule = body
+            session.scheduled_at = now
+            session.fails = session.renderer_id in self.failing_renderers or \
+                self._random.random() < self.failure_rate
+            return 200, {'contents': 'Session scheduled'}, {}
+        if method == 'GET' and command == 'status':
+            return 200, self._session_status(session, now), {}
+        if method == 'GET' and command == 'log':
+            return self._log_range(self._log(session, now), headers.get('Range'))
+        if method == 'GET' and command == 'job':
+            return 200, {'job_id': session.id, 'renderer_id': session.renderer_id,
+                         'code': session.code(self, now)}, {}
+        if method == 'GET' and command == 'registry':
+            return 200, dict((name, ['GET', 'PUT']) for name in self.app_schemas), {}
+        if method == 'GET' and (command or '').endswith('/schema') and \
+                command[:-len('/schema')] in self.app_schemas:
+            return 200, self.app_schemas[command[:-len('/schema')]], {}
+        if method == 'GET' and command == 'imagefeed':
+            return 200, {'uri': ''}, {}
+        return 404, 'Unknown command', {}
+
+    def _session_status(self, session, now):
+        code = session.code(self, now)
+        status = {'code': code, 'description': 'fake session', 'hostname': '', 'port': ''}
+        if code == SESSION_STATUS_RUNNING:
+            status['hostname'] = self.host
+            status['port'] = '%d/rc/%s' % (self.port, session.id)
+        return status
+
+    def _log(self, session, now):
+        lines = ['Session %s scheduled' % session.id]
+        progress = session.progress(self, now)
+        lines.extend('progress %d' % percent for percent in range(progress + 1))
+        return '\n'.join(lines) + '\n'
+
+    def _log_range(self, log, byte_range):
+        if not self.log_ranges or not byte_range or not byte_range.startswith('bytes='):
+            return 200, {'contents': log}, {}
+        data = log.encode('utf-8')
+        offset = int(byte_range[len('bytes='):].split('-')[0])
+        if offset >= len(data):
+            return 416, b'', {'Content-Type': 'text/plain; charset=utf-8',
+                              'Content-Range': 'bytes */%d' % len(data)}
+        return 206, data[offset:], {'Content-Type': 'text/plain; charset=utf-8',
+                                    'Content-Range': 'bytes %d-%d/%d' % (offset, len(data) - 1, len(data))}
+
+    def _resource_connector(self, method, session_id, endpoint, headers):
+        self._count('resource_connector')
+        session = self.sessions.get(session_id)
+        if session is None:
+            return 404, 'Job not found', {}
+        if endpoint == settings.DEFAULT_RESOURCE_CONNECTOR_STATUS:
+            wait = (headers.get('Prefer') or '').partition('wait=')[2]
+            if 'long-poll' in self.push_modes and wait:
+                return self._long_poll(session, float(wait), headers.get('If-None-Match'))
+            return 200, {'progress': session.progress(self, time.time())}, {}
+        if endpoint == settings.DEFAULT_RESOURCE_CONNECTOR_JOBS and session.renderer_id in self.job_servers:
+            return self._jobs(method, session)
+        if endpoint == settings.DEFAULT_RESOURCE_CONNECTOR_EVENTS and 'events' in self.push_modes:
+            return 200, self._events(session), {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        if endpoint.startswith(settings.DEFAULT_RESOURCE_CONNECTOR_OUTPUTS):
+            if session.progress(self, time.time()) < 100:
+                return 409, 'Job not completed', {}
+            name = unquote(endpoint[len(settings.DEFAULT_RESOURCE_CONNECTOR_OUTPUTS):].strip('/'))
+            if not name:
+                return 200, [{'name': output, 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+                             for output, data in sorted(self.outputs.items())], {}
+            if name not in self.outputs:
+                return 404, 'Output not found', {}
+            return self._output(method, self.outputs[name], headers.get('Range'))
+        return 404, 'Unknown endpoint', {}
+
+    def _jobs(self, method, session):
+        """ Answers the jobs endpoint of an idle wrapper, which accepts a job once the previous one completed """
+        self._count('jobs_' + method.lower())
+        now = time.time()
+        busy = session.job_submitted_at is not None and session.progress(self, now) < 100
+        if method == 'POST':
+            if busy:
+                return 409, 'A job is already running', {}
+            session.job_submitted_at = now
+            return 201, {'contents': 'Job submitted'}, {}
+        if method == 'GET':
+            return 200, {'busy': busy}, {}
+        return 405, 'Method not allowed', {}
+
+    def _output(self, method, data, byte_range):
+        """ Answers a GET or HEAD request of an output file, cutting off the first output_faults bodies """
+        headers = {'Content-Type': 'application/octet-stream', 'ETag': '"%s"' % hashlib.sha256(data).hexdigest()[:16]}
+        code = 200
+        if self.output_ranges:
+            headers['Accept-Ranges'] = 'bytes'
+            if byte_range and byte_range.startswith('bytes='):
+                start, _, end = byte_range[len('bytes='):].partition('-')
+                start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+                if start > end:
+                    return 416, b'', {'Content-Type': 'text/plain', 'Content-Range': 'bytes */%d' % len(data)}
+                code = 206
+                headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, len(data))
+                data = data[start:end + 1]
+        headers['Content-Length'] = str(len(data))
+        if method == 'HEAD':
+            return code, b'', headers
+        self._count('output_get')
+        with self._lock:
+            fault = self.output_faults > 0
+            if fault:
+                self.output_faults -= 1
+        if fault:
+            # The announced length is sent, but the connection is closed after half of the body
+            data = data[:len(data) // 2]
+        with self._lock:
+            self.requests['output_bytes'] += len(data)
+        return code, data, headers
+
+    def _long_poll(self, session, wait, etag):
+        """ Answers once the progress differs from the one of the ETag, or with 304 after waiting """
+        expiry = time.time() + wait
+        while True:
+            progress = session.progress(self, time.time())
+            if '"%d"' % progress != etag or session.id not in self.sessions:
+                return 200, {'progress': progress}, {'ETag': '"%d"' % progress,
+                                                     'Preference-Applied': 'wait=%g' % wait}
+            if time.time() >= expiry:
+                return 304, '', {'ETag': etag, 'Preference-Applied': 'wait=%g' % wait}
+            time.sleep(_PUSH_CHECK_INTERVAL)
+
+    def _events(self, session):
+        """ Yields a server-sent event on every progress change, until the job completed or was deleted """
+        progress = None
+        keepalive = time.time() + _EVENT_KEEPALIVE_INTERVAL
+        while session.id in self.sessions:
+            current = session.progress(self, time.time())
+            if current != progress:
+                progress = current
+                yield ('data: {"progress": %d}\n\n' % progress).encode('utf-8')
+                if progress >= 100:
+                    return
+            elif time.time() >= keepalive:
+                yield b': keepalive\n\n'
+            else:
+                time.sleep(_PUSH_CHECK_INTERVAL)
+                continue
+            keepalive = time.time() + _EVENT_KEEPALIVE_INTERVAL
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    allow_reuse_address = True
+
+    def __init__(self, *args):
+        HTTPServer.__init__(self, *args)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request_thread(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        try:
+            ThreadingMixIn.process_request_thread(self, request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(request)
+
+    def close_connections(self):
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def handle_error(self, request, client_address):
+        # Clients dropping their kept-alive connections are expected
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so that the pooled transport of the client is exercised
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._answer('GET')
+
+    def do_POST(self):
+        self._answer('POST')
+
+    def do_PUT(self):
+        self._answer('PUT')
+
+    def do_DELETE(self):
+        self._answer('DELETE')
+
+    def do_HEAD(self):
+        self._answer('HEAD')
+
+    def _answer(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = None
+        if length:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            # DELETE payloads are sent JSON-encoded twice by http_request
+            if isinstance(body, type(u'')):
+                body = json.loads(body)
+        code, contents, headers = self.server.manager.handle(method, self.path, self._cookies(), body,
+                                                             self.headers)
+        if headers.get('Content-Type') == 'text/event-stream':
+            self._stream(code, contents, headers)
+            return
+        if 'Content-Type' in headers:
+            data = contents
+        else:
+            data = json.dumps(contents).encode('utf-8') if contents != '' else b''
+        # An announced length differing from the body is kept, to cut off responses or answer HEAD requests
+        length = headers.pop('Content-Length', str(len(data)))
+        self.send_response(code)
+        if 'Content-Type' not in headers:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', length)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+            if int(length) != len(data):
+                self.close_connection = True
+
+    def _stream(self, code, chunks, headers):
+        """ Sends the chunks yielded by a generator as they come, with chunked transfer encoding """
+        self.send_response(code)
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(b'%x\r\n' % len(chunk) + chunk + b'\r\n')
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _cookies(self):
+        cookies = {}
+        for item in (self.headers.get('Cookie') or '').split(';'):
+            if '=' in item:
+                name, value = item.strip().split('=', 1)
+                cookies[name] = value
+        return cookies
+
+    def log_message(self, *args):
+        pass
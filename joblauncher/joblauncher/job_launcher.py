@@ -17,30 +17,49 @@
 #
 ###############################################################################
 
-import pprint
 import logging
-from tqdm import tqdm
 import time
-import requests
 
-
-from .resource_allocator import ResourceAllocator
-from .utils import Status
+# The modules used by a single method are imported by it, so that launching a job does not load them
+from .errors import ServiceError, is_transient, service_error
+from .job_registry import JOB_STATUS_CREATED, JOB_STATUS_DELETED, JOB_STATUS_POOLED, JOB_STATUS_RUNNING, \
+    JOB_STATUS_SCHEDULED
+from .resource_allocator import ResourceAllocator, session_statuses
+from .schema import SCHEMA_CONFIG
+from .tracing import get_tracer
+from .utils import Status, http_request, parallel_map, HTTP_METHOD_GET, HTTP_METHOD_POST, HTTP_STATUS_OK
+from . import settings
 
 logger = logging.getLogger(__name__)
 
+try:
+    basestring
+except NameError:
+    basestring = str
+
+
 class JobLauncher(ResourceAllocator):
     """
     Simple wrapper around ResourceAllocator for extending and simplifying process of connecting to JobManager
     """
-    def __init__(self, resource=None):
+    # Attributes owned by a single session, which are never shared with spawned sessions
+    _session_attributes = ('_cookies', '_scheduled', '_resource_url', '_allocation_expiry', 'job_id',
+                           'launched_job_url', 'launch_status', 'sessions', '_trace', '_span')
+
+    def __init__(self, resource=None, session_pool=None, registry=None, **kwargs):
 
         if isinstance(resource, basestring):
-            super(JobLauncher, self).__init__(resource_url = resource)
+            super(JobLauncher, self).__init__(resource_url = resource, **kwargs)
         else:
-            super(JobLauncher, self).__init__()
+            super(JobLauncher, self).__init__(**kwargs)
 
         self.launched_job_url = None
+        self.launch_status = None
+        self.sessions = []
+        self.session_pool = session_pool
+        self._allocation_expiry = None
+        self.registry = registry
+        self.job_id = None
 
 
     def get_allocation_settings(self):
@@ -55,7 +74,7 @@ class JobLauncher(ResourceAllocator):
         Updates settings of ResourceAllocator
         :return: dict representation of updated allocation settings
         """
-        for key, value in kwargs.iteritems():
+        for key, value in kwargs.items():
             if hasattr(self, key):
                 setattr(self, key, value)
             else:
@@ -116,7 +135,7 @@ class JobLauncher(ResourceAllocator):
             "name": "bbic",
             "description": "wrapper for bbic"
         }
-        for key, value in kwargs.iteritems():
+        for key, value in kwargs.items():
             if key in default_renderer_payload:
                 default_renderer_payload[key] = value
         return default_renderer_payload
@@ -127,13 +146,11 @@ class JobLauncher(ResourceAllocator):
         :param renderer_id: Job identifier
         :return: None or dict representation of selected job settings
         """
-        renderers = self.config_list().contents
-        if renderers:
-            renderer = next((rend for rend in renderers if rend["id"] == renderer_id), None)
-
+        renderer = self.config_get(renderer_id)
         if renderer:
-            return dict(renderer)
+            return renderer
         else:
+            import pprint
             pprint.pprint('Renderer not found.')
             return
 
@@ -145,13 +162,9 @@ class JobLauncher(ResourceAllocator):
         :param kwargs: key-value pairs with new settings of job identified
         :return: Status object holding execution status of an HTTP request
         """
-        renderers = self.config_list().contents
-        if renderers:
-            renderer = next((rend for rend in renderers if rend["id"] == renderer_id), None)
-
+        renderer = self.config_get(renderer_id)
         if renderer:
-            renderer = dict(renderer)
-            for key, value in kwargs.iteritems():
+            for key, value in kwargs.items():
                 if key in renderer:
                     renderer[key] = value
             renderer["id"] = renderer_id
@@ -169,33 +182,331 @@ class JobLauncher(ResourceAllocator):
         return self.config_delete({"id": renderer_id})
 
 
-    def schedule_and_launch_job(self, renderer_id=None):
+    def sync_configs(self, path_or_dicts, delete_missing=False, dry_run=False,
+                     max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Reconciles the job settings of RenderingResourceManager with job definitions, sending only the
+        needed creations, updates and deletions in parallel
+        :param path_or_dicts: directory of .dict/.json job definitions, a single file, a payload dict or a list of those
+        :param delete_missing: delete job settings without a job definition
+        :param dry_run: only report what would be changed
+        :param max_parallel: maximum number of configuration requests sent at the same time
+        :return: SyncReport listing the created, updated, deleted, unchanged and failed job settings
+        """
+        from .config_sync import sync_configs
+        return sync_configs(self, path_or_dicts, delete_missing, dry_run, max_parallel)
+
+    def schedule_and_launch_job(self, renderer_id=None, wait_policy=None):
         """
         Method used for scheduling required resources and launching specific job
         :param renderer_id: Job identifier
+        :param wait_policy: WaitPolicy used while waiting for the resources to get running
         :return: Status object holding execution status of an HTTP request
         """
 
         if renderer_id is not None:
             self._renderer = renderer_id
 
-        # This calls session_schedule() with payload containing allocation settings and schedules a job run given the renderer_id
-        resource = self.resource_url()
+        if self._trace is None:
+            # A launch resumed after a transient failure keeps the trace of the first attempt
+            self._trace = self._span = get_tracer().start_trace('job', renderer_id=self._renderer,
+                                                                queue=self._queue)
+        try:
+            with self._traced('launch'):
+                if self.session_pool is not None and self._resource_url is None and \
+                        self.session_pool.pooled(self._renderer):
+                    # Take a warm session, which is already scheduled and running, and submit the job to
+                    # its idle renderer wrapper
+                    try:
+                        with self._traced('pool_acquire'):
+                            warm = self.session_pool.acquire(self._renderer, wait_policy)
+                    except ValueError as error:
+                        # Refused meanwhile, the job is launched in a session of its own
+                        logger.info(str(error))
+                        warm = None
+                    if warm is not None:
+                        self._cookies = warm._cookies
+                        self._resource_url = warm._resource_url
+                        self._allocation_expiry = warm._allocation_expiry
+                        self.job_id = warm.job_id
+                    if warm is not None and self.session_pool.pooled(self._renderer):
+                        with self._traced('job_submit'):
+                            submitted = self.submit_job()
+                        if submitted.code not in (200, 201):
+                            # Nothing runs on the session, which is not reported as launched
+                            self._resource_url = None
+                            self.session_delete()
+                            raise service_error(submitted)
+                    # Otherwise the new session found out that the renderer cannot be pooled, its wrapper
+                    # runs the job like in a session launched without the pool
+                if self._resource_url is None:
+                    from .session_pool import allocation_seconds
+                    self._allocation_expiry = time.time() + allocation_seconds(self._allocation_time)
+
+                # This calls session_schedule() with payload containing allocation settings and schedules a job run given the renderer_id
+                resource = self.resource_url(wait_policy)
+        except Exception as error:
+            if not is_transient(error):
+                self._finish_trace(error=str(error))
+            raise
         if resource is not None:
+            if self._span is self._trace:
+                self._span = get_tracer().start_span('run', self._trace)
             self.launched_job_url = resource
+            if self.registry is not None:
+                self.registry.record(self, JOB_STATUS_RUNNING)
             print('Job scheduled and launched!')
             logger.info('Job scheduled and launched!')
             return Status(200, 'Job scheduled and launched!', '')
         else:
+            self._finish_trace(code=400)
             print('Failed to schedule and launch the job!')
             logger.info('Failed to schedule and launch the job!')
             return Status(400, 'Failed to schedule and launch the job!', '')
 
+    def submit_job(self, payload=None):
+        """
+        Submits a new job to the running session of this launcher, whose renderer wrapper has to accept
+        jobs over REST, as the warm sessions of a session pool do
+        :param payload: parameters of the job, the renderer id by default
+        :return: Status object holding execution status of the HTTP request, 201 once the job was accepted
+        """
+        return http_request(HTTP_METHOD_POST, self._resource_url, payload or {'renderer_id': self._renderer},
+                            settings.DEFAULT_RESOURCE_CONNECTOR_JOBS, None, self._transport)
+
+    def accepts_jobs(self):
+        """ :return: True if the renderer wrapper of the running session accepts new jobs over REST """
+        try:
+            status = http_request(HTTP_METHOD_GET, self._resource_url, None,
+                                  settings.DEFAULT_RESOURCE_CONNECTOR_JOBS, None, self._transport)
+        except Exception:
+            return False
+        return status.code == HTTP_STATUS_OK
+
+    def session_create(self, payload):
+        """
+        Creates a session, recorded in the registry right away so that it can be found and deleted even if
+        this process exits while the session waits in the queue
+        """
+        status = super(JobLauncher, self).session_create(payload)
+        if status.code == 201 and self.registry is not None:
+            self.job_id = None
+            self.registry.record(self, JOB_STATUS_CREATED)
+        return status
+
+    def session_schedule(self, payload):
+        """
+        Schedules the job of the session, and records it as scheduled in the registry
+        """
+        status = super(JobLauncher, self).session_schedule(payload)
+        if status.code == HTTP_STATUS_OK and self.registry is not None and self.job_id is not None:
+            self.registry.set_status(self.job_id, JOB_STATUS_SCHEDULED)
+        return status
+
+    def session_delete(self):
+        """
+        Deletes the session, and records it as deleted in the registry once it is gone
+        """
+        status = super(JobLauncher, self).session_delete()
+        if self.registry is not None and self.job_id is not None and status.code in (HTTP_STATUS_OK, 404):
+            # The session is gone, either deleted now or earlier
+            self.registry.set_status(self.job_id, JOB_STATUS_DELETED)
+        return status
+
+    def spawn(self, renderer_id=None):
+        """
+        Creates a new session handle sharing the allocation settings and the transport of this launcher,
+        but holding its own cookies, resource URL and launched job URL
+        :param renderer_id: Job identifier, the one of this launcher if None
+        :return: JobLauncher handle of the new session
+        """
+        job = self.__class__()
+        for key, value in vars(self).items():
+            if key not in self._session_attributes:
+                setattr(job, key, value)
+        if renderer_id is not None:
+            job._renderer = renderer_id
+        return job
+
+    def launch_many(self, renderer_ids_or_payloads, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Schedules and launches one job per renderer, each in its own session, running up to max_parallel
+        create/schedule/wait-for-running pipelines at the same time
+        :param renderer_ids_or_payloads: Job identifiers, or renderer payloads which are created first
+        :param max_parallel: maximum number of sessions being brought up at the same time
+        :return: list of JobLauncher handles, in input order, each holding its launch_status
+        :raise ValidationError: if any payload does not match the configuration schema, before any request
+        """
+        renderer_ids_or_payloads = list(renderer_ids_or_payloads)
+        self.validate_payloads([item for item in renderer_ids_or_payloads if isinstance(item, dict)])
+        launches = []
+        payloads = {}
+        for item in renderer_ids_or_payloads:
+            if isinstance(item, dict):
+                payloads[item['id']] = item
+                launches.append((item['id'], item.get('queue', self._queue)))
+            else:
+                launches.append((item, self._queue))
+        statuses = parallel_map(self._create_config, list(payloads.values()), max_parallel)
+        # A job whose configuration could not be created is not launched, it holds the configuration error
+        failed = dict((payload['id'], status) for payload, status in zip(payloads.values(), statuses)
+                      if status.code not in (HTTP_STATUS_OK, 201, 409))
+
+        jobs = parallel_map(self._launch_session, [launch for launch in launches if launch[0] not in failed],
+                            max_parallel)
+        self.sessions.extend(job for job in jobs if job.launch_status.code == 200)
+        launched = iter(jobs)
+        return [self._failed_launch(launch[0], failed[launch[0]]) if launch[0] in failed else next(launched)
+                for launch in launches]
+
+    def _create_config(self, payload):
+        """ :return: Status of the configuration creation, a failure being returned instead of being raised """
+        try:
+            return self.config_create(payload)
+        except Exception as error:
+            logger.info('Failed to create the job settings: ' + str(error))
+            if isinstance(error, ServiceError):
+                return error.status
+            return Status(400, str(error), '')
+
+    def _failed_launch(self, renderer_id, status):
+        job = self.spawn(renderer_id)
+        job.launch_status = status
+        return job
+
+    def validate_payloads(self, payloads, name=SCHEMA_CONFIG):
+        """
+        Checks many payloads against their schema with a validator compiled once, without any request
+        :param payloads: list of payloads
+        :param name: 'config' for renderer payloads, 'schedule' for session schedules
+        :raise ValidationError: listing the invalid payloads by index, if validation is enabled
+        """
+        self._schema_registry.validate_many(name, payloads)
+
+    def launch_sweep(self, template, grid, chunk_size=1, chunk_resource='nb_cpus',
+                     max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES, keep_configs=False):
+        """
+        Launches a parameter sweep: expands a renderer payload template holding {key} placeholders over a
+        parameter grid, skipping duplicate points, and launches one job per point or per chunk of points
+        :param template: renderer payload, e.g. from create_renderer_payload()
+        :param grid: dict mapping every parameter to its values, or an iterable of dicts, one per point
+        :param chunk_size: number of points run side by side in each allocation, which share the progress
+        and the status of their job
+        :param chunk_resource: 'nb_cpus' or 'nb_nodes', multiplied by the number of points of a chunk
+        :param max_parallel: maximum number of jobs being launched at the same time
+        :param keep_configs: keep the configurations created for the jobs, deleted once launched otherwise
+        :return: list of (SweepSpec, JobLauncher) tuples, each job holding its launch_status
+        """
+        from .sweep import expand_sweep, launch_sweep
+        return launch_sweep(self, expand_sweep(template, grid, chunk_size, chunk_resource), max_parallel,
+                            keep_configs)
+
+    def launch_packed(self, payloads, node_cpus=settings.PACKING_NODE_CPUS, node_gpus=settings.PACKING_NODE_GPUS,
+                      nb_nodes=1, exclusive=False, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Packs small jobs into fewer, larger allocations, running the packed jobs side by side in each of them
+        :param payloads: renderer payloads or SweepSpecs, with their nb_cpus, nb_gpus and --script-command
+        :param node_cpus: CPUs of a node of the cluster
+        :param node_gpus: GPUs of a node of the cluster
+        :param nb_nodes: nodes of a shared allocation, only 1 is supported as the packed jobs run on its first node
+        :param exclusive: request whole nodes for the shared allocations
+        :param max_parallel: maximum number of allocations being launched at the same time
+        :return: PackingPlan reporting the use of the allocations, and list of (SweepSpec, JobLauncher)
+        tuples, the points of each spec being the ids of its packed jobs
+        """
+        from .packing import pack_jobs
+        from .sweep import launch_sweep
+        plan = pack_jobs(payloads, node_cpus, node_gpus, nb_nodes, exclusive)
+        return plan, launch_sweep(self, plan.specs(), max_parallel)
+
+    def workflow(self, monitor=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES, retries=0,
+                 fail_fast=False):
+        """
+        Creates a workflow of jobs depending on each other, launched with the settings of this launcher
+        :param monitor: StatusMonitor polling the running jobs, a private one if None
+        :param max_parallel: maximum number of jobs being launched or cancelled at the same time
+        :param retries: default number of times a failed job is launched again
+        :param fail_fast: cancel the whole workflow once a job failed for good
+        :return: Workflow, to add() jobs to and run()
+        """
+        from .workflow import Workflow
+        return Workflow(self, monitor, max_parallel, retries, fail_fast)
+
+    def cancel_many(self, jobs=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Deallocates resources and cancels many jobs at the same time
+        :param jobs: JobLauncher handles returned by launch_many, all sessions of this launcher if None
+        :param max_parallel: maximum number of sessions being deleted at the same time
+        :return: list of Status objects holding execution status of the HTTP requests, in input order
+        """
+        if jobs is None:
+            jobs = list(self.sessions)
+        statuses = parallel_map(lambda job: job.deallocate_and_cancel_job(), jobs, max_parallel)
+        self.sessions = [job for job in self.sessions if job not in jobs]
+        return statuses
+
+    def session_statuses(self, jobs=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Gets the session status of many jobs with a single session list request, falling back to one
+        status request per session only for the sessions missing from the list
+        :param jobs: JobLauncher handles returned by launch_many, all sessions of this launcher if None
+        :param max_parallel: maximum number of fallback status requests sent at the same time
+        :return: list of Status objects, in input order, as returned by session_status()
+        """
+        if jobs is None:
+            jobs = list(self.sessions)
+        return session_statuses(jobs, max_parallel)
+
+    def launch_session(self, renderer_id=None, queue=None):
+        """
+        Schedules and launches a job in a new session, without raising on failure
+        :param renderer_id: Job identifier, the one of this launcher if None
+        :param queue: queue of the allocation, the one of this launcher if None
+        :return: JobLauncher handle of the new session, holding its launch_status
+        """
+        job = self.spawn(renderer_id)
+        if queue is not None:
+            job._queue = queue
+        try:
+            job.launch_status = job.schedule_and_launch_job()
+        except Exception as error:
+            logger.info('Failed to schedule and launch the job: ' + str(error))
+            job.launch_status = Status(400, str(error), '')
+        return job
+
+    def _launch_session(self, launch):
+        return self.launch_session(*launch)
+
     def deallocate_and_cancel_job(self):
         """
         Delete session which results in job cancel and deallocation of the resources on the cluster via JobManager.
+        With a session pool, the session of a completed job is returned to the pool instead when it can be reused.
         :return: Status object holding execution status of an HTTP request
         """
+        if self._span is not self._trace:
+            # Ends the run phase
+            get_tracer().finish(self._span)
+            self._span = self._trace
+        try:
+            with self._traced('teardown'):
+                response = self._deallocate()
+        except Exception as error:
+            self._finish_trace(error=str(error))
+            raise
+        self._finish_trace(code=response.code)
+        return response
+
+    def _deallocate(self):
+        if self.session_pool is not None and self.session_pool.release(self):
+            if self.registry is not None and self.job_id is not None:
+                self.registry.set_status(self.job_id, JOB_STATUS_POOLED)
+            self.job_id = None
+            self.launched_job_url = None
+            self._resource_url = None
+            self._cookies = None
+            self._allocation_expiry = None
+            logger.info('Job completed and resources returned to the session pool.')
+            return Status(200, 'Resources returned to the session pool.', '')
         # TODO verify that is enough to deallocate resources and then get the new job running.
         self.launched_job_url = None
         self._resource_url = None
@@ -208,6 +519,75 @@ class JobLauncher(ResourceAllocator):
             logger.info('Failed to deallocate resources and cancel the job.')
         return response
 
+    def _finish_trace(self, **attributes):
+        """ Ends the trace of the job, if it is traced """
+        get_tracer().finish(self._trace, **attributes)
+        self._trace = self._span = None
+
+    def reattach(self, job_id):
+        """
+        Creates a handle of a job recorded in the registry, e.g. by a kernel which restarted since, without
+        sending any request
+        :param job_id: Job identifier in the registry
+        :return: JobLauncher handle of the job, also added to the sessions of this launcher
+        """
+        record = self._job_registry().get(job_id)
+        if record is None:
+            raise KeyError('Job not found in the registry: ' + job_id)
+        job = self.registry.restore(self.spawn(), record)
+        self.sessions.append(job)
+        return job
+
+    def reattach_all(self, renderer_id=None):
+        """
+        Creates handles of all the running jobs recorded in the registry
+        :param renderer_id: only reattach to the jobs of this renderer
+        :return: list of JobLauncher handles, also added to the sessions of this launcher
+        """
+        records = self._job_registry().list(renderer_id, JOB_STATUS_RUNNING)
+        jobs = [self.registry.restore(self.spawn(), record) for record in records]
+        self.sessions.extend(jobs)
+        return jobs
+
+    def list_orphans(self, renderer_id=None):
+        """
+        Lists the jobs which may still hold resources on the cluster, but whose launching process is gone
+        :param renderer_id: only list the orphaned jobs of this renderer
+        :return: list of dict representations of the jobs recorded in the registry
+        """
+        return self._job_registry().orphans(renderer_id)
+
+    def cleanup_orphans(self, renderer_id=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+        """
+        Deallocates resources and cancels all orphaned jobs at the same time
+        :param renderer_id: only clean up the orphaned jobs of this renderer
+        :param max_parallel: maximum number of sessions being deleted at the same time
+        :return: list of Status objects holding execution status of the HTTP requests
+        """
+        jobs = [self.registry.restore(self.spawn(), record) for record in self.list_orphans(renderer_id)]
+        for job in jobs:
+            # Orphaned sessions are cancelled, never returned to a session pool
+            job.session_pool = None
+        return parallel_map(lambda job: job.deallocate_and_cancel_job(), jobs, max_parallel)
+
+    def _job_registry(self):
+        if self.registry is None:
+            raise ValueError('JobLauncher has no job registry')
+        return self.registry
+
+    def tail_log(self, follow=True, interval=settings.LOG_TAIL_INTERVAL):
+        """
+        Yields the lines of the session log, only downloading what was not read yet
+        :param follow: keep yielding new lines as they are written, until the session is deleted
+        :param interval: seconds between two log requests while following
+        :return: generator of log lines
+        """
+        from .log_tail import LogTail
+        tail = LogTail(self)
+        if not follow:
+            return iter(tail.read())
+        return tail.follow(interval)
+
     def get_single_job_status(self):
         """
         Single API call to check what is the status of scheduled and launched job
@@ -218,26 +598,68 @@ class JobLauncher(ResourceAllocator):
             logger.info('Job was not scheduled and launched!')
             return -1
         try:
-            response = requests.get(self.launched_job_url + '/resourceconnector/v1/status')
-            data = response.json()
-            progress = int(data['progress'])
-            return progress
+            return self._job_progress()
         except Exception:
             print('Exception caught.')
             raise
 
-    def get_continuous_job_status(self):
+    def download_outputs(self, directory, names=None, max_connections=settings.DOWNLOAD_MAX_CONNECTIONS, verify=True):
+        """
+        Downloads the outputs of the completed job from its resource connector, streaming them to disk with
+        parallel range requests when supported, and resuming the downloads interrupted earlier
+        :param directory: directory the outputs are written to, created if needed
+        :param names: names of the outputs to download, all of them if None
+        :param max_connections: range requests sent at the same time for a file
+        :param verify: check the SHA-256 digests announced by the resource connector
+        :return: list of the downloaded OutputFiles
+        """
+        from .download import download_outputs
+        return download_outputs(self, directory, names, self._transport, max_connections, verify)
+
+    def download_many(self, directory, jobs=None, names=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES,
+                      max_connections=settings.DOWNLOAD_MAX_CONNECTIONS, verify=True):
+        """
+        Downloads the outputs of many completed jobs at the same time, each into a subdirectory named after
+        its job id or else its launched job URL
+        :param directory: directory holding the subdirectories of the jobs
+        :param jobs: JobLauncher handles of completed jobs, all sessions of this launcher if None
+        :param names: names of the outputs to download from every job, all of them if None
+        :param max_parallel: maximum number of jobs downloaded from at the same time
+        :param max_connections: range requests sent at the same time for a file
+        :param verify: check the SHA-256 digests announced by the resource connectors
+        :return: list of DownloadReports, in input order
+        """
+        if jobs is None:
+            jobs = list(self.sessions)
+        from .download import download_many
+        return download_many(jobs, directory, names, self._transport, max_parallel, max_connections, verify)
+
+    def subscribe(self, callback=None, monitor=None, modes=settings.SUBSCRIPTION_MODES):
+        """
+        Subscribes to the progress of the launched job, pushed by its resource connector when it supports it
+        and polled otherwise
+        :param callback: optional callback(job_status, event) called on progress changes, completion and failure
+        :param monitor: StatusMonitor polling the job if pushing is not possible, a private one if None
+        :param modes: push mechanisms tried in order
+        :return: started Subscription, whose iteration yields (event, progress) tuples
+        """
+        from .subscription import subscribe
+        return subscribe(self, callback, monitor, self._transport, modes)
+
+    def get_continuous_job_status(self, recorder=None):
         """
         Prints progress bar indicating the status of scheduled and launched job
+        :param recorder: ProgressRecorder recording the progress samples by launched job URL
         """
+        from tqdm import tqdm
         max_ = 100
         with tqdm(total=max_) as pbar:
             while True:
                 try:
-                    response = requests.get(self.launched_job_url + '/resourceconnector/v1/status')
-                    data = response.json()
-                    progress = int(data['progress'])
+                    progress = self._job_progress()
                     pbar.update(progress - pbar.n)
+                    if recorder is not None:
+                        recorder.record(self.launched_job_url, progress)
                 except Exception:
                     print('Exception caught.')
                     raise
@@ -246,4 +668,13 @@ class JobLauncher(ResourceAllocator):
                     print('Job completed!')
                     logger.info('Job scheduled and launched!')
                     break
-                time.sleep(.5)
\ No newline at end of file
+                time.sleep(.5)
+
+    def _job_progress(self):
+        """
+        Queries the resource connector of the launched job over the pooled transport
+        :return: Progress in percents
+        """
+        response = http_request(HTTP_METHOD_GET, self.launched_job_url, None,
+                                settings.DEFAULT_RESOURCE_CONNECTOR_STATUS, None, self._transport)
+        return int(response.contents['progress'])
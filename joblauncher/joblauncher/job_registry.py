@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Local SQLite registry of launched sessions, used to reattach to them after a restart
+"""
+
+import errno
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import joblauncher.settings as settings
+
+JOB_STATUS_CREATED = 'created'
+JOB_STATUS_SCHEDULED = 'scheduled'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_POOLED = 'pooled'
+JOB_STATUS_DELETED = 'deleted'
+
+# Jobs whose session may still hold an allocation on the cluster, or get one once out of the queue
+_LIVE_STATUSES = (JOB_STATUS_CREATED, JOB_STATUS_SCHEDULED, JOB_STATUS_RUNNING, JOB_STATUS_POOLED)
+
+_COLUMNS = ('job_id', 'renderer_id', 'session_url', 'cookies', 'allocation', 'resource_url',
+            'launched_job_url', 'status', 'hostname', 'pid', 'created_at', 'updated_at')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    renderer_id TEXT,
+    session_url TEXT,
+    cookies TEXT,
+    allocation TEXT,
+    resource_url TEXT,
+    launched_job_url TEXT,
+    status TEXT,
+    hostname TEXT,
+    pid INTEGER,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_renderer_id ON jobs (renderer_id);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+'''
+
+# Allocation settings of a JobLauncher which are recorded, and restored when reattaching
+_ALLOCATION_ATTRIBUTES = ('_exclusive_allocation', '_nb_nodes', '_nb_cpus', '_nb_gpus', '_allocation_time',
+                          '_reservation', '_queue', '_allocation_expiry')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+class JobRegistry(object):
+    """
+    Records the cookies, renderer id, allocation settings, URLs, timestamps and last known status of
+    every launched session in a local SQLite database, indexed by job id and renderer id
+    """
+
+    def __init__(self, path=settings.JOB_REGISTRY_PATH):
+        """
+        :param path: path of the database file, created if needed, or ':memory:'
+        """
+        path = os.path.expanduser(path)
+        if path != ':memory:' and os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """ Closes the database """
+        with self._lock:
+            self._connection.close()
+
+    def record(self, job, status=JOB_STATUS_RUNNING, detached=False):
+        """
+        Records the current state of a session, giving it a job id if it has none yet
+        :param job: JobLauncher handle of the session
+        :param status: last known status, one of the JOB_STATUS_* values
+        :param detached: the session is meant to outlive the recording process, e.g. when launched from
+        the command line, so it is never considered orphaned
+        :return: job id
+        """
+        if job.job_id is None:
+            job.job_id = uuid.uuid4().hex
+        now = time.time()
+        cookies = dict(job._cookies) if job._cookies is not None else None
+        allocation = dict((attribute.lstrip('_'), getattr(job, attribute, None))
+                          for attribute in _ALLOCATION_ATTRIBUTES)
+        with self._lock, self._connection:
+            created = self._connection.execute('SELECT created_at FROM jobs WHERE job_id = ?',
+                                               (job.job_id,)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO jobs (%s) VALUES (%s)' % (', '.join(_COLUMNS), ', '.join('?' * len(_COLUMNS))),
+                (job.job_id, job._renderer, job._url_session, json.dumps(cookies), json.dumps(allocation),
+                 job._resource_url, job.launched_job_url, status, socket.gethostname(),
+                 None if detached else os.getpid(),
+                 created[0] if created else now, now))
+        return job.job_id
+
+    def set_status(self, job_ids, status):
+        """
+        Updates the last known status of jobs
+        :param job_ids: job id or list of job ids
+        :param status: one of the JOB_STATUS_* values
+        """
+        if not isinstance(job_ids, (list, tuple)):
+            job_ids = [job_ids]
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany('UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?',
+                                         [(status, now, job_id) for job_id in job_ids])
+
+    def get(self, job_id):
+        """
+        :param job_id: job id
+        :return: dict representation of the recorded job, or None
+        """
+        jobs = self._select('WHERE job_id = ?', (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(self, renderer_id=None, status=None):
+        """
+        :param renderer_id: only list the jobs of this renderer
+        :param status: only list the jobs with this status, or any of these statuses
+        :return: list of dict representations of the recorded jobs, oldest first
+        """
+        clauses = []
+        parameters = []
+        if renderer_id is not None:
+            clauses.append('renderer_id = ?')
+            parameters.append(renderer_id)
+        if status is not None:
+            statuses = list(status) if isinstance(status, (list, tuple)) else [status]
+            clauses.append('status IN (%s)' % ', '.join('?' * len(statuses)))
+            parameters.extend(statuses)
+        return self._select('WHERE ' + ' AND '.join(clauses) if clauses else '', parameters)
+
+    def orphans(self, renderer_id=None):
+        """
+        Lists the jobs which may still hold an allocation, but were recorded by a process of this host
+        which is not running any more
+        :param renderer_id: only list the orphaned jobs of this renderer
+        :return: list of dict representations of the orphaned jobs
+        """
+        hostname = socket.gethostname()
+        return [job for job in self.list(renderer_id, _LIVE_STATUSES)
+                if job['hostname'] == hostname and job['pid'] is not None and job['pid'] != os.getpid() and
+                not _process_alive(job['pid'])]
+
+    def remove(self, job_ids):
+        """
+        Forgets jobs
+        :param job_ids: job id or list of job ids
+        """
+        if not isinstance(job_ids, (list, tuple)):
+            job_ids = [job_ids]
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM jobs WHERE job_id = ?', [(job_id,) for job_id in job_ids])
+
+    def purge(self):
+        """
+        Forgets the jobs whose session is known to be gone
+        :return: number of jobs forgotten
+        """
+        with self._lock, self._connection:
+            return self._connection.execute('DELETE FROM jobs WHERE status = ?', (JOB_STATUS_DELETED,)).rowcount
+
+    def restore(self, job, record):
+        """
+        Restores the session state of a recorded job into a JobLauncher handle, without any request
+        :param job: JobLauncher handle
+        :param record: dict representation of the recorded job
+        :return: the JobLauncher handle
+        """
+        job.job_id = record['job_id']
+        job._renderer = record['renderer_id']
+        job._url_session = record['session_url']
+        job._cookies = json.loads(record['cookies'])
+        # A session recorded while queued resumes waiting for its resources instead of being scheduled again
+        job._scheduled = record['status'] != JOB_STATUS_CREATED
+        job._resource_url = record['resource_url']
+        job.launched_job_url = record['launched_job_url']
+        for key, value in json.loads(record['allocation']).items():
+            setattr(job, '_' + key, value)
+        return job
+
+    def _select(self, where, parameters):
+        with self._lock:
+            rows = self._connection.execute('SELECT * FROM jobs %s ORDER BY created_at' % where,
+                                            parameters).fetchall()
+        return [dict(zip(row.keys(), tuple(row))) for row in rows]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Incremental tail of session logs
+"""
+
+import time
+
+import joblauncher.settings as settings
+from joblauncher.utils import parallel_map, HTTP_STATUS_OK
+
+HTTP_STATUS_PARTIAL_CONTENT = 206
+HTTP_STATUS_RANGE_NOT_SATISFIABLE = 416
+
+# Number of already read log bytes kept to detect a log being truncated or replaced, range requests
+# start that many bytes before the read offset to compare them
+_FINGERPRINT_SIZE = 64
+
+
+def _log_bytes(status):
+    """
+    Returns the log of a session_log response as UTF-8 bytes. The undecoded body is used whenever
+    available, since a byte range may end in the middle of a character.
+    """
+    if status.raw is not None and status.code != HTTP_STATUS_OK:
+        return status.raw
+    contents = status.contents
+    if isinstance(contents, dict):
+        contents = contents.get('contents', '')
+    if not isinstance(contents, bytes):
+        contents = contents.encode('utf-8')
+    return contents
+
+
+def _character_boundary(data):
+    """ Returns the length of the UTF-8 bytes without their trailing incomplete character """
+    tail = bytearray(data[-3:])
+    for back in range(1, len(tail) + 1):
+        byte = tail[-back]
+        if byte & 0xC0 == 0x80:
+            continue
+        if byte >= 0xC0 and back < (2 if byte < 0xE0 else 3 if byte < 0xF0 else 4):
+            return len(data) - back
+        break
+    return len(data)
+
+
+def _range_total(status):
+    """ Returns the log size announced by the Content-Range header of a 416 response, or None """
+    content_range = (status.headers or {}).get('Content-Range') or ''
+    try:
+        return int(content_range.rpartition('/')[2])
+    except ValueError:
+        return None
+
+
+class LogTail(object):
+    """
+    Reads the new lines of a session log since the last read. Uses byte range requests when the
+    service supports them, otherwise diffs the whole log client-side, only keeping the read offset,
+    a short fingerprint and the last incomplete line in memory.
+    """
+
+    def __init__(self, allocator, offset=0, max_line_length=settings.LOG_TAIL_MAX_LINE_LENGTH):
+        """
+        :param allocator: ResourceAllocator holding the session
+        :param offset: number of log bytes to skip
+        :param max_line_length: bytes after which an incomplete line is returned anyway
+        """
+        self.allocator = allocator
+        self.offset = offset
+        self.max_line_length = max_line_length
+        self.finished = False
+        self._fingerprint = b''
+        self._partial = b''
+
+    def read(self):
+        """
+        Requests the log once
+        :return: list of the complete lines added since the last read
+        """
+        start = self.offset - len(self._fingerprint)
+        status = self.allocator.session_log_range(start)
+        if status.code == HTTP_STATUS_PARTIAL_CONTENT:
+            data = _log_bytes(status)
+            if not data.startswith(self._fingerprint):
+                # The log was replaced, read it again from the start
+                self._reset()
+                return self.read()
+            data = data[len(self._fingerprint):]
+        elif status.code == HTTP_STATUS_RANGE_NOT_SATISFIABLE:
+            total = _range_total(status)
+            if (start if total is None else total) < self.offset:
+                # The log was truncated below the read offset, read it again from the start
+                self._reset()
+                return self.read()
+            data = b''
+        elif status.code == HTTP_STATUS_OK:
+            data = self._diff(_log_bytes(status))
+        else:
+            # The session is gone, e.g. deleted after the job completed
+            self.finished = True
+            data = b''
+        self.offset += len(data)
+        self._fingerprint = (self._fingerprint + data)[-_FINGERPRINT_SIZE:]
+        return self._lines(data)
+
+    def follow(self, interval=settings.LOG_TAIL_INTERVAL, stop=None):
+        """
+        Yields the lines of the log as they are written, until the session is gone or stop() is True
+        :param interval: seconds between two log requests
+        :param stop: optional function returning True once following should stop
+        """
+        while True:
+            for line in self.read():
+                yield line
+            if self.finished or (stop is not None and stop()):
+                return
+            time.sleep(interval)
+
+    def _diff(self, log):
+        """ Returns the part of a whole log which was not read yet """
+        start = self.offset - len(self._fingerprint)
+        if len(log) < self.offset or log[start:self.offset] != self._fingerprint:
+            # The log was truncated or replaced, read it again from the start
+            self._reset()
+            return log
+        return log[self.offset:]
+
+    def _reset(self):
+        self.offset = 0
+        self._fingerprint = b''
+        self._partial = b''
+
+    def _lines(self, data):
+        pieces = (self._partial + data).split(b'\n')
+        self._partial = pieces.pop()
+        if len(self._partial) > self.max_line_length:
+            # Never split a character of a long line across two reads
+            end = _character_boundary(self._partial)
+            pieces.append(self._partial[:end])
+            self._partial = self._partial[end:]
+        return [piece.decode('utf-8', 'replace') for piece in pieces]
+
+
+def follow_logs(allocators, interval=settings.LOG_TAIL_INTERVAL,
+                max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+    """
+    Follows the logs of several sessions at once, until all of them are gone
+    :param allocators: ResourceAllocator or JobLauncher handles of the sessions
+    :param interval: seconds between two rounds of log requests
+    :param max_parallel: maximum number of log requests sent at the same time
+    :return: generator of (allocator, line) tuples
+    """
+    tails = [LogTail(allocator) for allocator in allocators]
+    while tails:
+        for tail, lines in zip(tails, parallel_map(LogTail.read, tails, max_parallel)):
+            for line in lines:
+                yield tail.allocator, line
+        tails = [tail for tail in tails if not tail.finished]
+        if tails:
+            time.sleep(interval)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Per-endpoint request metrics recorded by http_request
+"""
+
+import json
+import threading
+
+import joblauncher.settings as settings
+
+
+class _Series(object):
+    """ Counters and latency histogram of the requests sharing the same labels """
+    __slots__ = ('count', 'latency_sum', 'buckets', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, nb_buckets):
+        self.count = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * nb_buckets
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+class Metrics(object):
+    """
+    Records the count, latency histogram and payload sizes of HTTP requests, labelled by method,
+    logical operation and status code. Recording costs a single attribute check while disabled.
+    """
+
+    def __init__(self, enabled=False, buckets=settings.METRICS_LATENCY_BUCKETS):
+        """
+        :param enabled: whether requests are recorded
+        :param buckets: upper bounds in seconds of the latency histogram buckets
+        """
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, operation, code, latency, bytes_sent=0, bytes_received=0):
+        """
+        Records one request
+        :param method: HTTP method
+        :param operation: logical operation, e.g. 'status' or 'schedule'
+        :param code: HTTP status code, or 'error' if no response was received
+        :param latency: duration of the request in seconds
+        :param bytes_sent: size of the request body
+        :param bytes_received: size of the response body
+        """
+        key = (method, operation, str(code))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.count += 1
+            series.latency_sum += latency
+            series.bytes_sent += bytes_sent
+            series.bytes_received += bytes_received
+            for index, bound in enumerate(self.buckets):
+                if latency <= bound:
+                    series.buckets[index] += 1
+                    break
+
+    def reset(self):
+        """ Forgets every recorded request """
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self):
+        """
+        :return: list of dicts, one per (method, operation, code), with cumulative histogram buckets
+        """
+        with self._lock:
+            items = sorted(self._series.items())
+            result = []
+            for (method, operation, code), series in items:
+                cumulative = []
+                total = 0
+                for bound, count in zip(self.buckets, series.buckets):
+                    total += count
+                    cumulative.append([bound, total])
+                result.append({
+                    'method': method,
+                    'operation': operation,
+                    'code': code,
+                    'count': series.count,
+                    'latency_sum': series.latency_sum,
+                    'latency_buckets': cumulative,
+                    'bytes_sent': series.bytes_sent,
+                    'bytes_received': series.bytes_received,
+                })
+        return result
+
+    def to_json(self):
+        """ :return: JSON snapshot of the recorded requests """
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """ :return: snapshot of the recorded requests in the Prometheus text exposition format """
+        snapshot = self.snapshot()
+        lines = ['# HELP joblauncher_http_requests_total HTTP requests sent to the JobManager and jobs.',
+                 '# TYPE joblauncher_http_requests_total counter']
+        for series in snapshot:
+            lines.append('joblauncher_http_requests_total{%s} %d' % (_labels(series), series['count']))
+
+        lines.extend(['# HELP joblauncher_http_request_duration_seconds Latency of the HTTP requests.',
+                      '# TYPE joblauncher_http_request_duration_seconds histogram'])
+        for series in snapshot:
+            labels = _labels(series)
+            for bound, count in series['latency_buckets']:
+                lines.append('joblauncher_http_request_duration_seconds_bucket{%s,le="%s"} %d' % (
+                    labels, repr(float(bound)), count))
+            lines.append('joblauncher_http_request_duration_seconds_bucket{%s,le="+Inf"} %d' % (
+                labels, series['count']))
+            lines.append('joblauncher_http_request_duration_seconds_sum{%s} %r' % (labels, series['latency_sum']))
+            lines.append('joblauncher_http_request_duration_seconds_count{%s} %d' % (labels, series['count']))
+
+        lines.extend(['# HELP joblauncher_http_bytes_total Payload bytes of the HTTP requests.',
+                      '# TYPE joblauncher_http_bytes_total counter'])
+        for series in snapshot:
+            labels = _labels(series)
+            lines.append('joblauncher_http_bytes_total{%s,direction="sent"} %d' % (labels, series['bytes_sent']))
+            lines.append('joblauncher_http_bytes_total{%s,direction="received"} %d' % (
+                labels, series['bytes_received']))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(series):
+    return 'method="%s",operation="%s",code="%s"' % (series['method'], series['operation'], series['code'])
+
+
+_default_metrics = Metrics()
+
+
+def get_metrics():
+    """ Returns the metrics recorded by http_request, disabled until enabled with enable_metrics() """
+    return _default_metrics
+
+
+def enable_metrics(enabled=True):
+    """
+    Starts or stops recording the metrics of every request
+    :return: the recorded Metrics
+    """
+    _default_metrics.enabled = enabled
+    return _default_metrics
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Client-side bin-packing of small jobs into shared allocations, so that hundreds of one-CPU jobs wait
+in the scheduler queue a few times instead of hundreds of times
+"""
+
+import json
+
+import joblauncher.settings as settings
+from joblauncher.sweep import SweepSpec, config_id, merge_payloads
+
+# Payload keys which may differ between jobs packed together
+_RESOURCE_KEYS = ('id', 'nb_nodes', 'nb_cpus', 'nb_gpus', 'exclusive', 'scheduler_rest_parameters_format')
+
+
+def _resources(payload):
+    return (payload.get('nb_nodes') or 1, payload.get('nb_cpus') or 1, payload.get('nb_gpus') or 0)
+
+
+def _signature(payload):
+    """ Jobs can only share an allocation if they run with the same modules, environment, queue, etc. """
+    return json.dumps(dict((key, value) for key, value in payload.items() if key not in _RESOURCE_KEYS),
+                      sort_keys=True, default=str)
+
+
+class PackedAllocation(object):
+    """ Allocation shared by packed jobs, whose script commands run side by side """
+
+    def __init__(self, nb_nodes, nb_cpus, nb_gpus):
+        """
+        :param nb_nodes: number of nodes of the allocation
+        :param nb_cpus: CPUs available to the packed jobs
+        :param nb_gpus: GPUs available to the packed jobs
+        """
+        self.nb_nodes = nb_nodes
+        self.nb_cpus = nb_cpus
+        self.nb_gpus = nb_gpus
+        self.payloads = []
+        self.used_cpus = 0
+        self.used_gpus = 0
+
+    def fits(self, payload):
+        _, cpus, gpus = _resources(payload)
+        return self.used_cpus + cpus <= self.nb_cpus and self.used_gpus + gpus <= self.nb_gpus
+
+    def add(self, payload):
+        _, cpus, gpus = _resources(payload)
+        self.payloads.append(payload)
+        self.used_cpus += cpus
+        self.used_gpus += gpus
+
+    def spec(self, exclusive=False):
+        """
+        :param exclusive: request the whole nodes, instead of the resources used by the packed jobs
+        :return: SweepSpec launching the packed jobs in a single allocation
+        """
+        ids = [payload['id'] for payload in self.payloads]
+        if len(self.payloads) == 1:
+            return SweepSpec(ids[0], ids, self.payloads[0])
+        payload = merge_payloads(self.payloads, _RESOURCE_KEYS)
+        payload['nb_nodes'] = self.nb_nodes
+        payload['nb_cpus'] = self.nb_cpus if exclusive else self.used_cpus
+        payload['nb_gpus'] = self.nb_gpus if exclusive else self.used_gpus
+        payload['exclusive'] = exclusive
+        # Derived from the merged payload, so changing a packed job never reuses a stale configuration
+        payload['id'] = config_id('packed', payload)
+        return SweepSpec(payload['id'], ids, payload)
+
+
+class PackingPlan(object):
+    """ Packed allocations of a batch of jobs, and how well they use the requested resources """
+
+    def __init__(self, allocations, exclusive):
+        self.allocations = allocations
+        self.exclusive = exclusive
+
+    @property
+    def nb_jobs(self):
+        return sum(len(allocation.payloads) for allocation in self.allocations)
+
+    def specs(self):
+        """ :return: list of SweepSpec, one per allocation, to be launched with launch_sweep() """
+        return [allocation.spec(self.exclusive) for allocation in self.allocations]
+
+    def utilization(self):
+        """
+        :return: dict holding the number of jobs and allocations, and the fraction of the CPUs and GPUs
+        of the allocations requested by the packed jobs
+        """
+        used_cpus = sum(allocation.used_cpus for allocation in self.allocations)
+        used_gpus = sum(allocation.used_gpus for allocation in self.allocations)
+        specs = self.specs()
+        cpus = sum(spec.payload.get('nb_cpus') or 1 for spec in specs)
+        gpus = sum(spec.payload.get('nb_gpus') or 0 for spec in specs)
+        return {
+            'jobs': self.nb_jobs,
+            'allocations': len(self.allocations),
+            'cpus': cpus,
+            'gpus': gpus,
+            'cpu_utilization': float(used_cpus) / cpus if cpus else 0.0,
+            'gpu_utilization': float(used_gpus) / gpus if gpus else 0.0,
+        }
+
+    def __str__(self):
+        utilization = self.utilization()
+        lines = ['%(jobs)d jobs packed into %(allocations)d allocations of %(cpus)d CPUs and %(gpus)d GPUs, '
+                 'CPU utilization %(cpu_utilization).0f%%, GPU utilization %(gpu_utilization).0f%%' % dict(
+                     utilization, cpu_utilization=100 * utilization['cpu_utilization'],
+                     gpu_utilization=100 * utilization['gpu_utilization'])]
+        for allocation in self.allocations:
+            lines.append('  %2d jobs on %d node(s): %d/%d CPUs, %d/%d GPUs' % (
+                len(allocation.payloads), allocation.nb_nodes, allocation.used_cpus, allocation.nb_cpus,
+                allocation.used_gpus, allocation.nb_gpus))
+        return '\n'.join(lines)
+
+
+def pack_jobs(payloads, node_cpus=settings.PACKING_NODE_CPUS, node_gpus=settings.PACKING_NODE_GPUS,
+              nb_nodes=1, exclusive=False):
+    """
+    Packs jobs into as few allocations as first-fit decreasing finds, largest jobs first. Only jobs
+    with the same modules, environment, queue and other non-resource settings share an allocation,
+    and jobs spanning several nodes or larger than an allocation keep their own.
+    :param payloads: renderer payloads, or SweepSpecs e.g. from expand_sweep(), with their nb_cpus and
+    nb_gpus, and a --script-command in their scheduler_rest_parameters_format
+    :param node_cpus: CPUs of a node of the cluster
+    :param node_gpus: GPUs of a node of the cluster
+    :param nb_nodes: nodes of a shared allocation, which can only be 1 as the merged script command runs
+    on the first node of the allocation
+    :param exclusive: request whole nodes for the shared allocations
+    :return: PackingPlan
+    """
+    if nb_nodes != 1:
+        raise ValueError('Packed jobs run side by side on the first node of their allocation, nb_nodes must be 1')
+    groups = {}
+    allocations = []
+    for payload in payloads:
+        if isinstance(payload, SweepSpec):
+            payload = payload.payload
+        nodes, cpus, gpus = _resources(payload)
+        if nodes > 1 or cpus > node_cpus * nb_nodes or gpus > node_gpus * nb_nodes:
+            allocation = PackedAllocation(nodes, cpus, gpus)
+            allocation.add(payload)
+            allocations.append(allocation)
+        else:
+            groups.setdefault(_signature(payload), []).append(payload)
+
+    for group in groups.values():
+        packed = []
+        for payload in sorted(group, key=lambda payload: _resources(payload)[::-1], reverse=True):
+            for allocation in packed:
+                if allocation.fits(payload):
+                    break
+            else:
+                allocation = PackedAllocation(nb_nodes, node_cpus * nb_nodes, node_gpus * nb_nodes)
+                packed.append(allocation)
+            allocation.add(payload)
+        allocations.extend(packed)
+    return PackingPlan(allocations, exclusive)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Bounded time series of the progress of jobs, with rate, ETA and stall estimation
+"""
+
+import csv
+import threading
+import time
+from array import array
+
+import joblauncher.settings as settings
+
+
+def _numpy():
+    """ Returns numpy if it is installed, which is only imported when estimating or exporting """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ProgressSeries(object):
+    """
+    Ring buffer of the (timestamp, progress) samples of a job, backed by two arrays of fixed size.
+    Samples repeating the progress of a plateau only move the end of the plateau, so that days of
+    polling a job which does not progress do not push older samples out.
+    """
+    __slots__ = ('capacity', 'changed_at', '_timestamps', '_progress', '_start', '_size')
+
+    def __init__(self, capacity=settings.PROGRESS_HISTORY_SIZE):
+        """
+        :param capacity: maximum number of samples kept, the oldest ones being overwritten
+        """
+        if capacity < 2:
+            raise ValueError('A progress series holds at least 2 samples')
+        self.capacity = capacity
+        self.changed_at = None
+        self._timestamps = array('d', [0.0]) * capacity
+        self._progress = array('f', [0.0]) * capacity
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, progress):
+        """
+        Records a sample
+        :param timestamp: seconds since the epoch, not older than the last sample
+        :param progress: progress in percents
+        """
+        size = self._size
+        if size and progress == self._progress[self._index(size - 1)]:
+            if size >= 2 and progress == self._progress[self._index(size - 2)]:
+                # Extends the plateau instead of adding a sample
+                self._timestamps[self._index(size - 1)] = timestamp
+                return
+        else:
+            self.changed_at = timestamp
+        if size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+        index = self._index(self._size - 1)
+        self._timestamps[index] = timestamp
+        self._progress[index] = progress
+
+    def samples(self):
+        """ :return: list of the (timestamp, progress) samples, oldest first """
+        return [(self._timestamps[index], self._progress[index]) for index in map(self._index, range(self._size))]
+
+    def last(self):
+        """ :return: last (timestamp, progress) sample, or None """
+        if not self._size:
+            return None
+        index = self._index(self._size - 1)
+        return self._timestamps[index], self._progress[index]
+
+    def since(self, timestamp):
+        """ :return: first (timestamp, progress) sample not older than the given timestamp, or the last one """
+        index = self._index(self._position(timestamp))
+        return self._timestamps[index], self._progress[index]
+
+    def at(self, timestamp):
+        """
+        :return: (timestamp, progress) at the given timestamp, interpolated between the samples around it,
+        which keeps the progress of a plateau all along it; the first sample if the timestamp is older
+        """
+        position = self._position(timestamp)
+        after = self._index(position)
+        if position == 0 or self._timestamps[after] <= timestamp:
+            return self._timestamps[after], self._progress[after]
+        before = self._index(position - 1)
+        fraction = (timestamp - self._timestamps[before]) / (self._timestamps[after] - self._timestamps[before])
+        return timestamp, self._progress[before] + fraction * (self._progress[after] - self._progress[before])
+
+    def window(self, seconds=settings.PROGRESS_RATE_WINDOW):
+        """
+        :param seconds: duration of the window, ending at the last sample
+        :return: (first timestamp, first progress, last timestamp, last progress) of the window, or None
+        """
+        last = self.last()
+        if last is None:
+            return None
+        return self.at(last[0] - seconds) + last
+
+    def _position(self, timestamp):
+        """ :return: position of the first sample not older than the given timestamp, or of the last one """
+        low, high = 0, self._size - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._index(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _index(self, position):
+        return (self._start + position) % self.capacity
+
+
+class ProgressRecorder(object):
+    """
+    Records the progress samples of many jobs, estimates their progress rate, ETA and how long they
+    have been stalled, with numpy when it is installed, and exports the samples for offline analysis
+    """
+
+    def __init__(self, capacity=settings.PROGRESS_HISTORY_SIZE, window=settings.PROGRESS_RATE_WINDOW,
+                 stall_timeout=settings.PROGRESS_STALL_TIMEOUT):
+        """
+        :param capacity: maximum number of samples kept per job
+        :param window: seconds of the most recent samples the rates are estimated from
+        :param stall_timeout: seconds without progress after which a running job is stalled
+        """
+        self.capacity = capacity
+        self.window = window
+        self.stall_timeout = stall_timeout
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, job, progress, timestamp=None):
+        """
+        Records a progress sample
+        :param job: key of the job, e.g. its launched job URL
+        :param progress: progress in percents
+        :param timestamp: seconds since the epoch, now if None
+        """
+        with self._lock:
+            series = self._series.get(job)
+            if series is None:
+                series = self._series[job] = ProgressSeries(self.capacity)
+            series.append(time.time() if timestamp is None else timestamp, progress)
+
+    def series(self, job):
+        """ :return: ProgressSeries of a job """
+        return self._series[job]
+
+    def jobs(self):
+        """ :return: keys of the recorded jobs """
+        with self._lock:
+            return list(self._series)
+
+    def samples(self):
+        """ :return: dict mapping every job to the list of its (timestamp, progress) samples, oldest first """
+        with self._lock:
+            return dict((job, series.samples()) for job, series in self._series.items())
+
+    def discard(self, job):
+        """ Forgets the samples of a job """
+        with self._lock:
+            self._series.pop(job, None)
+
+    def estimates(self, now=None):
+        """
+        Estimates the rate and the remaining time of every recorded job
+        :param now: seconds since the epoch the stalls are measured at, now if None
+        :return: dict mapping every job to a dict holding its progress, rate in percents per second,
+        eta in seconds and stalled_for in seconds, rate and eta being None when unknown
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            jobs = [(job, series.window(self.window), series.changed_at) for job, series in self._series.items()
+                    if len(series)]
+        numpy = _numpy()
+        if numpy is not None and jobs:
+            windows = numpy.array([window + (changed_at,) for _, window, changed_at in jobs], dtype=float)
+            elapsed = windows[:, 2] - windows[:, 0]
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                rates = numpy.where(elapsed > 0, (windows[:, 3] - windows[:, 1]) / elapsed, numpy.nan)
+                etas = numpy.where(rates > 0, (100 - windows[:, 3]) / rates, numpy.nan)
+            rows = zip(windows[:, 3].tolist(), rates.tolist(), etas.tolist(), (now - windows[:, 4]).tolist())
+        else:
+            rows = [_estimate(window, changed_at, now) for _, window, changed_at in jobs]
+        return dict((job, {'progress': progress, 'rate': _known(rate), 'eta': _known(eta), 'stalled_for': stalled})
+                    for (job, _, _), (progress, rate, eta, stalled) in zip(jobs, rows))
+
+    def stalled(self, now=None):
+        """
+        :param now: seconds since the epoch the stalls are measured at, now if None
+        :return: list of the jobs which did not complete and did not progress for stall_timeout seconds
+        """
+        return [job for job, estimate in self.estimates(now).items()
+                if estimate['progress'] < 100 and estimate['stalled_for'] >= self.stall_timeout]
+
+    def to_csv(self, path_or_file):
+        """
+        Writes the samples of every job as job,timestamp,progress rows
+        :param path_or_file: path of the CSV file, or a file object opened for writing text
+        """
+        if not hasattr(path_or_file, 'write'):
+            with open(path_or_file, 'w') as output:
+                return self.to_csv(output)
+        writer = csv.writer(path_or_file)
+        writer.writerow(('job', 'timestamp', 'progress'))
+        for job, samples in sorted(self.samples().items()):
+            for timestamp, progress in samples:
+                writer.writerow((job, repr(timestamp), repr(progress)))
+
+    def to_numpy(self):
+        """
+        :return: dict mapping every job to an array of its samples, with a timestamp and a progress column
+        """
+        numpy = _numpy()
+        if numpy is None:
+            raise ImportError('Exporting to NumPy requires numpy')
+        return dict((job, numpy.array(samples, dtype=float).reshape(-1, 2)) for job, samples in self.samples().items())
+
+
+def _estimate(window, changed_at, now):
+    first_timestamp, first_progress, last_timestamp, last_progress = window
+    elapsed = last_timestamp - first_timestamp
+    rate = (last_progress - first_progress) / elapsed if elapsed > 0 else None
+    eta = (100 - last_progress) / rate if rate is not None and rate > 0 else None
+    return last_progress, rate, eta, now - changed_at
+
+
+def _known(value):
+    """ Maps the unknown estimates of numpy, NaN, to None """
+    return None if value is None or value != value else value
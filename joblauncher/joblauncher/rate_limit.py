@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Client-side rate limiting and circuit breaking of the requests sent to the JobManager and jobs
+"""
+
+import threading
+import time
+
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+import joblauncher.settings as settings
+from joblauncher.errors import CircuitOpenError, HTTP_OVERLOAD_CODES
+
+OPERATION_STATUS = 'status'
+OPERATION_SCHEDULE = 'schedule'
+OPERATION_SESSION = 'session'
+OPERATION_CONFIG = 'config'
+OPERATION_OTHER = 'other'
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half-open'
+
+def operation_class(url, command=None):
+    """
+    Classifies a request for rate limiting
+    :param url: URL of the request, without the command
+    :param command: command appended to the URL, if any
+    :return: one of the OPERATION_* values
+    """
+    command = (command or '').strip('/')
+    if command.endswith('status'):
+        return OPERATION_STATUS
+    if command == 'schedule':
+        return OPERATION_SCHEDULE
+    segments = urlsplit(url).path.rstrip('/').split('/')
+    if segments[-1] == settings.DEFAULT_ALLOCATOR_CONFIG_PREFIX:
+        return OPERATION_CONFIG
+    if segments[-1] == settings.DEFAULT_ALLOCATOR_SESSION_PREFIX and not command:
+        return OPERATION_SESSION
+    return OPERATION_OTHER
+
+
+class TokenBucket(object):
+    """
+    Token bucket whose rate is halved when the server fails and recovers additively on success
+    """
+
+    def __init__(self, rate, burst):
+        """
+        :param rate: tokens added per second while the server is healthy
+        :param burst: maximum number of tokens
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Takes a token, waiting for one to be available """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens are taken ahead, so that waiting requests queue up in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self):
+        """ Multiplicatively decreases the rate, after a failure """
+        with self._lock:
+            self.rate = max(self.rate * settings.RATE_LIMIT_BACKOFF,
+                            self.max_rate * settings.RATE_LIMIT_MIN_FRACTION)
+
+    def reward(self):
+        """ Additively increases the rate back, after a success """
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.rate + self.max_rate * settings.RATE_LIMIT_RECOVERY, self.max_rate)
+
+
+class CircuitBreaker(object):
+    """
+    Opens after consecutive failures, rejecting requests until reset_timeout elapsed, then lets a
+    single probe request through at a time until one succeeds
+    """
+
+    def __init__(self, failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT):
+        """
+        :param failure_threshold: number of consecutive failures opening the circuit
+        :param reset_timeout: seconds the circuit stays open, unless the server asked for longer
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_until = 0
+        self._probe_until = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.failures < self.failure_threshold and self._opened_until == 0:
+            return CIRCUIT_CLOSED
+        if time.time() < self._opened_until:
+            return CIRCUIT_OPEN
+        return CIRCUIT_HALF_OPEN
+
+    def before_request(self):
+        """ Raises CircuitOpenError if the request may not be sent """
+        with self._lock:
+            state = self.state
+            now = time.time()
+            # A probe whose outcome was never recorded stops blocking the others after reset_timeout
+            if state == CIRCUIT_OPEN or (state == CIRCUIT_HALF_OPEN and now < self._probe_until):
+                raise CircuitOpenError('Circuit open, the server keeps failing')
+            if state == CIRCUIT_HALF_OPEN:
+                self._probe_until = now + self.reset_timeout
+
+    def record(self, success, retry_after=None):
+        """
+        Records the outcome of a request
+        :param success: whether the server answered without failing
+        :param retry_after: seconds the server asked to wait for, if any
+        """
+        with self._lock:
+            self._probe_until = 0
+            if success:
+                self.failures = 0
+                self._opened_until = 0
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                retry_after = max(retry_after or 0, self.reset_timeout)
+            if retry_after is not None:
+                self._opened_until = time.time() + retry_after
+
+
+class RateLimiter(object):
+    """
+    Shares a token bucket per service and operation class, and a circuit breaker per service, between
+    all the requests of the process. Costs a single attribute check while disabled.
+    """
+
+    def __init__(self, enabled=False, limits=None,
+                 failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT):
+        """
+        :param enabled: whether requests are limited
+        :param limits: dict mapping OPERATION_* values to (requests per second, burst)
+        :param failure_threshold: number of consecutive failures opening the circuit of a service
+        :param reset_timeout: seconds the circuit of a failing service stays open
+        """
+        self.enabled = enabled
+        self.limits = dict(settings.RATE_LIMITS, **(limits or {}))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url, command=None):
+        """ :return: TokenBucket shared by the requests of the same service and operation class """
+        key = (_service(url), operation_class(url, command))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*self.limits[key[1]])
+        return bucket
+
+    def breaker(self, url):
+        """ :return: CircuitBreaker of the service of a URL """
+        key = _service(url)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def acquire(self, url, command=None):
+        """
+        Waits for a request to be allowed
+        :param url: URL of the request, without the command
+        :param command: command appended to the URL, if any
+        :raise CircuitOpenError: if the service keeps failing
+        """
+        self.breaker(url).before_request()
+        self.bucket(url, command).acquire()
+
+    def record(self, url, command=None, code=None, headers=None):
+        """
+        Records the outcome of a request, slowing down and opening the circuit on failures
+        :param url: URL of the request, without the command
+        :param command: command appended to the URL, if any
+        :param code: HTTP status code, or None if no response was received
+        :param headers: response headers
+        """
+        bucket = self.bucket(url, command)
+        if code is not None and code < 500 and code not in HTTP_OVERLOAD_CODES:
+            bucket.reward()
+            self.breaker(url).record(True)
+            return
+        bucket.penalize()
+        self.breaker(url).record(False, _retry_after(headers))
+
+    def reset(self):
+        """ Forgets every bucket and circuit """
+        with self._lock:
+            self._buckets = {}
+            self._breakers = {}
+
+
+def _service(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.netloc
+
+
+def _retry_after(headers):
+    try:
+        return float((headers or {}).get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+_default_rate_limiter = RateLimiter()
+
+
+def get_rate_limiter():
+    """ Returns the rate limiter of http_request, disabled until enabled with enable_rate_limiting() """
+    return _default_rate_limiter
+
+
+def enable_rate_limiting(enabled=True):
+    """
+    Starts or stops limiting the rate of every request
+    :return: the shared RateLimiter
+    """
+    _default_rate_limiter.enabled = enabled
+    return _default_rate_limiter
@@ -30,10 +30,21 @@ The resource allocator manages sessions and jobs on the cluster
 
 
 from joblauncher.utils import http_request, HTTP_METHOD_GET, HTTP_METHOD_PUT, \
-    HTTP_METHOD_DELETE, HTTP_METHOD_POST, HTTP_STATUS_OK, Status
+    HTTP_METHOD_DELETE, HTTP_METHOD_POST, HTTP_STATUS_OK, Status, parallel_map
+from joblauncher.config_cache import ConfigCache
+from joblauncher.errors import HTTP_OVERLOAD_CODES, ServiceError, ServiceOverloadedError, SessionFailedError, \
+    is_transient, service_error
+from joblauncher.retry import RetryPolicy
+from joblauncher.schema import SCHEMA_CONFIG, SCHEMA_SCHEDULE, get_schema_registry
+from joblauncher.tracing import get_tracer
 import joblauncher.settings as settings
+from contextlib import contextmanager
+import logging
+import random
 import time
 
+logger = logging.getLogger(__name__)
+
 SESSION_STATUS_STOPPED = 0
 SESSION_STATUS_SCHEDULING = 1
 SESSION_STATUS_SCHEDULED = 2
@@ -43,6 +54,93 @@ SESSION_STATUS_RUNNING = 5
 SESSION_STATUS_STOPPING = 6
 SESSION_STATUS_FAILED = 7
 
+SESSION_STATUS_NAMES = {
+    SESSION_STATUS_STOPPED: 'STOPPED',
+    SESSION_STATUS_SCHEDULING: 'SCHEDULING',
+    SESSION_STATUS_SCHEDULED: 'SCHEDULED',
+    SESSION_STATUS_GETTING_HOSTNAME: 'GETTING_HOSTNAME',
+    SESSION_STATUS_STARTING: 'STARTING',
+    SESSION_STATUS_RUNNING: 'RUNNING',
+    SESSION_STATUS_STOPPING: 'STOPPING',
+    SESSION_STATUS_FAILED: 'FAILED',
+}
+
+# Once the scheduler gave a node, the wrapper is usually up within seconds
+_SESSION_STARTING_STATES = (SESSION_STATUS_GETTING_HOSTNAME, SESSION_STATUS_STARTING)
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class WaitPolicy(object):
+    """
+    Decides how long to wait between two session status polls: polls quickly at first, then backs
+    off exponentially with jitter up to a maximum interval while the session waits in the scheduler
+    queue, until an overall deadline is reached
+    """
+
+    def __init__(self,
+                 deadline=settings.SESSION_WAIT_DEADLINE,
+                 initial_interval=settings.SESSION_WAIT_INITIAL_INTERVAL,
+                 max_interval=settings.SESSION_WAIT_MAX_INTERVAL,
+                 backoff=settings.SESSION_WAIT_BACKOFF,
+                 jitter=settings.SESSION_WAIT_JITTER):
+        """
+        :param deadline: seconds after which waiting for the session gives up
+        :param initial_interval: seconds before the first poll, and between polls once the node starts
+        :param max_interval: upper bound of the seconds between two polls
+        :param backoff: factor applied to the interval after each poll
+        :param jitter: relative random spread of each interval, e.g. 0.2 for +/-20%
+        """
+        self.deadline = deadline
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+
+    @classmethod
+    def for_queue(cls, queue, **kwargs):
+        """
+        Returns the policy configured in settings.SESSION_WAIT_QUEUE_POLICIES for the given queue
+        :param queue: scheduler queue, e.g. 'prod' or 'test'
+        :param kwargs: values overriding the ones of the queue
+        """
+        values = dict(settings.SESSION_WAIT_QUEUE_POLICIES.get(queue, {}))
+        values.update(kwargs)
+        return cls(**values)
+
+    def start(self):
+        """
+        Starts waiting for a session
+        :return: Waiter giving the delay before each next poll
+        """
+        return Waiter(self)
+
+
+class Waiter(object):
+    """
+    Tracks the elapsed time and the current interval of a single wait
+    """
+
+    def __init__(self, policy):
+        self._policy = policy
+        self._expiry = monotonic() + policy.deadline
+        self._interval = policy.initial_interval
+
+    def next_delay(self, session_code):
+        """
+        :param session_code: last SESSION_STATUS_* code of the session
+        :return: seconds to sleep before the next poll, or None once the deadline is reached
+        """
+        remaining = self._expiry - monotonic()
+        if remaining <= 0:
+            return None
+        policy = self._policy
+        if session_code in _SESSION_STARTING_STATES:
+            self._interval = policy.initial_interval
+        delay = self._interval * (1 + random.uniform(-policy.jitter, policy.jitter))
+        self._interval = min(self._interval * policy.backoff, policy.max_interval)
+        return max(0, min(delay, policy.max_interval, remaining))
+
 
 class ResourceAllocator(object):
     """
@@ -59,8 +157,24 @@ class ResourceAllocator(object):
                  nb_cpus=settings.DEFAULT_ALLOCATOR_NB_CPUS,
                  nb_gpus=settings.DEFAULT_ALLOCATOR_NB_GPUS,
                  allocation_time=settings.DEFAULT_ALLOCATOR_TIME,
-                 reservation=''):
+                 reservation='',
+                 transport=None,
+                 queue=None,
+                 wait_policy=None,
+                 config_cache=None,
+                 retry_policy=None,
+                 schema_registry=None):
         self._cookies = None
+        self._scheduled = False
+        # Root span of the traced job, and span of its current phase
+        self._trace = None
+        self._span = None
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._transport = transport
+        self._queue = queue
+        self._wait_policy = wait_policy
+        self._config_cache = config_cache or ConfigCache()
+        self._schema_registry = schema_registry or get_schema_registry()
         self._renderer = renderer
         self._exclusive_allocation = exclusive_allocation
         self._nb_nodes = nb_nodes
@@ -87,115 +201,225 @@ class ResourceAllocator(object):
         if self._cookies is not None:
             self.session_delete()
 
-    def  resource_url(self):
-        """ Return the URL of the resources' http server """
+    def resource_url(self, wait_policy=None):
+        """
+        Return the URL of the resources' http server. If a transient failure interrupted an earlier
+        call, the session it created is kept, and calling again resumes polling it instead of
+        creating a new one.
+        :param wait_policy: WaitPolicy used while the session is being scheduled and started,
+        defaults to the one of the allocator or else the one of its queue
+        """
+        if self._resource_url is not None:
+            return self._resource_url
+
+        # TODO Get the json info from visualizer
+        schedule_payload = {
+            "params": "",
+            "environment": "",
+            "reservation": self._reservation,
+            "exclusive_allocation": self._exclusive_allocation,
+            "nb_nodes": self._nb_nodes,
+            "nb_cpus": self._nb_cpus,
+            "nb_gpus": self._nb_gpus,
+            "allocation_time": self._allocation_time
+        }
+        # Invalid allocation settings are refused before a session is created
+        self._schema_registry.validate(SCHEMA_SCHEDULE, schedule_payload)
         try:
-            if self._resource_url is not None:
-                return self._resource_url
-
-            payload = {
-                "renderer_id": self._renderer,
-                "owner": "joblauncher"
-            }
-            status = self.session_create(payload)
-            if status.code != 201:
-                raise Exception(status.contents)
-            self._cookies = status.cookies
+            if self._cookies is None:
+                payload = {
+                    "renderer_id": self._renderer,
+                    "owner": "joblauncher"
+                }
+                with self._traced('session_create'):
+                    status = self.session_create(payload)
+                    if status.code != 201:
+                        raise service_error(status)
+                self._cookies = status.cookies
+            else:
+                logger.info('Resuming the existing session')
+
+            if not self._scheduled:
+                with self._traced('session_schedule'):
+                    status = self.session_schedule(schedule_payload)
+                    if status.code != HTTP_STATUS_OK:
+                        raise service_error(status)
+                self._scheduled = True
 
-            # TODO Get the json info from visualizer
-            payload = {
-                "params": "",
-                "environment": "",
-                "reservation": self._reservation,
-                "exclusive_allocation": self._exclusive_allocation,
-                "nb_nodes": self._nb_nodes,
-                "nb_cpus": self._nb_cpus,
-                "nb_gpus": self._nb_gpus,
-                "allocation_time": self._allocation_time
-            }
-            status = self.session_schedule(payload)
-            if status.code != HTTP_STATUS_OK:
-                raise Exception(status.contents)
-
-            running = False
-            attempt = 0
-            while attempt < settings.SESSION_MAX_CONNECTION_ATTEMPTS and not running:
-                status = self.session_status()
-                if status.code == HTTP_STATUS_OK and \
-                   status.contents['code'] != SESSION_STATUS_RUNNING:
-                    time.sleep(1)
-                else:
-                    running = True
-                    self._resource_url = 'http://' + status.contents['hostname'] + ':' + status.contents['port']
-                attempt = attempt + 1
-
-            if not running:
-                raise Exception('Failed to get rendering resource running')
+            waiter = self._session_wait_policy(wait_policy).start()
+            code = None
+            phase = None
+            try:
+                while True:
+                    try:
+                        status = self.session_status()
+                        previous_code, code = code, self._session_code(status)
+                        phase = self._session_phase(phase, previous_code, code)
+                    except Exception as error:
+                        # A dropped connection or an overloaded service does not mean the session is lost
+                        if not is_transient(error):
+                            raise
+                        logger.info('Failed to get the session status, polling again: ' + str(error))
+                        status = error
+                    if code == SESSION_STATUS_RUNNING and not isinstance(status, Exception):
+                        break
+                    delay = waiter.next_delay(code)
+                    if delay is None:
+                        if isinstance(status, Exception):
+                            # The session may still get running, it is kept for the next call
+                            raise status
+                        raise SessionFailedError('Failed to get rendering resource running')
+                    time.sleep(delay)
+            except Exception as error:
+                get_tracer().finish(phase, error=str(error))
+                raise
+            get_tracer().finish(phase)
 
+            self._resource_url = 'http://' + status.contents['hostname'] + ':' + status.contents['port']
             return self._resource_url
-        except Exception:
+        except Exception as error:
+            if is_transient(error):
+                logger.info('Session kept after a transient failure, call resource_url() again to resume it')
+                raise
             status = self.session_delete()
             raise
         return None
 
+    @contextmanager
+    def _traced(self, name, **attributes):
+        """
+        Traces a phase of the job as a child span of the current phase, if the job is traced
+        :param name: name of the phase, e.g. 'session_create'
+        """
+        parent = self._span
+        span = get_tracer().start_span(name, parent, **attributes)
+        if span is not None:
+            self._span = span
+        try:
+            yield span
+        except Exception as error:
+            get_tracer().finish(span, error=str(error))
+            raise
+        finally:
+            get_tracer().finish(span)
+            self._span = parent
+
+    def _session_phase(self, span, previous_code, code):
+        """
+        Traces the wait for a session, as a 'queue' phase while the scheduler did not give a node and a
+        'start' phase while the wrapper starts on it, recording the SESSION_STATUS_* transitions
+        :param span: Span of the current wait phase, or None
+        :param previous_code: SESSION_STATUS_* code of the previous poll
+        :param code: SESSION_STATUS_* code of this poll
+        :return: Span of the wait phase after this poll
+        """
+        if self._span is None or code == previous_code:
+            return span
+        tracer = get_tracer()
+        name = 'queue' if code in (SESSION_STATUS_STOPPED, SESSION_STATUS_SCHEDULING, SESSION_STATUS_SCHEDULED) \
+            else 'start'
+        if span is not None and span.name != name:
+            tracer.finish(span)
+            span = None
+        if span is None:
+            span = tracer.start_span(name, self._span)
+        if span is not None:
+            span.event('session_status', code=code, status=SESSION_STATUS_NAMES.get(code, str(code)))
+        return span
+
+    def _session_wait_policy(self, wait_policy=None):
+        """
+        Returns the policy to wait for a session with, by order of precedence the given one, the one of
+        the allocator and the one of its queue
+        """
+        return wait_policy or self._wait_policy or WaitPolicy.for_queue(self._queue)
+
+    @staticmethod
+    def _session_code(status):
+        """
+        Returns the SESSION_STATUS_* code of a session status, raising if the session cannot get running
+        :param status Status returned by session_status()
+        """
+        if status.code != HTTP_STATUS_OK:
+            raise service_error(status)
+        code = status.contents['code']
+        if code == SESSION_STATUS_FAILED:
+            raise SessionFailedError('Rendering resource failed to start')
+        return code
+
     def session_create(self, payload):
         """
         Create a session
         """
         self._cookies = None
-        status = http_request(HTTP_METHOD_POST, self._url_session, payload, None, self._cookies)
+        status = self._request(HTTP_METHOD_POST, self._url_session, payload, None)
         if status.code == 201:
             self._cookies = status.cookies
         return status
 
     def session_list(self):
         """
-        List existing sessions
+        List existing sessions, each with its id and the status fields returned by session_status().
+        A failure to list does not affect the session of the allocator.
         """
-        return self._status_check(http_request(
-                HTTP_METHOD_POST, self._url_session, None, None, self._cookies))
+        return self._request(HTTP_METHOD_GET, self._url_session, None, None)
+
+    @property
+    def session_id(self):
+        """ Id of the session of the allocator, from its session cookie, None before it is created """
+        if not self._cookies:
+            return None
+        return self._cookies.get(settings.DEFAULT_ALLOCATOR_SESSION_COOKIE)
 
     def session_delete(self):
         """
         Delete a session
         """
-        return http_request(
-            HTTP_METHOD_DELETE, self._url_session, None, None, self._cookies)
+        status = self._request(HTTP_METHOD_DELETE, self._url_session, None, None)
+        if status.code in (HTTP_STATUS_OK, 404):
+            # The session is gone, the next resource_url() creates a new one
+            self._cookies = None
+            self._scheduled = False
+        return status
 
     def session_command(self, method, command, payload=None):
         """
         Execute a custom command
         """
-        return self._status_check(http_request(
-                method, self._url_session, payload, command, self._cookies))
+        return self._status_check(self._request(method, self._url_session, payload, command))
 
     def session_schedule(self, payload):
         """
         Schedule a job
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_PUT, self._url_session, payload, 'schedule', self._cookies))
+        return self._status_check(self._request(HTTP_METHOD_PUT, self._url_session, payload, 'schedule'))
 
     def session_status(self):
         """
         Request for session status
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_GET, self._url_session, None, 'status', self._cookies))
+        return self._status_check(self._request(HTTP_METHOD_GET, self._url_session, None, 'status'))
 
     def session_log(self):
         """
         Request for session log
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_GET, self._url_session, None, 'log', self._cookies))
+        return self._status_check(self._request(HTTP_METHOD_GET, self._url_session, None, 'log'))
+
+    def session_log_range(self, offset):
+        """
+        Request for the session log from the given byte offset. Services supporting ranges answer 206
+        with the new log text only, others 200 with the whole log.
+        :param offset: number of log bytes already read
+        """
+        return self._status_check(self._request(
+            HTTP_METHOD_GET, self._url_session, None, 'log', headers={'Range': 'bytes=%d-' % offset}))
 
     def session_job(self):
         """
         Request for job information
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_GET, self._url_session, None, 'job', self._cookies))
+        return self._status_check(self._request(HTTP_METHOD_GET, self._url_session, None, 'job'))
 
     def session_streaming_url(self):
         """
@@ -205,36 +429,87 @@ class ResourceAllocator(object):
             payload = {'uri': settings.DEFAULT_STREAMER_URI}
             return Status(HTTP_STATUS_OK, payload, None)
         else:
-            return self._status_check(http_request(
-                HTTP_METHOD_GET, self._url_session, None, 'imagefeed', self._cookies))
+            return self._status_check(self._request(HTTP_METHOD_GET, self._url_session, None, 'imagefeed'))
 
     def config_create(self, payload):
         """
-        Create configuration
+        Create configuration, answering 400 without sending it if it does not match its schema
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_POST, self._url_config, payload, None, self._cookies))
+        invalid = self._invalid_config(payload)
+        if invalid is not None:
+            return invalid
+        return self._config_cached(HTTP_METHOD_POST, payload, self._status_check(
+            self._request(HTTP_METHOD_POST, self._url_config, payload)))
 
     def config_update(self, payload):
         """
-        Update configuration
+        Update configuration, answering 400 without sending it if it does not match its schema
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_PUT, self._url_config, payload, None, self._cookies))
+        invalid = self._invalid_config(payload)
+        if invalid is not None:
+            return invalid
+        return self._config_cached(HTTP_METHOD_PUT, payload, self._status_check(
+            self._request(HTTP_METHOD_PUT, self._url_config, payload)))
 
     def config_list(self):
         """
         List existing configurations
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_GET, self._url_config, None, None, self._cookies))
+        return self._config_cached(HTTP_METHOD_GET, None, self._status_check(
+            self._request(HTTP_METHOD_GET, self._url_config, None)))
 
     def config_delete(self, payload):
         """
         Delete configuration
         """
-        return self._status_check(http_request(
-            HTTP_METHOD_DELETE, self._url_config, payload, None, self._cookies))
+        return self._config_cached(HTTP_METHOD_DELETE, payload, self._status_check(
+            self._request(HTTP_METHOD_DELETE, self._url_config, payload)))
+
+    def config_get(self, renderer_id):
+        """
+        Returns the configuration of a renderer from the configuration cache, fetching or
+        revalidating the configuration list first if the cache is stale
+        :param renderer_id: Job identifier
+        :return: dict representation of the configuration, or None if not found
+        """
+        if self._config_cache.stale():
+            status = self._status_check(self._request(
+                HTTP_METHOD_GET, self._url_config, headers=self._config_validators()))
+            self._config_cached(HTTP_METHOD_GET, None, status)
+        return self._config_cache.get(renderer_id)
+
+    def _invalid_config(self, payload):
+        """ Returns a 400 Status listing why a configuration does not match its schema, None if it does """
+        if not self._schema_registry.enabled:
+            return None
+        errors = self._schema_registry.errors(SCHEMA_CONFIG, [payload])
+        if errors:
+            return Status(400, 'Invalid configuration: ' + '; '.join(errors[0]), '')
+        return None
+
+    def _config_validators(self):
+        """ Returns the headers revalidating the cached configuration list, if it has an ETag """
+        if self._config_cache.etag is None:
+            return None
+        return {'If-None-Match': self._config_cache.etag}
+
+    def _config_cached(self, method, payload, status):
+        """
+        Writes the result of a configuration request through to the configuration cache
+        :param method: HTTP method of the request
+        :param payload: configuration sent with the request
+        :param status: Status of the request
+        """
+        if status.code == 304:
+            self._config_cache.touch()
+        elif status.code in (HTTP_STATUS_OK, 201):
+            if method == HTTP_METHOD_GET:
+                self._config_cache.load(status.contents, (status.headers or {}).get('ETag'))
+            elif method == HTTP_METHOD_DELETE:
+                self._config_cache.remove(payload['id'])
+            else:
+                self._config_cache.put(payload)
+        return status
 
     def _status_check(self, status):
         """
@@ -242,19 +517,96 @@ class ResourceAllocator(object):
         :param status Status of the executed statement
         """
         if status.code != HTTP_STATUS_OK:
-            if status.code >= 500:
-                # if the rendering resource is unreachable, then the session should
-                # be destroyed
-                self.session_delete()
-                raise Exception(status.contents)
+            if status.code >= 500 or status.code == 429:
+                error = service_error(status)
+                if not error.transient:
+                    # if the rendering resource is unreachable, then the session should
+                    # be destroyed
+                    self.session_delete()
+                # An overloaded or briefly unavailable service keeps the session
+                raise error
         return status
 
+    def _request(self, method, url, body=None, command=None, headers=None):
+        """
+        Sends a request with the cookies and the transport of the allocator, retrying transient
+        failures according to the retry policy; POST requests are not idempotent
+        :return: Status of the last attempt
+        """
+        def send():
+            status = http_request(method, url, body, command, self._cookies, self._transport, headers=headers)
+            if status.code in HTTP_OVERLOAD_CODES:
+                raise ServiceOverloadedError(status)
+            return status
+
+        try:
+            return self._retry_policy.call(send, idempotent=method != HTTP_METHOD_POST)
+        except ServiceOverloadedError as error:
+            return error.status
+
     def _obtain_registry(self):
-        """ Returns the registry of PUT and GET objects of the application """
-        status = self.session_command('GET', 'registry')
-        return status.contents, status.code
+        """ Returns the registry of PUT and GET objects of the application, cached by the schema registry """
+        return self._schema_registry.registry(self)
 
     def _schema(self, object_name):
-        """ Returns the JSON schema for the given object """
-        status = self.session_command('GET', object_name + '/schema')
-        return status.contents, status.code
\ No newline at end of file
+        """ Returns the JSON schema for the given object, cached by the schema registry """
+        return self._schema_registry.schema(self, object_name)
+
+
+def session_statuses(allocators, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES):
+    """
+    Gets the status of many sessions with a single session_list() request per service, instead of one
+    session_status() request per session. The sessions missing from the list, and all of them if the
+    service cannot list its sessions, fall back to a status request each. A failed status request is
+    returned as the Status of its session, and never deletes the session.
+    :param allocators: ResourceAllocators holding the sessions
+    :param max_parallel: maximum number of fallback status requests sent at the same time
+    :return: list of Status objects, in input order, whose contents hold the SESSION_STATUS_* code, the
+    hostname and the port of every session, like the ones returned by session_status()
+    """
+    allocators = list(allocators)
+    statuses = [None] * len(allocators)
+    services = {}
+    for index, allocator in enumerate(allocators):
+        if allocator.session_id is not None:
+            services.setdefault(allocator._url_session, []).append(index)
+    for indices in services.values():
+        listed = _listed_sessions(allocators[indices[0]])
+        for index in indices:
+            contents = listed.get(allocators[index].session_id)
+            if contents is not None:
+                statuses[index] = Status(HTTP_STATUS_OK, contents, None)
+    missing = [index for index, status in enumerate(statuses) if status is None]
+    if missing:
+        logger.debug('%d sessions missing from the session list, getting their status one by one', len(missing))
+        for index, status in zip(missing, parallel_map(
+                lambda index: _session_status(allocators[index]), missing, max_parallel)):
+            statuses[index] = status
+    return statuses
+
+
+def _session_status(allocator):
+    """ :return: status of a single session, a failure being returned as a Status instead of being raised """
+    try:
+        return allocator._request(HTTP_METHOD_GET, allocator._url_session, None, 'status')
+    except Exception as error:
+        logger.info('Failed to get the session status: ' + str(error))
+        if isinstance(error, ServiceError):
+            return error.status
+        return Status(400, str(error), '')
+
+
+def _listed_sessions(allocator):
+    """ :return: dict mapping the id of every session listed by the service of an allocator to its status """
+    try:
+        status = allocator.session_list()
+    except Exception as error:
+        if not is_transient(error):
+            raise
+        logger.info('Failed to list the sessions: ' + str(error))
+        return {}
+    if status.code != HTTP_STATUS_OK or not isinstance(status.contents, list):
+        logger.info('Failed to list the sessions: %s %s' % (status.code, status.contents))
+        return {}
+    return dict((session['id'], session) for session in status.contents
+                if isinstance(session, dict) and 'id' in session and 'code' in session)
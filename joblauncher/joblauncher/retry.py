@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Idempotency-aware retries of transient request failures
+"""
+
+import logging
+import random
+import time
+
+import joblauncher.settings as settings
+from joblauncher.errors import ServiceOverloadedError, is_transient
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """
+    Retries transient failures with exponential backoff. Requests which are not idempotent are only
+    retried when they surely were not processed: the connection could not be established, or the
+    server refused them because it is overloaded.
+    """
+
+    def __init__(self,
+                 max_attempts=settings.RETRY_MAX_ATTEMPTS,
+                 initial_delay=settings.RETRY_INITIAL_DELAY,
+                 max_delay=settings.RETRY_MAX_DELAY,
+                 backoff=settings.RETRY_BACKOFF,
+                 jitter=settings.RETRY_JITTER):
+        """
+        :param max_attempts: number of times a request is sent at most
+        :param initial_delay: seconds before the first retry
+        :param max_delay: maximum seconds between two attempts
+        :param backoff: factor applied to the delay after each attempt
+        :param jitter: relative randomization of the delays
+        """
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+
+    def retryable(self, error, idempotent):
+        """
+        :param error: exception raised by an attempt
+        :param idempotent: whether sending the request twice has the effect of sending it once
+        :return: True if the request may be sent again
+        """
+        if not is_transient(error):
+            return False
+        return idempotent or isinstance(error, ServiceOverloadedError) or \
+            getattr(error, 'request_sent', None) is False
+
+    def delays(self):
+        """ :return: generator of the seconds to wait before each retry """
+        delay = self.initial_delay
+        for _ in range(self.max_attempts - 1):
+            yield min(delay * (1 + random.uniform(-self.jitter, self.jitter)), self.max_delay)
+            delay *= self.backoff
+
+    def call(self, function, idempotent=True):
+        """
+        Calls a function until it succeeds, fails permanently or the attempts are exhausted
+        :param function: function sending a request
+        :param idempotent: whether sending the request twice has the effect of sending it once
+        :return: result of the function
+        """
+        delays = self.delays()
+        while True:
+            try:
+                return function()
+            except Exception as error:
+                delay = self.retry_delay(error, idempotent, delays)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def retry_delay(self, error, idempotent, delays):
+        """
+        :param error: exception raised by the last attempt
+        :param idempotent: whether sending the request twice has the effect of sending it once
+        :param delays: generator returned by delays(), shared by the attempts of a request
+        :return: seconds to wait before sending the request again, or None if it may not be retried
+        """
+        delay = next(delays, None)
+        if delay is None or not self.retryable(error, idempotent):
+            return None
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            delay = min(max(delay, retry_after), self.max_delay)
+        logger.info('Request failed, retrying in %.2f s: %s' % (delay, error))
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+JSON schemas of the payloads sent to the JobManager and to the applications, cached on disk, and
+validators compiled once to check payloads locally before they are sent
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import joblauncher.settings as settings
+from joblauncher.errors import ValidationError
+from joblauncher.utils import HTTP_METHOD_GET, HTTP_STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CONFIG = 'config'
+SCHEMA_SCHEDULE = 'schedule'
+
+# Version of the layout of the cache file, which is ignored when written by another version
+_CACHE_FORMAT = 1
+
+_ALLOCATION_PROPERTIES = {
+    'nb_nodes': {'type': 'integer', 'minimum': 1},
+    'nb_cpus': {'type': 'integer', 'minimum': 1},
+    'nb_gpus': {'type': 'integer', 'minimum': 0},
+}
+
+CONFIG_SCHEMA = {
+    '$schema': 'http://json-schema.org/draft-04/schema#',
+    'title': 'Renderer configuration',
+    'type': 'object',
+    'required': ['id'],
+    'properties': dict(_ALLOCATION_PROPERTIES, **{
+        'id': {'type': 'string', 'minLength': 1},
+        'command_line': {'type': 'string'},
+        'environment_variables': {'type': 'string'},
+        'modules': {'type': 'string'},
+        'process_rest_parameters_format': {'type': 'string'},
+        'scheduler_rest_parameters_format': {'type': 'string'},
+        'project': {'type': 'string'},
+        'queue': {'type': 'string'},
+        'exclusive': {'type': 'boolean'},
+        'graceful_exit': {'type': 'boolean'},
+        'wait_until_running': {'type': 'boolean'},
+        'name': {'type': 'string'},
+        'description': {'type': 'string'},
+    }),
+}
+
+SCHEDULE_SCHEMA = {
+    '$schema': 'http://json-schema.org/draft-04/schema#',
+    'title': 'Session schedule',
+    'type': 'object',
+    'required': ['nb_nodes', 'nb_cpus', 'nb_gpus', 'allocation_time'],
+    'properties': dict(_ALLOCATION_PROPERTIES, **{
+        'params': {'type': 'string'},
+        'environment': {'type': 'string'},
+        'reservation': {'type': ['string', 'null']},
+        'exclusive_allocation': {'type': 'boolean'},
+        # SLURM time limit, or a number of minutes
+        'allocation_time': {'type': ['string', 'integer'], 'pattern': r'^(\d+-)?\d+(:\d+){0,2}$'},
+    }),
+}
+
+
+def _jsonschema():
+    """ Returns jsonschema if it is installed, which is only imported when compiling a validator """
+    try:
+        import jsonschema
+    except ImportError:
+        return None
+    return jsonschema
+
+
+def compile_schema(schema):
+    """
+    Compiles a JSON schema once into a validator, with jsonschema when it is installed, and otherwise
+    with a minimal validator supporting type, enum, required, properties, additionalProperties, items,
+    the size and range keywords and pattern, other keywords being ignored
+    :param schema: JSON schema, as a dict
+    :return: function(payload) returning the list of the error messages of a payload, empty if it is valid
+    """
+    jsonschema = _jsonschema()
+    if jsonschema is not None:
+        validator = jsonschema.validators.validator_for(schema)(schema)
+
+        def validate(payload):
+            return [_message('/'.join(str(part) for part in error.path), error.message)
+                    for error in validator.iter_errors(payload)]
+        return validate
+    check = _compile(schema)
+
+    def validate(payload):
+        errors = []
+        check(payload, '', errors)
+        return errors
+    return validate
+
+
+def _message(path, message):
+    """ Prefixes an error message with the path of the invalid value, e.g. 'nb_cpus' """
+    return path + ': ' + message if path else message
+
+
+def _child(path, name):
+    return '%s/%s' % (path, name) if path else str(name)
+
+
+try:
+    _string_types = basestring
+    _integer_types = (int, long)
+except NameError:
+    _string_types = str
+    _integer_types = int
+
+_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, _string_types),
+    'integer': lambda value: isinstance(value, _integer_types) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (_integer_types, float)) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+
+def _compile(schema):
+    """
+    Compiles a schema into the list of the checks of its keywords, which are only looked up once
+    :return: function(value, path, errors) appending the error messages of a value
+    """
+    checks = []
+    if 'type' in schema:
+        types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        tests = [_TYPES[name] for name in types if name in _TYPES]
+
+        def check_type(value, path, errors):
+            if not any(test(value) for test in tests):
+                errors.append(_message(path, '%r is not of type %s' % (value, ', '.join(map(repr, types)))))
+                return False
+            return True
+        checks.append(check_type)
+    if 'enum' in schema:
+        enum = schema['enum']
+
+        def check_enum(value, path, errors):
+            if value not in enum:
+                errors.append(_message(path, '%r is not one of %r' % (value, enum)))
+        checks.append(check_enum)
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+
+        def check_pattern(value, path, errors):
+            if isinstance(value, _string_types) and not pattern.search(value):
+                errors.append(_message(path, '%r does not match %r' % (value, pattern.pattern)))
+        checks.append(check_pattern)
+    for keyword, applies, measure, lower in (('minimum', 'number', None, True), ('maximum', 'number', None, False),
+                                             ('minLength', 'string', len, True), ('maxLength', 'string', len, False),
+                                             ('minItems', 'array', len, True), ('maxItems', 'array', len, False)):
+        if keyword in schema:
+            checks.append(_bound_check(keyword, schema[keyword], _TYPES[applies], measure, lower))
+    if 'required' in schema:
+        required = schema['required']
+
+        def check_required(value, path, errors):
+            if isinstance(value, dict):
+                for name in required:
+                    if name not in value:
+                        errors.append(_message(path, '%r is a required property' % name))
+        checks.append(check_required)
+    properties = dict((name, _compile(subschema)) for name, subschema in schema.get('properties', {}).items())
+    additional = schema.get('additionalProperties', True)
+    if properties or additional is not True:
+        extra = _compile(additional) if isinstance(additional, dict) else None
+
+        def check_properties(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name, item in value.items():
+                check = properties.get(name, extra)
+                if check is not None:
+                    check(item, _child(path, name), errors)
+                elif additional is False:
+                    errors.append(_message(path, 'Additional property %r is not allowed' % name))
+        checks.append(check_properties)
+    if isinstance(schema.get('items'), dict):
+        items = _compile(schema['items'])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    items(item, _child(path, index), errors)
+        checks.append(check_items)
+
+    def check(value, path, errors):
+        for step in checks:
+            # A value of the wrong type is not checked any further
+            if step(value, path, errors) is False:
+                return
+    return check
+
+
+def _bound_check(keyword, bound, applies, measure, lower):
+    """ Compiles the check of a minimum or maximum of a value, of a length or of a number of items """
+    def check_bound(value, path, errors):
+        if applies(value):
+            size = value if measure is None else measure(value)
+            if size < bound if lower else size > bound:
+                errors.append(_message(path, '%r does not respect %s %r' % (value, keyword, bound)))
+    return check_bound
+
+
+class SchemaRegistry(object):
+    """
+    Validates payloads against JSON schemas before they are sent. The schemas of the configuration and
+    schedule payloads of the JobManager are built in; the schemas of the objects of an application are
+    fetched from its registry once, and cached on disk with the version of the registry they belong to,
+    which is revalidated after a TTL. Validators are compiled once per schema.
+    """
+
+    def __init__(self, path=settings.SCHEMA_CACHE_PATH, ttl=settings.SCHEMA_CACHE_TTL, enabled=True):
+        """
+        :param path: JSON file caching the application schemas, None to only cache them in memory
+        :param ttl: seconds during which a cached registry is used without any request
+        :param enabled: whether payloads are validated
+        """
+        self.path = path
+        self.ttl = ttl
+        self.enabled = enabled
+        self._schemas = {(None, SCHEMA_CONFIG): CONFIG_SCHEMA, (None, SCHEMA_SCHEDULE): SCHEDULE_SCHEMA}
+        self._validators = {}
+        self._applications = None
+        self._lock = threading.RLock()
+
+    def register(self, name, schema):
+        """
+        Replaces the built-in schema of a payload, e.g. with a stricter one
+        :param name: SCHEMA_CONFIG or SCHEMA_SCHEDULE
+        :param schema: JSON schema, as a dict
+        """
+        with self._lock:
+            self._schemas[(None, name)] = schema
+            self._validators.pop((None, name), None)
+
+    def errors(self, name, payloads, allocator=None):
+        """
+        Checks many payloads with a validator compiled once
+        :param name: SCHEMA_CONFIG, SCHEMA_SCHEDULE, or an object of the application of the allocator
+        :param payloads: list of payloads
+        :param allocator: ResourceAllocator whose application schemas are used, None for the built-in ones
+        :return: dict mapping the index of every invalid payload to its error messages
+        """
+        validate = self.validator(name, allocator)
+        errors = {}
+        for index, payload in enumerate(payloads):
+            messages = validate(payload)
+            if messages:
+                errors[index] = messages
+        return errors
+
+    def validate_many(self, name, payloads, allocator=None):
+        """
+        Checks many payloads, raising ValidationError if any of them is invalid and validation is enabled
+        :param name: SCHEMA_CONFIG, SCHEMA_SCHEDULE, or an object of the application of the allocator
+        :param payloads: list of payloads
+        :param allocator: ResourceAllocator whose application schemas are used, None for the built-in ones
+        """
+        if not self.enabled:
+            return
+        errors = self.errors(name, payloads, allocator)
+        if errors:
+            raise ValidationError(name, errors)
+
+    def validate(self, name, payload, allocator=None):
+        """ Checks a payload, raising ValidationError if it is invalid and validation is enabled """
+        self.validate_many(name, [payload], allocator)
+
+    def validator(self, name, allocator=None):
+        """
+        :return: compiled validator of a schema, see compile_schema()
+        """
+        key = (_application(allocator), name)
+        validator = self._validators.get(key)
+        if validator is None:
+            if allocator is None:
+                schema = self._schemas.get(key)
+            else:
+                schema, code = self.schema(allocator, name)
+                if code != HTTP_STATUS_OK:
+                    raise LookupError('Failed to get the schema of %s: %s' % (name, schema))
+            if schema is None:
+                raise LookupError('Unknown schema: ' + name)
+            validator = compile_schema(schema)
+            with self._lock:
+                self._validators[key] = validator
+        return validator
+
+    def registry(self, allocator, refresh=False):
+        """
+        Returns the registry of PUT and GET objects of the application of an allocator, fetched at most
+        once per TTL
+        :param allocator: ResourceAllocator holding a session of the application
+        :param refresh: revalidate the registry even if the TTL did not expire
+        :return: (registry, HTTP status code)
+        """
+        key = _application(allocator)
+        entry = self._entries().get(key)
+        if entry is not None and not refresh and time.time() < entry['fetched'] + self.ttl:
+            return entry['registry'], HTTP_STATUS_OK
+        status = allocator.session_command(HTTP_METHOD_GET, 'registry')
+        if status.code != HTTP_STATUS_OK:
+            return status.contents, status.code
+        version = hashlib.sha1(json.dumps(status.contents, sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            entry = self._applications.get(key)
+            if entry is None or entry['version'] != version:
+                # The application changed, so did its schemas
+                entry = self._applications[key] = {'version': version, 'registry': status.contents, 'schemas': {}}
+                for validator_key in [validator_key for validator_key in self._validators if validator_key[0] == key]:
+                    del self._validators[validator_key]
+            entry['fetched'] = time.time()
+            self._save()
+        return status.contents, HTTP_STATUS_OK
+
+    def schema(self, allocator, object_name):
+        """
+        Returns the JSON schema of an object of the application of an allocator, fetched once per version
+        of the registry of the application
+        :param allocator: ResourceAllocator holding a session of the application
+        :param object_name: name of the object in the registry
+        :return: (schema, HTTP status code)
+        """
+        contents, code = self.registry(allocator)
+        if code != HTTP_STATUS_OK:
+            return contents, code
+        key = _application(allocator)
+        schema = self._applications[key]['schemas'].get(object_name)
+        if schema is not None:
+            return schema, HTTP_STATUS_OK
+        status = allocator.session_command(HTTP_METHOD_GET, object_name + '/schema')
+        if status.code != HTTP_STATUS_OK:
+            return status.contents, status.code
+        with self._lock:
+            self._applications[key]['schemas'][object_name] = status.contents
+            self._save()
+        return status.contents, HTTP_STATUS_OK
+
+    def clear(self):
+        """ Forgets the cached application schemas, in memory and on disk """
+        with self._lock:
+            self._applications = {}
+            self._validators = dict((key, validator) for key, validator in self._validators.items()
+                                    if key[0] is None)
+            self._save()
+
+    def _entries(self):
+        """ :return: cached applications, loaded from disk on first use """
+        if self._applications is None:
+            with self._lock:
+                if self._applications is None:
+                    self._applications = self._load()
+        return self._applications
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(os.path.expanduser(self.path)) as cache:
+                data = json.load(cache)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('format') != _CACHE_FORMAT:
+            logger.info('Ignoring the schema cache written by another version of the client')
+            return {}
+        return data.get('applications', {})
+
+    def _save(self):
+        """ Replaces the cache file atomically """
+        if self.path is None:
+            return
+        path = os.path.expanduser(self.path)
+        directory = os.path.dirname(path)
+        try:
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            temporary = '%s.%d.tmp' % (path, os.getpid())
+            with open(temporary, 'w') as cache:
+                json.dump({'format': _CACHE_FORMAT, 'applications': self._applications}, cache, sort_keys=True)
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(temporary, path)
+        except (IOError, OSError) as error:
+            logger.info('Failed to write the schema cache: ' + str(error))
+
+
+def _application(allocator):
+    """ Returns the key of the application of an allocator in the cache, None for the built-in schemas """
+    if allocator is None:
+        return None
+    return '%s %s' % (allocator._url_service, allocator._renderer)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_schema_registry():
+    """ Returns the schema registry shared by every allocator which was not given its own """
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = SchemaRegistry()
+    return _default_registry
+
+
+def enable_validation(enabled=True):
+    """
+    Starts or stops validating the payloads of every allocator using the shared schema registry
+    :return: the shared SchemaRegistry
+    """
+    registry = get_schema_registry()
+    registry.enabled = enabled
+    return registry
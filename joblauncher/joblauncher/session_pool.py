@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Pool of warm sessions, already scheduled and running, from which jobs are launched without waiting
+for the cluster to allocate a node and start the renderer. Only renderers whose wrapper starts idle
+and runs the jobs submitted to it over REST can be pooled: the job of a pooled launch is submitted
+to the wrapper, as starting the wrapper does not run any job.
+"""
+
+import logging
+import threading
+import time
+
+import joblauncher.settings as settings
+from joblauncher.job_registry import JOB_STATUS_POOLED
+from joblauncher.resource_allocator import SESSION_STATUS_RUNNING
+from joblauncher.utils import parallel_map, HTTP_STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+_REFUSED = 'The wrapper of renderer %s does not accept jobs over REST, its sessions cannot be pooled'
+
+
+def allocation_seconds(allocation_time):
+    """
+    Converts a SLURM time limit, 'minutes', 'minutes:seconds', 'hours:minutes:seconds',
+    'days-hours', 'days-hours:minutes' or 'days-hours:minutes:seconds', to seconds
+    :param allocation_time: time limit, as a string or a number of minutes
+    :return: number of seconds
+    """
+    if isinstance(allocation_time, (int, float)):
+        return allocation_time * 60
+    days, _, clock = str(allocation_time).rpartition('-')
+    parts = [int(part) for part in clock.split(':')]
+    if days:
+        seconds = int(days) * 86400 + parts[0] * 3600
+        parts = parts[1:]
+        return seconds + sum(part * 60 ** (1 - index) for index, part in enumerate(parts))
+    if len(parts) == 1:
+        return parts[0] * 60
+    return sum(part * 60 ** (len(parts) - 1 - index) for index, part in enumerate(parts))
+
+
+class _WarmSession(object):
+    """ Running session waiting in the pool """
+    __slots__ = ('job', 'idle_since')
+
+    def __init__(self, job):
+        self.job = job
+        self.idle_since = time.time()
+
+
+class SessionPool(object):
+    """
+    Keeps up to max_size, and at least min_size, running sessions for each renderer. A session idle
+    for longer than idle_timeout is deleted down to min_size, and a session is never kept or handed
+    out once its allocation gets within expiry_margin of its end. Sessions are indexed by renderer id
+    only, so they are all allocated with the settings of the launcher the pool was created with.
+    Renderers can be declared poolable up front; otherwise the first session of a renderer finds out
+    whether its wrapper accepts jobs over REST. A renderer whose wrapper does not is refused with a
+    ValueError from then on, without any allocation.
+    """
+
+    def __init__(self, launcher, renderer_ids=(),
+                 min_size=settings.SESSION_POOL_MIN_SIZE,
+                 max_size=settings.SESSION_POOL_MAX_SIZE,
+                 idle_timeout=settings.SESSION_POOL_IDLE_TIMEOUT,
+                 expiry_margin=settings.SESSION_POOL_EXPIRY_MARGIN,
+                 max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES,
+                 poolable=None):
+        """
+        :param launcher: JobLauncher whose allocation settings and transport the sessions use
+        :param renderer_ids: Job identifiers to keep sessions warm for, acquired ones are added
+        :param min_size: number of running sessions kept per renderer
+        :param max_size: maximum number of running sessions kept per renderer
+        :param idle_timeout: seconds after which sessions above min_size are deleted
+        :param expiry_margin: seconds before the end of its allocation after which a session is deleted
+        :param max_parallel: maximum number of sessions being brought up or deleted at the same time
+        :param poolable: Job identifiers of the only renderers whose wrapper accepts jobs over REST, every
+        renderer is tried if None
+        """
+        if min_size > max_size:
+            raise ValueError('min_size must not exceed max_size')
+        self.launcher = launcher
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.expiry_margin = expiry_margin
+        self.max_parallel = max_parallel
+        self._warm = dict((renderer_id, []) for renderer_id in renderer_ids)
+        self._pending = {}
+        self._poolable = None if poolable is None else set(poolable)
+        self._refused = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def size(self, renderer_id=None):
+        """
+        :param renderer_id: Job identifier, all renderers if None
+        :return: number of warm sessions waiting in the pool
+        """
+        with self._lock:
+            if renderer_id is not None:
+                return len(self._warm.get(renderer_id, ()))
+            return sum(len(sessions) for sessions in self._warm.values())
+
+    def pooled(self, renderer_id):
+        """
+        :param renderer_id: Job identifier
+        :return: False if the sessions of the renderer are known not to be reusable, True otherwise
+        """
+        if self._poolable is not None and renderer_id not in self._poolable:
+            return False
+        return renderer_id not in self._refused
+
+    def warm(self, renderer_id=None):
+        """
+        Brings up the sessions missing for a renderer to reach min_size
+        :param renderer_id: Job identifier, the one of the launcher if None
+        :return: number of sessions brought up
+        """
+        if renderer_id is None:
+            renderer_id = self.launcher._renderer
+        with self._lock:
+            self._warm.setdefault(renderer_id, [])
+        return self._fill([renderer_id])
+
+    def acquire(self, renderer_id=None, wait_policy=None):
+        """
+        Takes a warm session out of the pool, or brings up a new one if none is left. If the new session
+        finds out that the wrapper of the renderer does not accept jobs over REST, it is returned anyway,
+        its wrapper running the job, and the renderer is not pooled any more, see pooled().
+        :param renderer_id: Job identifier, the one of the launcher if None
+        :param wait_policy: WaitPolicy used if a new session has to be brought up
+        :return: JobLauncher handle of a running session whose wrapper waits for a job to be submitted
+        :raise ValueError: if the renderer is already known not to be poolable
+        """
+        if renderer_id is None:
+            renderer_id = self.launcher._renderer
+        if not self.pooled(renderer_id):
+            raise ValueError(_REFUSED % renderer_id)
+        while True:
+            with self._lock:
+                sessions = self._warm.setdefault(renderer_id, [])
+                warm = sessions.pop() if sessions else None
+            if warm is None:
+                return self._launch(renderer_id, wait_policy, keep_refused=True)
+            if self._usable(warm.job):
+                return warm.job
+            self._delete([warm.job])
+
+    def release(self, job):
+        """
+        Returns the session of a job to the pool if its job completed, the session is still running
+        with enough allocation time left, its wrapper accepts new jobs and the pool of its renderer is
+        not full
+        :param job: JobLauncher handle of a session
+        :return: True if the session was put back in the pool, False if it has to be deleted instead
+        """
+        if self._closed or job._cookies is None or not self.pooled(job._renderer) or not self._usable(job) or \
+                not self._job_completed(job) or not job.accepts_jobs():
+            return False
+        handle = job.spawn()
+        for attribute in ('_cookies', '_resource_url', '_allocation_expiry', 'job_id'):
+            setattr(handle, attribute, getattr(job, attribute))
+        with self._lock:
+            sessions = self._warm.setdefault(job._renderer, [])
+            if len(sessions) >= self.max_size:
+                return False
+            sessions.append(_WarmSession(handle))
+        return True
+
+    def maintain(self):
+        """
+        Deletes the sessions close to the end of their allocation and the ones idle for too long
+        above min_size, then brings the pool of every renderer back up to min_size
+        :return: number of sessions deleted
+        """
+        now = time.time()
+        expired = []
+        with self._lock:
+            for renderer_id, sessions in self._warm.items():
+                kept = [warm for warm in sessions if not self._expiring(warm.job, now)]
+                expired.extend(warm.job for warm in sessions if self._expiring(warm.job, now))
+                # Most recently used sessions are at the end, oldest idle ones are dropped first
+                while len(kept) > self.min_size and now - kept[0].idle_since > self.idle_timeout:
+                    expired.append(kept.pop(0).job)
+                self._warm[renderer_id] = kept
+            renderer_ids = list(self._warm)
+        self._delete(expired)
+        self._fill(renderer_ids)
+        return len(expired)
+
+    def start(self, interval=settings.SESSION_POOL_MAINTENANCE_INTERVAL):
+        """
+        Maintains the pool from a background thread
+        :param interval: seconds between two maintenance rounds
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name='joblauncher-session-pool')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the background maintenance """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """ Stops the background maintenance and deletes every warm session """
+        self.stop()
+        with self._lock:
+            self._closed = True
+            jobs = [warm.job for sessions in self._warm.values() for warm in sessions]
+            self._warm = {}
+        self._delete(jobs)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.maintain()
+            except Exception as error:
+                logger.info('Failed to maintain the session pool: ' + str(error))
+
+    def _fill(self, renderer_ids):
+        launches = []
+        with self._lock:
+            if self._closed:
+                return 0
+            for renderer_id in renderer_ids:
+                if not self.pooled(renderer_id):
+                    continue
+                missing = self.min_size - len(self._warm.get(renderer_id, ())) - self._pending.get(renderer_id, 0)
+                if missing > 0:
+                    self._pending[renderer_id] = self._pending.get(renderer_id, 0) + missing
+                    launches.extend([renderer_id] * missing)
+        jobs = parallel_map(self._launch_warm, launches, self.max_parallel)
+        return len([job for job in jobs if job is not None])
+
+    def _launch_warm(self, renderer_id):
+        try:
+            job = self._launch(renderer_id)
+        except ValueError:
+            job = None
+        except Exception as error:
+            logger.info('Failed to bring up a warm session: ' + str(error))
+            job = None
+        with self._lock:
+            self._pending[renderer_id] -= 1
+            if job is not None and not self._closed:
+                self._warm.setdefault(renderer_id, []).append(_WarmSession(job))
+                return job
+        if job is not None:
+            self._delete([job])
+        return None
+
+    def _launch(self, renderer_id, wait_policy=None, keep_refused=False):
+        job = self.launcher.spawn(renderer_id)
+        expiry = time.time() + allocation_seconds(job._allocation_time)
+        job.resource_url(wait_policy)
+        job._allocation_expiry = expiry
+        if job.registry is not None and job.job_id is not None:
+            job.registry.set_status(job.job_id, JOB_STATUS_POOLED)
+        if not job.accepts_jobs():
+            # The wrapper runs the job of the renderer once started, so the session cannot be reused
+            logger.warning(_REFUSED % renderer_id)
+            with self._lock:
+                self._refused.add(renderer_id)
+                self._warm.pop(renderer_id, None)
+            if not keep_refused:
+                job.session_delete()
+                raise ValueError(_REFUSED % renderer_id)
+        return job
+
+    def _expiring(self, job, now):
+        return job._allocation_expiry is None or job._allocation_expiry - now <= self.expiry_margin
+
+    def _usable(self, job):
+        """ Checks that a session has allocation time left and is still running """
+        if self._expiring(job, time.time()):
+            return False
+        try:
+            status = job.session_status()
+            return status.code == HTTP_STATUS_OK and status.contents['code'] == SESSION_STATUS_RUNNING
+        except Exception:
+            return False
+
+    @staticmethod
+    def _job_completed(job):
+        """ Checks that nothing runs on a session any more, in which case it can be reused """
+        if not job.launched_job_url:
+            return True
+        try:
+            return job._job_progress() >= 100
+        except Exception:
+            return False
+
+    def _delete(self, jobs):
+        parallel_map(lambda job: job.session_delete(), jobs, self.max_parallel)
@@ -7,10 +7,95 @@ DEFAULT_ALLOCATOR_NAME = 'rendering-resource-manager'
 DEFAULT_ALLOCATOR_API_VERSION = 'v1'
 DEFAULT_ALLOCATOR_SESSION_PREFIX = 'session'
 DEFAULT_ALLOCATOR_CONFIG_PREFIX = 'config'
+DEFAULT_ALLOCATOR_SESSION_COOKIE = 'rrm_session'
 DEFAULT_ALLOCATOR_NB_NODES = 1
 DEFAULT_ALLOCATOR_NB_CPUS = 1
 DEFAULT_ALLOCATOR_NB_GPUS = 0
 DEFAULT_ALLOCATOR_TIME = '1:00:00'
 DEFAULT_ALLOCATOR_EXCLUSIVE = False
 DEFAULT_RENDERER = 'bbic_wrapper'
-SESSION_MAX_CONNECTION_ATTEMPTS = 5
+SESSION_WAIT_DEADLINE = 300
+SESSION_WAIT_INITIAL_INTERVAL = .1
+SESSION_WAIT_MAX_INTERVAL = 10
+SESSION_WAIT_BACKOFF = 1.6
+SESSION_WAIT_JITTER = .2
+SESSION_WAIT_QUEUE_POLICIES = {
+    'interactive': {'deadline': 120, 'max_interval': 2},
+    'test': {'deadline': 600},
+    'prod': {'deadline': 4 * 3600, 'max_interval': 30},
+}
+DEFAULT_RESOURCE_CONNECTOR_STATUS = '/resourceconnector/v1/status'
+DEFAULT_RESOURCE_CONNECTOR_OUTPUTS = '/resourceconnector/v1/outputs'
+# Jobs endpoint of the renderer wrappers which start idle and run the jobs submitted to them, the only
+# ones whose sessions can be pooled
+DEFAULT_RESOURCE_CONNECTOR_JOBS = '/resourceconnector/v1/jobs'
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 32
+HTTP_POOL_BLOCK = False
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+ASYNC_MAX_CONCURRENT_REQUESTS = 64
+DEFAULT_MAX_PARALLEL_LAUNCHES = 16
+STATUS_MONITOR_MIN_INTERVAL = .5
+STATUS_MONITOR_MAX_INTERVAL = 30
+STATUS_MONITOR_MAX_REQUESTS_PER_SECOND = 20
+STATUS_MONITOR_MAX_FAILURES = 5
+
+# Progress samples kept per job, seconds of the latest samples rates are estimated from, and seconds
+# without progress after which a job is stalled
+PROGRESS_HISTORY_SIZE = 512
+PROGRESS_RATE_WINDOW = 300
+PROGRESS_STALL_TIMEOUT = 600
+
+# Push subscriptions to the progress of a job: server-sent events endpoint of the resource connector,
+# push mechanisms tried in order before falling back to polling, seconds a long-poll request is held
+# by the server, seconds an event stream may stay silent, and reconnections before falling back
+DEFAULT_RESOURCE_CONNECTOR_EVENTS = '/resourceconnector/v1/events'
+SUBSCRIPTION_MODES = ('events', 'long-poll')
+SUBSCRIPTION_LONG_POLL_WAIT = 30
+SUBSCRIPTION_IDLE_TIMEOUT = 60
+SUBSCRIPTION_MAX_RECONNECTS = 3
+CONFIG_CACHE_TTL = 60
+SCHEMA_CACHE_PATH = '~/.joblauncher/schemas.json'
+SCHEMA_CACHE_TTL = 24 * 3600
+METRICS_LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+LOG_TAIL_INTERVAL = 1
+LOG_TAIL_MAX_LINE_LENGTH = 64 * 1024
+SESSION_POOL_MIN_SIZE = 1
+SESSION_POOL_MAX_SIZE = 4
+SESSION_POOL_IDLE_TIMEOUT = 600
+SESSION_POOL_EXPIRY_MARGIN = 300
+SESSION_POOL_MAINTENANCE_INTERVAL = 30
+JOB_REGISTRY_PATH = '~/.joblauncher/jobs.sqlite'
+PACKING_NODE_CPUS = 36
+PACKING_NODE_GPUS = 0
+RATE_LIMITS = {
+    'status': (20, 40),
+    'schedule': (2, 10),
+    'session': (5, 20),
+    'config': (5, 20),
+    'other': (10, 20),
+}
+RATE_LIMIT_BACKOFF = .5
+RATE_LIMIT_RECOVERY = .05
+RATE_LIMIT_MIN_FRACTION = .05
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_RESET_TIMEOUT = 10
+
+# Retries of transient request failures: attempts per request, first delay and maximum delay in
+# seconds, growth factor of the delay and its relative randomization
+RETRY_MAX_ATTEMPTS = 3
+RETRY_INITIAL_DELAY = .2
+RETRY_MAX_DELAY = 5
+RETRY_BACKOFF = 2
+RETRY_JITTER = .2
+
+# Lifecycle tracing of launched jobs: finished spans kept in memory, and percentiles of the phase reports
+TRACING_MAX_SPANS = 10000
+TRACING_PERCENTILES = (50, 90, 99)
+
+# Downloads of job outputs: bytes fetched by each range request, bytes written to disk at a time, and
+# range requests sent at the same time for a file
+DOWNLOAD_SEGMENT_SIZE = 16 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_MAX_CONNECTIONS = 4
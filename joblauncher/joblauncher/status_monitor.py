@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Single background poller multiplexing the status of many launched jobs
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+import joblauncher.settings as settings
+from joblauncher.utils import http_request, HTTP_METHOD_GET
+
+logger = logging.getLogger(__name__)
+
+JOB_STATE_RUNNING = 'running'
+JOB_STATE_COMPLETED = 'completed'
+JOB_STATE_FAILED = 'failed'
+
+EVENT_PROGRESS = 'progress'
+EVENT_COMPLETED = JOB_STATE_COMPLETED
+EVENT_FAILED = JOB_STATE_FAILED
+
+
+class JobStatus(object):
+    """
+    Last known status of a tracked job. Behaves like a future which is done once the job
+    completed or failed.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.progress = -1
+        self.state = JOB_STATE_RUNNING
+        self.error = None
+        self.updated = None
+        self.interval = settings.STATUS_MONITOR_MIN_INTERVAL
+        self.failures = 0
+        # Sequence number of the only schedule entry of the job which is still valid
+        self.sequence = None
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+        self._done = threading.Event()
+
+    def done(self):
+        """ :return: True once the job completed or failed """
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the job to complete
+        :param timeout: seconds to wait for, forever if None
+        :return: final progress in percents
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError('Timed out waiting for job ' + self.url)
+        if self.state == JOB_STATE_FAILED:
+            raise self.error
+        return self.progress
+
+    def add_callback(self, callback):
+        """
+        Registers a callback(job_status, event) called on progress changes, completion and failure.
+        It is called immediately if the job is already done.
+        """
+        with self._callbacks_lock:
+            self._callbacks.append(callback)
+            done = self.done()
+        if done:
+            callback(self, self.state)
+
+    def _notify(self, event):
+        with self._callbacks_lock:
+            if event != EVENT_PROGRESS:
+                self._done.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(self, event)
+            except Exception:
+                logger.exception('Job status callback failed')
+
+
+class StatusMonitor(object):
+    """
+    Tracks many launched jobs from a single background thread. Each job is polled more often
+    while its progress changes and less often while it does not, and the total number of status
+    requests per second stays bounded however many jobs are tracked.
+    """
+
+    def __init__(self,
+                 transport=None,
+                 min_interval=settings.STATUS_MONITOR_MIN_INTERVAL,
+                 max_interval=settings.STATUS_MONITOR_MAX_INTERVAL,
+                 max_requests_per_second=settings.STATUS_MONITOR_MAX_REQUESTS_PER_SECOND,
+                 max_failures=settings.STATUS_MONITOR_MAX_FAILURES,
+                 recorder=None):
+        """
+        :param transport: pooled Transport used for the status requests, the shared one if None
+        :param min_interval: minimum seconds between two polls of the same job
+        :param max_interval: maximum seconds between two polls of the same job
+        :param max_requests_per_second: bound of the status requests sent for all jobs together
+        :param max_failures: number of consecutive failed polls after which a job is failed
+        :param recorder: ProgressRecorder recording every polled progress by launched job URL
+        """
+        self._transport = transport
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_requests_per_second = max_requests_per_second
+        self.max_failures = max_failures
+        self.recorder = recorder
+        self._jobs = {}
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def track(self, job, callback=None):
+        """
+        Starts tracking a launched job
+        :param job: JobLauncher handle of a launched job, or the launched job URL
+        :param callback: optional callback(job_status, event) called on progress changes, completion and failure
+        :return: JobStatus of the job
+        """
+        url = self._url(job)
+        with self._lock:
+            status = self._jobs.get(url)
+            if status is None:
+                status = JobStatus(url)
+                status.interval = self.min_interval
+                self._jobs[url] = status
+                self._push(status, 0)
+            self._start()
+        if callback is not None:
+            status.add_callback(callback)
+        return status
+
+    def untrack(self, job):
+        """
+        Stops tracking a job and removes it from the status table
+        :param job: JobLauncher handle or launched job URL
+        """
+        with self._lock:
+            self._jobs.pop(self._url(job), None)
+
+    def status(self, job):
+        """
+        :param job: JobLauncher handle or launched job URL
+        :return: JobStatus of a tracked job
+        """
+        return self._jobs[self._url(job)]
+
+    def table(self):
+        """
+        :return: dict mapping the URL of every tracked job to its (state, progress)
+        """
+        with self._lock:
+            return dict((url, (status.state, status.progress)) for url, status in self._jobs.items())
+
+    def wait(self, job, timeout=None):
+        """
+        Waits for a single job, tracking it if needed, while the others keep being polled
+        :param job: JobLauncher handle or launched job URL
+        :param timeout: seconds to wait for, forever if None
+        :return: final progress in percents
+        """
+        return self.track(job).result(timeout)
+
+    def as_completed(self, jobs, timeout=None):
+        """
+        Yields the JobStatus of the given jobs as they complete or fail
+        :param jobs: JobLauncher handles or launched job URLs
+        :param timeout: seconds to wait for all jobs, forever if None
+        """
+        finished = Queue()
+
+        def on_event(job_status, event):
+            if event != EVENT_PROGRESS:
+                finished.put(job_status)
+
+        statuses = [self.track(job) for job in jobs]
+        for status in statuses:
+            status.add_callback(on_event)
+        expiry = None if timeout is None else time.time() + timeout
+        for _ in statuses:
+            try:
+                remaining = None if expiry is None else max(0, expiry - time.time())
+                yield finished.get(timeout=remaining)
+            except Empty:
+                raise RuntimeError('Timed out waiting for jobs to complete')
+
+    def progress_bar(self, jobs, refresh=.5):
+        """
+        Shows a single progress bar combining the progress of the given jobs, until they all completed
+        or failed
+        :param jobs: JobLauncher handles or launched job URLs
+        :param refresh: seconds between two refreshes of the bar
+        :return: list of JobStatus of the given jobs
+        """
+        from tqdm import tqdm
+        statuses = [self.track(job) for job in jobs]
+        with tqdm(total=100 * len(statuses)) as pbar:
+            while True:
+                total = sum(100 if status.done() else max(status.progress, 0) for status in statuses)
+                pbar.update(total - pbar.n)
+                if all(status.done() for status in statuses):
+                    return statuses
+                time.sleep(refresh)
+
+    def stop(self):
+        """ Stops the background poller """
+        with self._lock:
+            self._running = False
+            self._lock.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _url(job):
+        if hasattr(job, 'launched_job_url'):
+            if not job.launched_job_url:
+                raise ValueError('Job was not scheduled and launched!')
+            return job.launched_job_url
+        return job
+
+    def _start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='joblauncher-status-monitor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _push(self, status, delay):
+        status.sequence = next(self._sequence)
+        heapq.heappush(self._schedule, (time.time() + delay, status.sequence, status.url))
+        self._lock.notify_all()
+
+    def _run(self):
+        spacing = 1.0 / self.max_requests_per_second
+        last_request = 0
+        while True:
+            with self._lock:
+                status = None
+                while self._running and status is None:
+                    now = time.time()
+                    if not self._schedule:
+                        self._lock.wait()
+                        continue
+                    due, sequence, url = self._schedule[0]
+                    wait = max(due - now, last_request + spacing - now)
+                    if wait > 0:
+                        self._lock.wait(wait)
+                        continue
+                    heapq.heappop(self._schedule)
+                    status = self._jobs.get(url)
+                    if status is not None and status.sequence != sequence:
+                        # Entry of an untracked job, or superseded by a later one
+                        status = None
+                if not self._running:
+                    return
+            last_request = time.time()
+            self._poll(status)
+
+    def _poll(self, status):
+        try:
+            response = http_request(HTTP_METHOD_GET, status.url, None,
+                                    settings.DEFAULT_RESOURCE_CONNECTOR_STATUS, None, self._transport)
+            progress = int(response.contents['progress'])
+        except Exception as error:
+            status.failures += 1
+            if status.failures >= self.max_failures:
+                self._finish(status, JOB_STATE_FAILED, error)
+            else:
+                self._reschedule(status, min(status.interval * 2, self.max_interval))
+            return
+
+        status.failures = 0
+        status.updated = time.time()
+        if self.recorder is not None:
+            self.recorder.record(status.url, progress, status.updated)
+        changed = progress != status.progress
+        status.progress = progress
+        if progress >= 100:
+            self._finish(status, JOB_STATE_COMPLETED)
+            return
+        if changed:
+            interval = max(status.interval / 2, self.min_interval)
+        else:
+            interval = min(status.interval * 1.5, self.max_interval)
+        self._reschedule(status, interval)
+        if changed:
+            status._notify(EVENT_PROGRESS)
+
+    def _reschedule(self, status, interval):
+        with self._lock:
+            status.interval = interval
+            if self._jobs.get(status.url) is status:
+                self._push(status, interval)
+
+    def _finish(self, status, state, error=None):
+        # Finished jobs stay in the status table until untracked, but are not polled anymore
+        with self._lock:
+            status.state = state
+            status.error = error
+        status._notify(state)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Subscriptions to the progress of launched jobs, pushed by the resource connector when it supports it
+"""
+
+import json
+import logging
+import threading
+import time
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+import joblauncher.settings as settings
+from joblauncher.errors import ConnectionFailedError, service_error
+from joblauncher.status_monitor import JobStatus, StatusMonitor, EVENT_PROGRESS, JOB_STATE_COMPLETED
+from joblauncher.transport import get_transport
+from joblauncher.utils import http_request, HTTP_METHOD_GET, HTTP_STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+MODE_EVENTS = 'events'
+MODE_LONG_POLL = 'long-poll'
+MODE_POLL = 'poll'
+
+
+class Subscription(object):
+    """
+    Delivers the progress of a launched job as soon as it changes. The resource connector pushes it
+    through server-sent events or answers long-polling status requests when it supports them, which
+    are tried in order; otherwise, or once pushing failed repeatedly, a StatusMonitor polls the job
+    with adaptive intervals. Progress is delivered to callbacks(job_status, event), as with the
+    StatusMonitor, or by iterating over the subscription.
+    """
+
+    def __init__(self, job, callback=None, monitor=None, transport=None, modes=settings.SUBSCRIPTION_MODES,
+                 long_poll_wait=settings.SUBSCRIPTION_LONG_POLL_WAIT,
+                 max_reconnects=settings.SUBSCRIPTION_MAX_RECONNECTS):
+        """
+        :param job: JobLauncher handle of a launched job, or the launched job URL
+        :param callback: optional callback(job_status, event) called on progress changes, completion and failure
+        :param monitor: StatusMonitor polling the job if pushing is not possible, a private one if None
+        :param transport: pooled Transport used for the requests, the shared one if None
+        :param modes: push mechanisms tried in order, among MODE_EVENTS and MODE_LONG_POLL
+        :param long_poll_wait: seconds the resource connector holds a long-polling request
+        :param max_reconnects: number of consecutive failed reconnections before falling back to polling
+        """
+        self.url = StatusMonitor._url(job)
+        self.status = JobStatus(self.url)
+        self.mode = None
+        self.modes = tuple(modes)
+        self.long_poll_wait = long_poll_wait
+        self.max_reconnects = max_reconnects
+        if callback is not None:
+            self.status.add_callback(callback)
+        self._transport = transport
+        self._monitor = monitor
+        self._polling_monitor = None
+        self._closed = threading.Event()
+        self._response = None
+        self._thread = None
+
+    def start(self):
+        """ Starts receiving the progress from a background thread, unless it was already started """
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name='joblauncher-subscription')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        """ Stops receiving the progress """
+        self._closed.set()
+        response = self._response
+        if response is not None:
+            # Unblocks the thread reading the event stream
+            response.close()
+        if self._polling_monitor is not None:
+            self._polling_monitor.untrack(self.url)
+            if self._monitor is None:
+                self._polling_monitor.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def events(self, timeout=None):
+        """
+        Yields the events delivered from now on, until the job completed or failed
+        :param timeout: seconds to wait for each event, forever if None
+        :return: generator of (event, progress) tuples
+        """
+        queue = Queue()
+        self.status.add_callback(lambda status, event: queue.put((event, status.progress)))
+        while True:
+            try:
+                event, progress = queue.get(timeout=timeout)
+            except Empty:
+                raise RuntimeError('Timed out waiting for the progress of job ' + self.url)
+            yield event, progress
+            if event != EVENT_PROGRESS:
+                return
+
+    def __iter__(self):
+        return self.events()
+
+    def _run(self):
+        for mode in self.modes:
+            if self._push(mode):
+                return
+        if not self._closed.is_set():
+            logger.info('Polling the progress of job ' + self.url)
+            self.mode = MODE_POLL
+            self._polling_monitor = self._monitor or StatusMonitor(self._transport)
+            self._polling_monitor.track(self.url, self._forward)
+
+    def _push(self, mode):
+        """
+        Receives the progress pushed with a mechanism, reconnecting after failures
+        :return: True once the job is done or the subscription closed, False to try the next mechanism
+        """
+        receive = self._events if mode == MODE_EVENTS else self._long_poll
+        failures = 0
+        while not self._closed.is_set() and not self.status.done():
+            try:
+                if not receive():
+                    return False
+                failures = 0
+            except Exception as error:
+                if self._closed.is_set():
+                    break
+                failures += 1
+                if failures > self.max_reconnects:
+                    logger.info('Failed to receive the progress of job %s with %s: %s' % (self.url, mode, error))
+                    return False
+                self._closed.wait(min(.1 * 2 ** failures, settings.STATUS_MONITOR_MAX_INTERVAL))
+        return True
+
+    def _events(self):
+        """
+        Reads the server-sent events of the resource connector until the stream ends
+        :return: False if the resource connector does not serve events
+        """
+        transport = self._transport or get_transport()
+        url = self.url + settings.DEFAULT_RESOURCE_CONNECTOR_EVENTS
+        connect_timeout = transport.timeout[0] if isinstance(transport.timeout, tuple) else transport.timeout
+        response = transport.session(url).get(url, stream=True, headers={'Accept': 'text/event-stream'},
+                                              timeout=(connect_timeout, settings.SUBSCRIPTION_IDLE_TIMEOUT))
+        try:
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                if self.mode is None and response.status_code in (HTTP_STATUS_OK, 404, 405, 501):
+                    return False
+                raise ConnectionFailedError('Event stream refused with code %d' % response.status_code, url)
+            self._response = response
+            self.mode = MODE_EVENTS
+            data = []
+            for line in response.iter_lines():
+                line = line.decode('utf-8') if isinstance(line, bytes) else line
+                if line.startswith('data:'):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    # A blank line ends an event, comments keeping the stream alive are ignored
+                    self._update(int(json.loads('\n'.join(data))['progress']))
+                    data = []
+                    if self.status.done():
+                        return True
+        finally:
+            self._response = None
+            response.close()
+        raise ConnectionFailedError('Event stream ended', url)
+
+    def _long_poll(self):
+        """
+        Sends long-polling status requests, held by the resource connector until the progress changes
+        :return: False if the resource connector answers at once, ignoring the wait preference
+        """
+        transport = self._transport or get_transport()
+        connect_timeout = transport.timeout[0] if isinstance(transport.timeout, tuple) else transport.timeout
+        while not self._closed.is_set() and not self.status.done():
+            headers = {'Prefer': 'wait=%d' % self.long_poll_wait}
+            if self.status.progress >= 0:
+                headers['If-None-Match'] = '"%d"' % self.status.progress
+            status = http_request(HTTP_METHOD_GET, self.url, None, settings.DEFAULT_RESOURCE_CONNECTOR_STATUS, None,
+                                  transport, timeout=(connect_timeout, self.long_poll_wait + connect_timeout),
+                                  headers=headers)
+            if status.code == 304:
+                continue
+            if status.code != HTTP_STATUS_OK:
+                raise service_error(status)
+            self._update(int(status.contents['progress']))
+            if 'wait' not in (status.headers or {}).get('Preference-Applied', ''):
+                return False
+            self.mode = MODE_LONG_POLL
+        return True
+
+    def _forward(self, job_status, event):
+        if event == EVENT_PROGRESS:
+            self._update(job_status.progress)
+        else:
+            self.status.progress = job_status.progress
+            self._finish(job_status.state, job_status.error)
+
+    def _update(self, progress):
+        if progress == self.status.progress or self.status.done():
+            return
+        self.status.progress = progress
+        self.status.updated = time.time()
+        if progress >= 100:
+            self._finish(JOB_STATE_COMPLETED)
+        else:
+            self.status._notify(EVENT_PROGRESS)
+
+    def _finish(self, state, error=None):
+        self.status.state = state
+        self.status.error = error
+        self.status._notify(state)
+
+
+def subscribe(job, callback=None, monitor=None, transport=None, modes=settings.SUBSCRIPTION_MODES):
+    """
+    Subscribes to the progress of a launched job
+    :param job: JobLauncher handle of a launched job, or the launched job URL
+    :param callback: optional callback(job_status, event) called on progress changes, completion and failure
+    :param monitor: StatusMonitor polling the job if pushing is not possible, a private one if None
+    :param transport: pooled Transport used for the requests, the shared one if None
+    :param modes: push mechanisms tried in order, among MODE_EVENTS and MODE_LONG_POLL
+    :return: started Subscription
+    """
+    return Subscription(job, callback, monitor, transport, modes).start()
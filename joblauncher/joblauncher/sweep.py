@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Parameter sweeps: expansion of a renderer payload template over a parameter grid into job specs,
+and their launch with bounded concurrency
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import re
+import threading
+
+import joblauncher.settings as settings
+from joblauncher.errors import is_transient
+from joblauncher.utils import Status
+
+logger = logging.getLogger(__name__)
+
+HTTP_STATUS_CREATED = 201
+HTTP_STATUS_CONFLICT = 409
+
+# {key} placeholders, leaving the ${rest_hostname} style variables of the JobManager untouched
+_PLACEHOLDER = re.compile(r'(?<!\$)\{(\w+)\}')
+_SCRIPT_COMMAND = re.compile(r'--script-command "((?:[^"\\]|\\.)*)"')
+
+# Allocation settings of the launched sessions which are taken from the payload of their spec
+_ALLOCATION_SETTINGS = (('queue', '_queue'), ('exclusive', '_exclusive_allocation'), ('nb_nodes', '_nb_nodes'),
+                        ('nb_cpus', '_nb_cpus'), ('nb_gpus', '_nb_gpus'))
+
+
+class SweepSpec(object):
+    """ Job of a sweep, running one or, when chunked, several points in a single allocation """
+    __slots__ = ('renderer_id', 'points', 'payload')
+
+    def __init__(self, renderer_id, points, payload):
+        self.renderer_id = renderer_id
+        self.points = points
+        self.payload = payload
+
+    def __repr__(self):
+        return 'SweepSpec(%r, %r)' % (self.renderer_id, self.points)
+
+
+def sweep_points(grid):
+    """
+    Lazily enumerates the distinct points of a parameter grid
+    :param grid: dict mapping every parameter to a list of values, or a single value, swept as
+    their cartesian product; or an iterable of dicts, one per point
+    :return: generator of dicts mapping parameters to values, duplicates removed
+    """
+    if isinstance(grid, dict):
+        keys = sorted(grid)
+        values = [grid[key] if isinstance(grid[key], (list, tuple)) else [grid[key]] for key in keys]
+        grid = (dict(zip(keys, point)) for point in itertools.product(*values))
+    seen = set()
+    for point in grid:
+        key = _point_key(point)
+        if key not in seen:
+            seen.add(key)
+            yield point
+
+
+def render(template, point):
+    """
+    Substitutes the {key} placeholders of every string of a payload template
+    :param template: renderer payload whose strings may hold {key} placeholders
+    :param point: dict mapping placeholder keys to values
+    :return: new payload; a string made of a single placeholder is replaced by the value itself
+    """
+    def substitute(value):
+        if not isinstance(value, (str, type(u''))):
+            return value
+        match = _PLACEHOLDER.match(value)
+        if match and match.end() == len(value) and match.group(1) in point:
+            return point[match.group(1)]
+        return _PLACEHOLDER.sub(
+            lambda match: '%s' % (point[match.group(1)],) if match.group(1) in point else match.group(0), value)
+    return dict((key, substitute(value)) for key, value in template.items())
+
+
+def config_id(prefix, payload):
+    """
+    Derives the renderer id of a generated configuration from its whole payload, so that a changed
+    command, queue or resource never reuses the stale configuration of a previous launch
+    :param prefix: prefix of the id, e.g. the id of the template
+    :param payload: renderer payload, whose id is ignored
+    :return: renderer id
+    """
+    digest = hashlib.sha1(json.dumps(dict((key, value) for key, value in payload.items() if key != 'id'),
+                                     sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return '%s_%s' % (prefix, digest[:12])
+
+
+def expand_sweep(template, grid, chunk_size=1, chunk_resource='nb_cpus'):
+    """
+    Lazily expands a renderer payload template over a parameter grid into job specs
+    :param template: renderer payload, e.g. from create_renderer_payload(), holding {key} placeholders
+    :param grid: parameter grid, see sweep_points()
+    :param chunk_size: number of points run by each job. The script commands of the points of a chunk
+    run side by side in one allocation, whose chunk_resource is multiplied by the number of points.
+    The points of a chunk then share the progress and the status of their job: a failed point is only
+    noticed from its own outputs.
+    :param chunk_resource: 'nb_cpus' or 'nb_nodes'
+    :return: generator of SweepSpec, whose renderer ids derive from their rendered payloads
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    base_id = template.get('id', settings.DEFAULT_RENDERER)
+    points = sweep_points(grid)
+    while True:
+        chunk = list(itertools.islice(points, chunk_size))
+        if not chunk:
+            return
+        payloads = [render(template, point) for point in chunk]
+        payload = payloads[0] if len(chunk) == 1 else _merge(payloads, chunk_resource)
+        payload['id'] = config_id(base_id, payload)
+        yield SweepSpec(payload['id'], chunk, payload)
+
+
+def launch_sweep(launcher, specs, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES, keep_configs=False):
+    """
+    Creates the configuration of every job spec and launches it in its own session, running up to
+    max_parallel config/create/schedule/wait-for-running pipelines at the same time. Specs are only
+    expanded as workers get free.
+    :param launcher: JobLauncher whose allocation settings and transport the sessions use
+    :param specs: iterable of SweepSpec, e.g. from expand_sweep()
+    :param max_parallel: maximum number of jobs being launched at the same time
+    :param keep_configs: keep the configurations created for the specs, which are otherwise deleted
+    once their job is launched
+    :return: list of (SweepSpec, JobLauncher) tuples in spec order, each job holding its launch_status
+    """
+    specs = enumerate(specs)
+    lock = threading.Lock()
+    results = {}
+
+    def worker():
+        while True:
+            with lock:
+                try:
+                    index, spec = next(specs)
+                except StopIteration:
+                    return
+            job = _launch_spec(launcher, spec, keep_configs)
+            with lock:
+                results[index] = (spec, job)
+
+    threads = [threading.Thread(target=worker, name='joblauncher-sweep') for _ in range(max(1, max_parallel))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    launched = [results[index] for index in sorted(results)]
+    launcher.sessions.extend(job for _, job in launched if job.launch_status.code == 200)
+    return launched
+
+
+def _launch_spec(launcher, spec, keep_configs=False):
+    job = launcher.spawn(spec.renderer_id)
+    for key, attribute in _ALLOCATION_SETTINGS:
+        if spec.payload.get(key) is not None:
+            setattr(job, attribute, spec.payload[key])
+    created = False
+    resumable = False
+    try:
+        # Renderer ids derive from the whole payload, so an existing configuration is the one of this spec
+        status = job.config_create(spec.payload)
+        if status.code not in (HTTP_STATUS_CREATED, HTTP_STATUS_CONFLICT):
+            job.launch_status = status
+            return job
+        created = status.code == HTTP_STATUS_CREATED
+        job.launch_status = job.schedule_and_launch_job()
+    except Exception as error:
+        logger.info('Failed to schedule and launch the job: ' + str(error))
+        # A session kept after a transient failure still needs its configuration to be resumed
+        resumable = is_transient(error)
+        job.launch_status = Status(400, str(error), '')
+    if created and not keep_configs and not resumable:
+        _delete_config(job, spec.renderer_id)
+    return job
+
+
+def _delete_config(job, renderer_id):
+    """ Deletes the configuration created for a spec, its session being scheduled already """
+    try:
+        status = job.delete_job_settings(renderer_id)
+        if status.code != 200:
+            logger.info('Failed to delete the configuration %s: %s' % (renderer_id, status.contents))
+    except Exception as error:
+        logger.info('Failed to delete the configuration %s: %s' % (renderer_id, error))
+
+
+def merge_payloads(payloads, ignored=('id',)):
+    """
+    Merges renderer payloads into the payload of a single allocation running their script commands
+    side by side. The merged job only reports the progress and the status of the allocation as a
+    whole, not the ones of every command.
+    :param payloads: renderer payloads, each with a --script-command in its scheduler_rest_parameters_format
+    :param ignored: keys which may differ between the payloads, taken from the first one
+    :return: merged payload
+    """
+    commands = []
+    for payload in payloads:
+        match = _SCRIPT_COMMAND.search(payload.get('scheduler_rest_parameters_format', ''))
+        if match is None:
+            raise ValueError('Merged payloads need a --script-command in scheduler_rest_parameters_format')
+        commands.append(match.group(1))
+    merged = dict(payloads[0])
+    command = ' & '.join('(%s)' % command for command in commands) + ' & wait'
+    merged['scheduler_rest_parameters_format'] = _SCRIPT_COMMAND.sub(
+        lambda _: '--script-command "%s"' % command, merged['scheduler_rest_parameters_format'], count=1)
+    for key in merged:
+        if key != 'scheduler_rest_parameters_format' and key not in ignored and \
+                any(payload.get(key) != merged[key] for payload in payloads):
+            raise ValueError('Merged payloads may only differ in their script command: ' + key)
+    return merged
+
+
+def _merge(payloads, chunk_resource):
+    """ Merges the payloads of the points of a chunk into the payload of a single allocation """
+    merged = merge_payloads(payloads)
+    merged[chunk_resource] = (merged.get(chunk_resource) or 1) * len(payloads)
+    return merged
+
+
+def _point_key(point):
+    return json.dumps(point, sort_keys=True, default=str)
@@ -0,0 +1,74 @@
+import sys
+import unittest
+from collections import OrderedDict
+
+from joblauncher.resource_allocator import SESSION_STATUS_RUNNING, SESSION_STATUS_SCHEDULED
+from joblauncher.utils import Status
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    import joblauncher.async_resource_allocator as async_resource_allocator
+    from joblauncher.async_job_launcher import AsyncJobLauncher
+
+
+class FakeJobManager(object):
+    """ Replaces http_request and answers like the JobManager would """
+
+    def __init__(self, scheduled_polls=1):
+        self.scheduled_polls = scheduled_polls
+        self.requests = []
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, **kwargs):
+        self.requests.append((method, command))
+        if method == 'POST':
+            return Status(201, 'created', {'session': 'abc'})
+        if command == 'status':
+            code = SESSION_STATUS_RUNNING
+            if self.scheduled_polls > 0:
+                self.scheduled_polls -= 1
+                code = SESSION_STATUS_SCHEDULED
+            return Status(200, OrderedDict([('code', code), ('hostname', 'node'), ('port', '8000')]), {})
+        if command is not None and command.endswith('/status'):
+            return Status(200, OrderedDict([('progress', 42)]), {})
+        return Status(200, '', {})
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'asyncio client requires Python 3.5+')
+class AsyncJobLauncherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJobManager()
+        self.original_http_request = async_resource_allocator.http_request
+        async_resource_allocator.http_request = self.fake
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        async_resource_allocator.http_request = self.original_http_request
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_schedule_status_and_cancel(self):
+        job_launcher = AsyncJobLauncher()
+
+        status = self.loop.run_until_complete(job_launcher.schedule_and_launch_job('bbic_wrapper'))
+        self.assertEqual(status.code, 200)
+        self.assertEqual(job_launcher.launched_job_url, 'http://node:8000')
+        self.assertEqual(job_launcher._cookies, {'session': 'abc'})
+
+        progress = self.loop.run_until_complete(job_launcher.get_single_job_status())
+        self.assertEqual(progress, 42)
+
+        status = self.loop.run_until_complete(job_launcher.deallocate_and_cancel_job())
+        self.assertEqual(status.code, 200)
+        self.assertEqual(job_launcher.launched_job_url, None)
+        self.assertEqual(self.fake.requests[-1], ('DELETE', None))
+
+    def test_many_launches_on_one_loop(self):
+        self.fake.scheduled_polls = 0
+        job_launchers = [AsyncJobLauncher() for _ in range(50)]
+
+        statuses = self.loop.run_until_complete(asyncio.gather(
+            *[job_launcher.schedule_and_launch_job() for job_launcher in job_launchers]))
+
+        self.assertEqual([status.code for status in statuses], [200] * 50)
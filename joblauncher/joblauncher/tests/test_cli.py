@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import joblauncher
+from joblauncher.cli import main
+from joblauncher.fake_server import FakeJobManager
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class CliTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fake = FakeJobManager(job_duration=60).start()
+        self.stdout = sys.stdout
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        self.fake.stop()
+        shutil.rmtree(self.directory)
+
+    def run_command(self, *argv):
+        """ :return: exit status and output of a command """
+        sys.stdout = output = StringIO()
+        try:
+            code = main(['--url', self.fake.url, '--registry', os.path.join(self.directory, 'jobs.sqlite'),
+                         '--json'] + list(argv))
+        finally:
+            sys.stdout = self.stdout
+        return code, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_lifecycle(self):
+        code, output = self.run_command('launch', 'a', '--allocation-time', '1:00:00')
+        self.assertEqual(code, 0)
+        job_id = output[0]['job_id']
+
+        code, output = self.run_command('status')
+        self.assertEqual(code, 0)
+        self.assertEqual([(data['job_id'], data['status']) for data in output[0]], [(job_id, 'running')])
+        self.assertGreaterEqual(output[0][0]['progress'], 0)
+
+        code, output = self.run_command('logs', job_id)
+        self.assertEqual(code, 0)
+        self.assertTrue(all(data['job_id'] == job_id for data in output))
+
+        code, output = self.run_command('cancel', job_id)
+        self.assertEqual((code, output), (0, [[{'job_id': job_id, 'code': 200}]]))
+
+        code, output = self.run_command('list')
+        self.assertEqual([(data['job_id'], data['status']) for data in output[0]], [(job_id, 'deleted')])
+        self.assertNotIn('cookies', output[0][0])
+
+    def test_launched_jobs_are_not_orphans(self):
+        self.run_command('launch', 'a')
+
+        registry = joblauncher.JobRegistry(os.path.join(self.directory, 'jobs.sqlite'))
+        self.assertEqual(len(registry.list()), 1)
+        self.assertEqual(registry.orphans(), [])
+
+    def test_unknown_job(self):
+        code, output = self.run_command('cancel', 'unknown')
+
+        self.assertEqual(code, 1)
+        self.assertEqual(output, [{'error': 'Job not found in the registry: unknown'}])
+
+    def test_sync(self):
+        path = os.path.join(self.directory, 'jobs.json')
+        with open(path, 'w') as definitions:
+            json.dump({'id': 'a', 'command_line': 'true'}, definitions)
+
+        code, output = self.run_command('sync', path, '--dry-run')
+        self.assertEqual((code, output[0]['created'], self.fake.configs), (0, ['a'], {}))
+
+        self.run_command('sync', path)
+        self.assertEqual(list(self.fake.configs), ['a'])
+
+    def test_trace_report(self):
+        path = os.path.join(self.directory, 'trace.json')
+        for _ in range(2):
+            self.run_command('--trace', path, 'launch', 'a')
+
+        code, output = self.run_command('trace-report', path, '--percentile', '50')
+        self.assertEqual(code, 0)
+        self.assertEqual(output[0]['launch']['count'], 2)
+        self.assertEqual(sorted(output[0]['session_create']), ['count', 'max', 'mean', 'p50'])
+        self.assertFalse(joblauncher.get_tracer().enabled)
+
+    def test_import_does_not_load_the_http_stack(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(joblauncher.__file__)))
+        modules = ['requests', 'tqdm', 'asyncio']
+        if sys.version_info >= (3, 7):
+            # The package modules are only imported once used
+            modules.append('joblauncher.job_launcher')
+        loaded = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, joblauncher.cli; '
+                                   'print(sorted(set(%r) & set(sys.modules)))' % modules],
+            cwd=root)
+
+        self.assertEqual(loaded.strip(), b'[]')
+
+
+    def test_status_and_cancel_do_not_load_the_launcher(self):
+        code, output = self.run_command('launch', 'a')
+        job_id = output[0]['job_id']
+        root = os.path.dirname(os.path.dirname(os.path.abspath(joblauncher.__file__)))
+        modules = ['requests', 'multiprocessing.pool']
+        if sys.version_info >= (3, 7):
+            modules.append('joblauncher.job_launcher')
+        for command in ('status', 'cancel'):
+            loaded = subprocess.check_output(
+                [sys.executable, '-c', 'import sys; from joblauncher.cli import main; '
+                                       'code = main(["--url", %r, "--registry", %r, "--json", %r, %r]); '
+                                       'sys.stdout.write("%%d %%s" %% (code, sorted(set(%r) & set(sys.modules))))' % (
+                                           self.fake.url, os.path.join(self.directory, 'jobs.sqlite'), command,
+                                           job_id, modules)],
+                cwd=root)
+            self.assertEqual(loaded.strip().splitlines()[-1], b'0 []')
+        self.assertEqual(self.fake.sessions, {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from collections import OrderedDict
+import joblauncher
+import joblauncher.resource_allocator as resource_allocator
+from joblauncher.config_cache import ConfigCache
+from joblauncher.utils import Status
+
+
+class FakeConfigService(object):
+    """ Replaces http_request and serves the renderer configurations with an ETag """
+
+    def __init__(self, renderers):
+        self.renderers = renderers
+        self.requests = []
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, headers=None, **kwargs):
+        self.requests.append((method, headers))
+        if method != 'GET':
+            return Status(200, '', {})
+        if headers and headers.get('If-None-Match') == '"v1"':
+            return Status(304, '', {}, {})
+        return Status(200, [OrderedDict(renderer) for renderer in self.renderers], {}, {'ETag': '"v1"'})
+
+
+class ConfigCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeConfigService([{'id': 'bbic_wrapper', 'queue': 'prod'}, {'id': 'other', 'queue': 'test'}])
+        self.original_http_request = resource_allocator.http_request
+        resource_allocator.http_request = self.fake
+
+    def tearDown(self):
+        resource_allocator.http_request = self.original_http_request
+
+    def test_lookups_are_cached(self):
+        job_launcher = joblauncher.JobLauncher()
+
+        self.assertEqual(job_launcher.get_job_settings('bbic_wrapper'), {'id': 'bbic_wrapper', 'queue': 'prod'})
+        self.assertEqual(job_launcher.get_job_settings('other')['queue'], 'test')
+        self.assertEqual(job_launcher.get_job_settings('missing'), None)
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_write_through(self):
+        job_launcher = joblauncher.JobLauncher()
+
+        job_launcher.edit_job_settings('bbic_wrapper', queue='test')
+        self.assertEqual(job_launcher.get_job_settings('bbic_wrapper')['queue'], 'test')
+
+        job_launcher.create_job_renderer(job_launcher.create_renderer_payload(id='new'))
+        self.assertEqual(job_launcher.get_job_settings('new')['id'], 'new')
+
+        job_launcher.delete_job_settings('other')
+        self.assertEqual(job_launcher.get_job_settings('other'), None)
+
+        self.assertEqual([method for method, _ in self.fake.requests], ['GET', 'PUT', 'POST', 'DELETE'])
+
+    def test_revalidation(self):
+        job_launcher = joblauncher.JobLauncher()
+        job_launcher._config_cache = ConfigCache(ttl=0)
+
+        job_launcher.get_job_settings('bbic_wrapper')
+        self.assertEqual(job_launcher.get_job_settings('bbic_wrapper')['queue'], 'prod')
+
+        self.assertEqual(self.fake.requests, [('GET', None), ('GET', {'If-None-Match': '"v1"'})])
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+import joblauncher
+from joblauncher.config_sync import load_job_definitions
+from joblauncher.fake_server import FakeJobManager
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'examples')
+
+
+class ConfigSyncTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJobManager().start()
+        self.job_launcher = joblauncher.JobLauncher(service_url=self.fake.url)
+        self.definitions = [self.job_launcher.create_renderer_payload(id='slice_%d' % i) for i in range(30)]
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def test_load_example(self):
+        definitions = load_job_definitions(EXAMPLES)
+
+        self.assertEqual(definitions['bbic_wrapper']['queue'], 'interactive')
+        self.assertEqual(definitions['bbic_wrapper']['exclusive'], False)
+
+    def test_load_directory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join(EXAMPLES, 'bbic_stack_wrapper_settings.dict'), directory)
+            with open(os.path.join(directory, 'other.json'), 'w') as definition:
+                definition.write('{"id": "other", "exclusive": true}')
+
+            definitions = load_job_definitions(directory)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(sorted(definitions), ['bbic_wrapper', 'other'])
+        self.assertRaises(ValueError, load_job_definitions, [{'id': 'a'}, {'id': 'a'}])
+
+    def test_sync(self):
+        report = self.job_launcher.sync_configs(self.definitions, max_parallel=8)
+
+        self.assertEqual(len(report.created), 30)
+        self.assertEqual(report.failed, [])
+        self.assertEqual(len(self.fake.configs), 30)
+
+        self.definitions[0]['queue'] = 'test'
+        self.fake.configs['orphan'] = {'id': 'orphan'}
+        report = self.job_launcher.sync_configs(self.definitions[:-1], delete_missing=True, dry_run=True)
+
+        self.assertEqual(report.updated, ['slice_0'])
+        self.assertEqual(sorted(report.deleted), ['orphan', 'slice_29'])
+        self.assertEqual(len(report.unchanged), 28)
+        self.assertIn('orphan', self.fake.configs)
+
+        self.fake.requests.clear()
+        report = self.job_launcher.sync_configs(self.definitions[:-1], delete_missing=True)
+
+        self.assertEqual(report.failed, [])
+        self.assertEqual(self.fake.configs['slice_0']['queue'], 'test')
+        self.assertEqual(sorted(self.fake.configs), sorted('slice_%d' % i for i in range(29)))
+        self.assertEqual(dict(self.fake.requests), {'config_get': 1, 'config_put': 1, 'config_delete': 2})
+
+    def test_failed_actions_are_reported(self):
+        handle = self.fake.handle
+
+        def failing_handle(method, path, cookies, body, headers=None):
+            if method == 'POST' and isinstance(body, dict) and body.get('id') == 'slice_3':
+                return 500, 'Internal error', {}
+            return handle(method, path, cookies, body, headers)
+        self.fake.handle = failing_handle
+        report = self.job_launcher.sync_configs(self.definitions, max_parallel=8)
+
+        self.assertEqual(len(report.created), 30)
+        self.assertEqual([(renderer_id, action, status.code) for renderer_id, action, status in report.failed],
+                         [('slice_3', 'create', 500)])
+        self.assertEqual(len(self.fake.configs), 29)
+        self.assertIn('FAILED to create slice_3: 500', str(report))
@@ -0,0 +1,133 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import joblauncher
+from joblauncher.download import download_file, download_outputs, _output_path
+from joblauncher.errors import ChecksumError, ConnectionFailedError, ServiceError
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.retry import NO_RETRY
+
+SEGMENT = 32 * 1024
+STACK = bytes(bytearray(random.Random(0).getrandbits(8) for _ in range(10 * SEGMENT + 123)))
+
+
+class DownloadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def launch(self, **kwargs):
+        self.fake = FakeJobManager(outputs={'stack.bin': STACK, 'meta/info.json': b'{"slices": 10}'},
+                                   **kwargs).start()
+        self.addCleanup(self.fake.stop)
+        job = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+        job.schedule_and_launch_job('a')
+        return job
+
+    def read(self, *path):
+        with open(os.path.join(self.directory, *path), 'rb') as output:
+            return output.read()
+
+    def test_parallel_ranges(self):
+        job = self.launch()
+
+        outputs = download_outputs(job, self.directory, segment_size=SEGMENT)
+
+        self.assertEqual([output.name for output in outputs], ['meta/info.json', 'stack.bin'])
+        self.assertEqual(self.read('stack.bin'), STACK)
+        self.assertEqual(self.read('meta', 'info.json'), b'{"slices": 10}')
+        self.assertEqual(outputs[1].transferred, len(STACK))
+        # One range request per segment, plus the small file
+        self.assertEqual(self.fake.requests['output_get'], 11 + 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['meta', 'stack.bin'])
+
+    def test_resume(self):
+        job = self.launch(output_faults=1)
+
+        self.assertRaises(ConnectionFailedError, download_outputs, job, self.directory, ['stack.bin'],
+                          retry_policy=NO_RETRY, segment_size=SEGMENT)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['stack.bin.part', 'stack.bin.part.json'])
+
+        transferred = self.fake.requests['output_bytes']
+        output, = download_outputs(job, self.directory, ['stack.bin'], segment_size=SEGMENT)
+
+        self.assertEqual(self.read('stack.bin'), STACK)
+        # Only the interrupted segment was downloaded again
+        self.assertLessEqual(output.transferred, SEGMENT)
+        self.assertEqual(output.reused + output.transferred, len(STACK))
+        self.assertEqual(transferred + output.transferred, self.fake.requests['output_bytes'])
+        self.assertEqual(os.listdir(self.directory), ['stack.bin'])
+
+    def test_without_ranges(self):
+        job = self.launch(output_ranges=False, output_faults=1)
+
+        output, = job.download_outputs(self.directory, ['stack.bin'])
+
+        self.assertEqual(self.read('stack.bin'), STACK)
+        # The interrupted transfer was retried from the start
+        self.assertEqual(self.fake.requests['output_get'], 2)
+        self.assertEqual(output.reused, 0)
+
+    def test_range_requests_ignored(self):
+        job = self.launch()
+        handle = self.fake.handle
+
+        def ignoring_handle(method, path, cookies, body, headers=None):
+            # HEAD announces byte ranges, but GET always sends the whole file
+            if method == 'GET':
+                headers = dict((key, value) for key, value in (headers or {}).items() if key.lower() != 'range')
+            return handle(method, path, cookies, body, headers)
+        self.fake.handle = ignoring_handle
+
+        output, = job.download_outputs(self.directory, ['stack.bin'], max_connections=1)
+
+        self.assertEqual(self.read('stack.bin'), STACK)
+        self.assertEqual(output.reused, 0)
+        self.assertEqual(os.listdir(self.directory), ['stack.bin'])
+
+    def test_checksum_mismatch(self):
+        job = self.launch()
+        url = job.launched_job_url + '/resourceconnector/v1/outputs/stack.bin'
+        path = os.path.join(self.directory, 'stack.bin')
+
+        self.assertRaises(ChecksumError, download_file, url, path, sha256='0' * 64, segment_size=SEGMENT)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_unknown_output(self):
+        job = self.launch()
+
+        self.assertRaises(LookupError, job.download_outputs, self.directory, ['missing.bin'])
+        self.assertRaises(ValueError, _output_path, self.directory, '../escaped')
+
+    def test_download_many(self):
+        self.launch()
+        launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+        jobs = launcher.launch_many(['a', 'b'])
+
+        reports = launcher.download_many(self.directory)
+        self.assertTrue(all(report.ok for report in reports))
+        self.assertEqual(len(set(report.directory for report in reports)), 2)
+        for report in reports:
+            with open(os.path.join(report.directory, 'stack.bin'), 'rb') as output:
+                self.assertEqual(output.read(), STACK)
+
+        # Verified complete files are not downloaded again
+        requests = self.fake.requests['output_get']
+        reports = launcher.download_many(self.directory, jobs)
+        self.assertEqual([report.transferred for report in reports], [0, 0])
+        self.assertEqual(self.fake.requests['output_get'], requests)
+
+    def test_job_not_completed(self):
+        job = self.launch(job_duration=60)
+
+        reports = joblauncher.download_many([job], self.directory)
+        self.assertIsInstance(reports[0].error, ServiceError)
+        self.assertEqual(reports[0].error.code, 409)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager, SESSION_COOKIE
+from joblauncher.resource_allocator import WaitPolicy, SESSION_STATUS_RUNNING
+
+
+class FakeServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJobManager(scheduling_delay=.05, starting_delay=.02, job_duration=.2).start()
+        self.wait_policy = WaitPolicy(initial_interval=.01, max_interval=.05)
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def test_job_lifecycle(self):
+        job_launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=self.wait_policy)
+
+        self.assertEqual(job_launcher.create_job_renderer().code, 201)
+        self.assertEqual(job_launcher.get_job_settings('bbic_wrapper')['queue'], 'prod')
+        self.assertEqual(job_launcher.schedule_and_launch_job('bbic_wrapper').code, 200)
+        self.assertEqual(job_launcher.session_status().contents['code'], SESSION_STATUS_RUNNING)
+        self.assertTrue(0 <= job_launcher.get_single_job_status() <= 100)
+
+        job_launcher.get_continuous_job_status()
+
+        self.assertEqual(job_launcher.get_single_job_status(), 100)
+        self.assertEqual(job_launcher.deallocate_and_cancel_job().code, 200)
+        self.assertEqual(self.fake.sessions, {})
+        self.assertEqual(self.fake.requests['session_schedule'], 1)
+
+    def test_launch_many(self):
+        job_launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=self.wait_policy)
+
+        jobs = job_launcher.launch_many([job_launcher.create_renderer_payload()] * 20, max_parallel=20)
+
+        self.assertEqual([job.launch_status.code for job in jobs], [200] * 20)
+        self.assertEqual(len(self.fake.sessions), 20)
+        self.assertEqual([status.code for status in job_launcher.cancel_many()], [200] * 20)
+        self.assertEqual(self.fake.sessions, {})
+
+    def test_launch_many_with_failed_configuration(self):
+        job_launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=self.wait_policy)
+        handle = self.fake.handle
+
+        def failing_handle(method, path, cookies, body, headers=None):
+            if method == 'POST' and isinstance(body, dict) and body.get('id') == 'broken':
+                return 500, 'Internal error', {}
+            return handle(method, path, cookies, body, headers)
+        self.fake.handle = failing_handle
+        payloads = [job_launcher.create_renderer_payload(id=renderer_id) for renderer_id in ('a', 'broken', 'b')]
+        jobs = job_launcher.launch_many(payloads, max_parallel=3)
+
+        self.assertEqual([job._renderer for job in jobs], ['a', 'broken', 'b'])
+        self.assertEqual([job.launch_status.code for job in jobs], [200, 500, 200])
+        self.assertEqual(self.fake.requests['session_post'], 2)
+        self.assertEqual(len(job_launcher.sessions), 2)
+        job_launcher.cancel_many()
+
+    def test_batched_session_statuses(self):
+        job_launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=self.wait_policy)
+        jobs = job_launcher.launch_many(['bbic_wrapper'] * 10, max_parallel=10)
+        status_requests = self.fake.requests['session_status']
+
+        statuses = job_launcher.session_statuses()
+        self.assertEqual([status.contents['code'] for status in statuses], [SESSION_STATUS_RUNNING] * 10)
+        self.assertEqual([status.contents['id'] for status in statuses], [job.session_id for job in jobs])
+        self.assertEqual(self.fake.requests['session_get'], 1)
+        self.assertEqual(self.fake.requests['session_status'], status_requests)
+
+        # Only the session missing from the list is asked for its status
+        del self.fake.sessions[jobs[3].session_id]
+        statuses = job_launcher.session_statuses()
+        self.assertEqual([status.code for status in statuses], [200] * 3 + [404] + [200] * 6)
+        self.assertEqual(self.fake.requests['session_get'], 2)
+        self.assertEqual(self.fake.requests['session_status'], status_requests + 1)
+
+        # A server error for one unlisted session neither deletes it nor loses the other statuses
+        broken = jobs[5].session_id
+        handle = self.fake.handle
+
+        def failing_handle(method, path, cookies, body, headers=None):
+            if cookies.get(SESSION_COOKIE) == broken and path.endswith('/status'):
+                return 500, 'Internal error', {}
+            code, contents, response_headers = handle(method, path, cookies, body, headers)
+            if isinstance(contents, list):
+                contents = [session for session in contents if session.get('id') != broken]
+            return code, contents, response_headers
+        self.fake.handle = failing_handle
+        statuses = job_launcher.session_statuses()
+        self.assertEqual([status.code for status in statuses], [200] * 3 + [404, 200, 500] + [200] * 4)
+        self.assertIn(broken, self.fake.sessions)
+
+    def test_failures(self):
+        self.fake.failure_rate = 1
+        job_launcher = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=self.wait_policy)
+
+        self.assertRaises(Exception, job_launcher.schedule_and_launch_job, 'bbic_wrapper')
+        self.assertEqual(self.fake.sessions, {})
@@ -1,7 +1,32 @@
+import threading
 import unittest
+from collections import OrderedDict
 import joblauncher
+import joblauncher.resource_allocator as resource_allocator
 import joblauncher.settings as settings
 from joblauncher.job_launcher import ResourceAllocator
+from joblauncher.utils import Status
+
+
+class FakeJobManager(object):
+    """ Replaces http_request and answers like the JobManager would, with one session per cookie """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.requests = []
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, **kwargs):
+        with self.lock:
+            self.requests.append((method, command, body, cookies))
+            if method == 'POST' and url.endswith('/session/'):
+                self.sessions += 1
+                return Status(201, '', {'session': str(self.sessions)})
+        if command == 'status':
+            return Status(200, OrderedDict([('code', resource_allocator.SESSION_STATUS_RUNNING),
+                                            ('hostname', 'node' + cookies['session']),
+                                            ('port', '8000')]), {})
+        return Status(200, '', {})
 
 
 class JobLauncherTests(unittest.TestCase):
@@ -87,4 +112,32 @@ class JobLauncherTests(unittest.TestCase):
         self.assertEqual(job_launcher._url_service, new_service)
         self.assertEqual(job_launcher._url_session, new_session)
         self.assertEqual(job_launcher._url_config, new_config)
-        self.assertFalse(hasattr(job_launcher, '_new_attribute'))
\ No newline at end of file
+        self.assertFalse(hasattr(job_launcher, '_new_attribute'))
+
+    def test_launch_and_cancel_many(self):
+        fake = FakeJobManager()
+        original_http_request = resource_allocator.http_request
+        resource_allocator.http_request = fake
+        try:
+            job_launcher = joblauncher.JobLauncher()
+            job_launcher.edit_allocation_settings(_nb_cpus=4)
+            payload = job_launcher.create_renderer_payload(id='custom')
+
+            jobs = job_launcher.launch_many(['bbic_wrapper', payload, 'bbic_wrapper'], max_parallel=3)
+
+            self.assertEqual([job._renderer for job in jobs], ['bbic_wrapper', 'custom', 'bbic_wrapper'])
+            self.assertEqual([job.launch_status.code for job in jobs], [200, 200, 200])
+            self.assertEqual(set(job._nb_cpus for job in jobs), set([4]))
+            self.assertEqual(len(set(job.launched_job_url for job in jobs)), 3)
+            self.assertEqual(job_launcher.sessions, jobs)
+            self.assertEqual(job_launcher._cookies, None)
+            self.assertIn(('POST', None, payload, None), fake.requests)
+
+            statuses = job_launcher.cancel_many()
+
+            self.assertEqual([status.code for status in statuses], [200, 200, 200])
+            self.assertEqual(job_launcher.sessions, [])
+            deleted = set(cookies['session'] for method, _, _, cookies in fake.requests if method == 'DELETE')
+            self.assertEqual(deleted, set(['1', '2', '3']))
+        finally:
+            resource_allocator.http_request = original_http_request
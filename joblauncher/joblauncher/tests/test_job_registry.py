@@ -0,0 +1,91 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.job_registry import JobRegistry, JOB_STATUS_DELETED, JOB_STATUS_RUNNING, JOB_STATUS_SCHEDULED
+from joblauncher.resource_allocator import WaitPolicy
+
+
+class JobRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'jobs.sqlite')
+        self.fake = FakeJobManager(job_duration=60).start()
+
+    def tearDown(self):
+        self.fake.stop()
+        shutil.rmtree(self.directory)
+
+    def launcher(self):
+        return joblauncher.JobLauncher(service_url=self.fake.url, registry=JobRegistry(self.path),
+                                       wait_policy=WaitPolicy(initial_interval=.01), nb_cpus=4)
+
+    def test_reattach(self):
+        jobs = self.launcher().launch_many(['a', 'b', 'a'])
+
+        # A restarted process reattaches without any request
+        requests = sum(self.fake.requests.values())
+        job_launcher = self.launcher()
+        reattached = job_launcher.reattach_all('a')
+        self.assertEqual(sum(self.fake.requests.values()), requests)
+
+        # Jobs are listed by launch time, which parallel launches do not order
+        reattached.sort(key=lambda job: job.job_id != jobs[0].job_id)
+        self.assertEqual([job.job_id for job in reattached], [jobs[0].job_id, jobs[2].job_id])
+        self.assertEqual(reattached[1].launched_job_url, jobs[2].launched_job_url)
+        self.assertEqual(reattached[1]._nb_cpus, 4)
+        self.assertGreaterEqual(reattached[1].get_single_job_status(), 0)
+
+        job = job_launcher.reattach(jobs[1].job_id)
+        self.assertEqual(job._renderer, 'b')
+        self.assertEqual(job.deallocate_and_cancel_job().code, 200)
+        self.assertEqual(job_launcher.registry.get(job.job_id)['status'], JOB_STATUS_DELETED)
+        self.assertEqual(len(job_launcher.registry.list(status=JOB_STATUS_RUNNING)), 2)
+        self.assertEqual(job_launcher.registry.purge(), 1)
+
+    def test_cleanup_orphans(self):
+        jobs = self.launcher().launch_many(['a', 'b'])
+        job_launcher = self.launcher()
+        self.assertEqual(job_launcher.list_orphans(), [])
+
+        # Record the jobs as launched by a process which exited since
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        job_launcher.registry._connection.execute('UPDATE jobs SET pid = ?', (process.pid,))
+
+        self.assertEqual(sorted(job['job_id'] for job in job_launcher.list_orphans()),
+                         sorted(job.job_id for job in jobs))
+        statuses = job_launcher.cleanup_orphans()
+        self.assertEqual([status.code for status in statuses], [200, 200])
+        self.assertEqual(self.fake.sessions, {})
+        self.assertEqual(job_launcher.list_orphans(), [])
+
+    def test_queued_sessions_are_recorded(self):
+        self.fake.scheduling_delay = 60
+        root = os.path.dirname(os.path.dirname(os.path.abspath(joblauncher.__file__)))
+        process = subprocess.Popen(
+            [sys.executable, '-c', 'import joblauncher; joblauncher.JobLauncher(service_url=%r, '
+                                   'registry=joblauncher.JobRegistry(%r)).schedule_and_launch_job("a")'
+             % (self.fake.url, self.path)], cwd=root)
+        registry = JobRegistry(self.path)
+        expiry = time.time() + 10
+        while not registry.list(status=JOB_STATUS_SCHEDULED) and time.time() < expiry:
+            time.sleep(.05)
+        # The launching process dies while its session waits in the queue
+        process.kill()
+        process.wait()
+
+        job_launcher = self.launcher()
+        orphans = job_launcher.list_orphans()
+        self.assertEqual([job['status'] for job in orphans], [JOB_STATUS_SCHEDULED])
+        job = job_launcher.reattach(orphans[0]['job_id'])
+        self.assertTrue(job._scheduled)
+        self.assertEqual([status.code for status in job_launcher.cleanup_orphans()], [200])
+        self.assertEqual(self.fake.sessions, {})
+        self.assertEqual(self.fake.requests['session_schedule'], 1)
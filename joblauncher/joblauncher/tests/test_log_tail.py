@@ -0,0 +1,113 @@
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager, SESSION_COOKIE
+from joblauncher.log_tail import LogTail, follow_logs
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.utils import Status
+
+
+class FakeLog(object):
+    """ Session log served whole, as by services without range support """
+
+    def __init__(self, text):
+        self.text = text
+        self.offsets = []
+
+    def session_log_range(self, offset):
+        self.offsets.append(offset)
+        return Status(200, {'contents': self.text}, {})
+
+
+class RangeLog(object):
+    """ Session log served by byte ranges, growing by chunk bytes before every request """
+
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+        self.size = 0
+
+    def session_log_range(self, offset):
+        self.size += self.chunk
+        written = self.data[:self.size]
+        if offset >= len(written):
+            return Status(416, '', {}, {'Content-Range': 'bytes */%d' % len(written)})
+        return Status(206, None, {}, raw=written[offset:])
+
+
+class LogTailTests(unittest.TestCase):
+
+    def test_client_side_diff(self):
+        log = FakeLog(u'first\nsec')
+        tail = LogTail(log)
+
+        self.assertEqual(tail.read(), [u'first'])
+        log.text += u'ond\nthird\n'
+        self.assertEqual(tail.read(), [u'second', u'third'])
+        self.assertEqual(tail.read(), [])
+        # The bytes read last are requested again to detect a replaced log
+        self.assertEqual(log.offsets, [0, 0, 0])
+
+        log.text = u'restarted\n'
+        self.assertEqual(tail.read(), [u'restarted'])
+
+    def test_long_lines_are_bounded(self):
+        tail = LogTail(FakeLog(u'x' * 100), max_line_length=10)
+
+        self.assertEqual(tail.read(), [u'x' * 100])
+
+    def test_ranges_splitting_characters(self):
+        data = u'caf\xe9 cr\xe8me\nna\xefve\n'.encode('utf-8')
+        tail = LogTail(RangeLog(data, 4))
+
+        lines = []
+        while tail.offset < len(data):
+            lines.extend(tail.read())
+            self.assertEqual(tail.offset, min(tail.allocator.size, len(data)))
+        self.assertEqual(lines, [u'caf\xe9 cr\xe8me', u'na\xefve'])
+        self.assertEqual(tail.offset, len(data))
+
+        tail = LogTail(RangeLog(u'\xe9\xe9\xe9'.encode('utf-8'), 3), max_line_length=2)
+        self.assertEqual(tail.read() + tail.read(), [u'\xe9', u'\xe9\xe9'])
+
+    def test_truncated_and_replaced_range_logs(self):
+        with FakeJobManager(job_duration=60) as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            job_launcher.schedule_and_launch_job('bbic_wrapper')
+            tail = LogTail(job_launcher)
+            self.assertEqual(tail.read()[0], 'Session %s scheduled' % job_launcher._cookies[SESSION_COOKIE])
+
+            fake._log = lambda session, now: 'rotated\n'
+            self.assertEqual(tail.read(), ['rotated'])
+            self.assertEqual(tail.read(), [])
+            fake._log = lambda session, now: 'x' * 100 + '\nreplaced\n'
+            self.assertEqual(tail.read(), ['x' * 100, 'replaced'])
+            self.assertEqual(fake.requests['session_log'], 6)
+            job_launcher.deallocate_and_cancel_job()
+
+    def test_range_requests(self):
+        with FakeJobManager(job_duration=.3) as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            job_launcher.schedule_and_launch_job('bbic_wrapper')
+
+            lines = []
+            for line in job_launcher.tail_log(interval=.05):
+                lines.append(line)
+                if line == 'progress 100':
+                    job_launcher.deallocate_and_cancel_job()
+
+            self.assertEqual(lines[1:], ['progress %d' % percent for percent in range(101)])
+            self.assertEqual(fake.requests['session_log'] > 2, True)
+
+    def test_follow_many(self):
+        with FakeJobManager(job_duration=.2, log_ranges=False) as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            jobs = job_launcher.launch_many(['bbic_wrapper'] * 3)
+
+            lines = dict((id(job), []) for job in jobs)
+            for job, line in follow_logs(jobs, interval=.05):
+                lines[id(job)].append(line)
+                if line == 'progress 100':
+                    job.session_delete()
+
+            for job in jobs:
+                self.assertEqual(lines[id(job)][1:], ['progress %d' % percent for percent in range(101)])
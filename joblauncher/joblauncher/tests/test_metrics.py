@@ -0,0 +1,48 @@
+import json
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.metrics import Metrics, get_metrics, enable_metrics
+from joblauncher.resource_allocator import WaitPolicy
+
+
+class MetricsTests(unittest.TestCase):
+
+    def test_histogram(self):
+        metrics = Metrics(enabled=True, buckets=(.1, 1))
+        metrics.observe('GET', 'status', 200, .05, 0, 10)
+        metrics.observe('GET', 'status', 200, .5, 0, 20)
+        metrics.observe('GET', 'status', 502, 2)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual([(series['code'], series['count']) for series in snapshot], [('200', 2), ('502', 1)])
+        self.assertEqual(snapshot[0]['latency_buckets'], [[.1, 1], [1, 2]])
+        self.assertEqual(snapshot[0]['bytes_received'], 30)
+        self.assertEqual(json.loads(metrics.to_json())[1]['latency_buckets'], [[.1, 0], [1, 0]])
+
+        text = metrics.to_prometheus()
+        self.assertIn('joblauncher_http_requests_total{method="GET",operation="status",code="200"} 2', text)
+        self.assertIn('joblauncher_http_request_duration_seconds_bucket{method="GET",operation="status",'
+                      'code="502",le="+Inf"} 1', text)
+
+    def test_requests_are_recorded(self):
+        metrics = enable_metrics()
+        metrics.reset()
+        try:
+            with FakeJobManager() as fake:
+                job_launcher = joblauncher.JobLauncher(service_url=fake.url,
+                                                       wait_policy=WaitPolicy(initial_interval=.01))
+                job_launcher.schedule_and_launch_job('bbic_wrapper')
+                job_launcher.get_single_job_status()
+                job_launcher.deallocate_and_cancel_job()
+        finally:
+            enable_metrics(False)
+
+        counts = dict(((series['method'], series['operation'], series['code']), series['count'])
+                      for series in get_metrics().snapshot())
+        self.assertEqual(counts[('POST', 'session', '201')], 1)
+        self.assertEqual(counts[('PUT', 'schedule', '200')], 1)
+        self.assertEqual(counts[('GET', 'resourceconnector/v1/status', '200')], 1)
+        self.assertEqual(counts[('DELETE', 'session', '200')], 1)
+        self.assertTrue(counts[('GET', 'status', '200')] >= 1)
@@ -0,0 +1,58 @@
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.packing import pack_jobs
+from joblauncher.resource_allocator import WaitPolicy
+
+
+def payload(job_id, nb_cpus=1, nb_gpus=0, queue='prod'):
+    return {'id': job_id, 'nb_cpus': nb_cpus, 'nb_gpus': nb_gpus, 'queue': queue,
+            'scheduler_rest_parameters_format': '--script-command "run %s" --host "${rest_hostname}"' % job_id}
+
+
+class PackingTests(unittest.TestCase):
+
+    def test_first_fit_decreasing(self):
+        payloads = [payload('a', 3), payload('b', 5), payload('c', 2), payload('d', 4), payload('e', 2),
+                    payload('f', 2, queue='test'), payload('g', 12)]
+        plan = pack_jobs(payloads, node_cpus=8)
+
+        self.assertEqual(sorted(sorted(p['id'] for p in allocation.payloads) for allocation in plan.allocations),
+                         [['a', 'b'], ['c', 'd', 'e'], ['f'], ['g']])
+        utilization = plan.utilization()
+        self.assertEqual(utilization['jobs'], 7)
+        self.assertEqual(utilization['allocations'], 4)
+        self.assertEqual(utilization['cpu_utilization'], 1.0)
+
+        exclusive = pack_jobs(payloads, node_cpus=8, exclusive=True).utilization()
+        # Jobs left alone in their allocation keep their own request
+        self.assertEqual(exclusive['cpus'], 8 + 8 + 2 + 12)
+        self.assertIn('7 jobs packed into 4 allocations', str(plan))
+
+    def test_packed_spec(self):
+        plan = pack_jobs([payload('a', 2, 1), payload('b', 1, 1)], node_cpus=4, node_gpus=2)
+        spec, = plan.specs()
+
+        self.assertEqual(spec.points, ['a', 'b'])
+        self.assertEqual((spec.payload['nb_cpus'], spec.payload['nb_gpus']), (3, 2))
+        self.assertEqual(spec.payload['scheduler_rest_parameters_format'],
+                         '--script-command "(run a) & (run b) & wait" --host "${rest_hostname}"')
+
+        # The id changes with the merged payload, so no stale configuration is reused
+        other = payload('b', 1, 1)
+        other['scheduler_rest_parameters_format'] = other['scheduler_rest_parameters_format'].replace('run', 'rerun')
+        changed, = pack_jobs([payload('a', 2, 1), other], node_cpus=4, node_gpus=2).specs()
+        self.assertNotEqual(changed.renderer_id, spec.renderer_id)
+        self.assertEqual(changed.points, ['a', 'b'])
+        self.assertRaises(ValueError, pack_jobs, [payload('a')], nb_nodes=2)
+
+    def test_launch_packed(self):
+        with FakeJobManager() as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            plan, launched = job_launcher.launch_packed([payload(str(i)) for i in range(20)], node_cpus=8)
+
+            self.assertEqual(len(plan.allocations), 3)
+            self.assertEqual([job.launch_status.code for _, job in launched], [200, 200, 200])
+            self.assertEqual(sorted(session.schedule['nb_cpus'] for session in fake.sessions.values()), [4, 8, 8])
+            self.assertEqual(fake.requests['session_post'], 3)
+            job_launcher.cancel_many()
@@ -0,0 +1,114 @@
+import unittest
+import joblauncher.progress as progress
+import joblauncher.status_monitor as status_monitor
+from joblauncher.progress import ProgressRecorder, ProgressSeries
+from joblauncher.status_monitor import StatusMonitor
+from joblauncher.utils import Status
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class ProgressSeriesTests(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        series = ProgressSeries(capacity=4)
+        for second in range(6):
+            series.append(second, second * 10)
+
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.samples(), [(2, 20), (3, 30), (4, 40), (5, 50)])
+        self.assertEqual(series.window(2), (3, 30, 5, 50))
+
+    def test_plateaus_are_compressed(self):
+        series = ProgressSeries(capacity=4)
+        series.append(0, 10)
+        for second in range(1, 1000):
+            series.append(second, 20)
+
+        self.assertEqual(series.samples(), [(0, 10), (1, 20), (999, 20)])
+        self.assertEqual(series.changed_at, 1)
+
+    def test_window_starting_in_a_plateau(self):
+        series = ProgressSeries()
+        for second in range(0, 1001, 10):
+            series.append(second, 10)
+        series.append(1001, 11)
+
+        # The window starts inside the plateau, at the progress of the plateau
+        self.assertEqual(series.window(300), (701, 10, 1001, 11))
+        recorder = ProgressRecorder(window=300)
+        for sample in series.samples():
+            recorder.record('job', sample[1], sample[0])
+        estimate = recorder.estimates(now=1001)['job']
+        self.assertAlmostEqual(estimate['rate'], 1 / 300.)
+        self.assertAlmostEqual(estimate['eta'], 89 * 300)
+
+        # Between samples of different progress, the progress is interpolated
+        series.append(1101, 21)
+        self.assertEqual(series.window(50), (1051, 16, 1101, 21))
+
+
+class ProgressRecorderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = ProgressRecorder(window=100, stall_timeout=60)
+        for second in range(0, 50, 10):
+            self.recorder.record('running', second, second)
+            self.recorder.record('stalled', 30, second)
+        self.recorder.record('single', 5, 40)
+
+    def test_estimates(self):
+        estimates = self.recorder.estimates(now=90)
+
+        self.assertAlmostEqual(estimates['running']['rate'], 1)
+        self.assertAlmostEqual(estimates['running']['eta'], 60)
+        self.assertEqual(estimates['stalled']['rate'], 0)
+        self.assertEqual(estimates['stalled']['eta'], None)
+        self.assertEqual(estimates['single']['rate'], None)
+        self.assertEqual(estimates['stalled']['stalled_for'], 90)
+        self.assertEqual(self.recorder.stalled(now=90), ['stalled'])
+
+    def test_estimates_without_numpy(self):
+        expected = self.recorder.estimates(now=90)
+        original = progress._numpy
+        progress._numpy = lambda: None
+        try:
+            self.assertEqual(self.recorder.estimates(now=90), expected)
+        finally:
+            progress._numpy = original
+
+    def test_csv(self):
+        output = StringIO()
+        self.recorder.to_csv(output)
+
+        rows = output.getvalue().splitlines()
+        self.assertEqual(rows[0], 'job,timestamp,progress')
+        self.assertEqual(rows[1], 'running,0.0,0.0')
+        self.assertEqual(len(rows), 1 + 5 + 2 + 1)
+
+    @unittest.skipIf(progress._numpy() is None, 'numpy is not installed')
+    def test_numpy(self):
+        arrays = self.recorder.to_numpy()
+
+        self.assertEqual(arrays['running'].shape, (5, 2))
+        self.assertEqual(arrays['running'][-1].tolist(), [40, 40])
+
+    def test_status_monitor(self):
+        original = status_monitor.http_request
+        values = [10, 20, 100]
+        status_monitor.http_request = lambda *args, **kwargs: Status(200, {'progress': values.pop(0)}, {})
+        monitor = StatusMonitor(min_interval=.01, max_interval=.01, recorder=self.recorder)
+        try:
+            monitor.wait('http://job', timeout=5)
+        finally:
+            monitor.stop()
+            status_monitor.http_request = original
+
+        self.assertEqual([value for _, value in self.recorder.series('http://job').samples()], [10, 20, 100])
+
+
+if __name__ == '__main__':
+    unittest.main()
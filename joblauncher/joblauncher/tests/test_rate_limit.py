@@ -0,0 +1,85 @@
+import time
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.rate_limit import CircuitBreaker, CircuitOpenError, RateLimiter, TokenBucket, \
+    operation_class, enable_rate_limiting, CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+from joblauncher.resource_allocator import WaitPolicy
+
+
+class RateLimitTests(unittest.TestCase):
+
+    def test_operation_class(self):
+        session = 'http://host/nip/rendering-resource-manager/v1/session/'
+        self.assertEqual(operation_class(session, 'status'), 'status')
+        self.assertEqual(operation_class('http://node:8000', '/resourceconnector/v1/status'), 'status')
+        self.assertEqual(operation_class(session, 'schedule'), 'schedule')
+        self.assertEqual(operation_class(session), 'session')
+        self.assertEqual(operation_class(session, 'log'), 'other')
+        self.assertEqual(operation_class('http://host/nip/rendering-resource-manager/v1/config/'), 'config')
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=200, burst=5)
+        start = time.time()
+        for _ in range(25):
+            bucket.acquire()
+        self.assertGreaterEqual(time.time() - start, .09)
+
+        bucket.penalize()
+        bucket.penalize()
+        self.assertEqual(bucket.rate, 50)
+        for _ in range(100):
+            bucket.reward()
+        self.assertEqual(bucket.rate, 200)
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=.05)
+        breaker.before_request()
+        breaker.record(False)
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+        breaker.record(False)
+        self.assertEqual(breaker.state, CIRCUIT_OPEN)
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+
+        time.sleep(.06)
+        self.assertEqual(breaker.state, CIRCUIT_HALF_OPEN)
+        breaker.before_request()
+        # A single probe at a time
+        self.assertRaises(CircuitOpenError, breaker.before_request)
+        breaker.record(True)
+        self.assertEqual(breaker.state, CIRCUIT_CLOSED)
+
+        # Servers asking to retry later open the circuit right away
+        breaker.record(False, retry_after=.05)
+        self.assertEqual(breaker.state, CIRCUIT_OPEN)
+
+    def test_overload_backs_off(self):
+        limiter = RateLimiter(enabled=True, failure_threshold=3)
+        url = 'http://host/nip/rendering-resource-manager/v1/session/'
+        limiter.record(url, 'status', 503, {'Retry-After': '0'})
+        limiter.record(url, 'status', 500)
+        self.assertEqual(limiter.bucket(url, 'status').rate, 5)
+        self.assertEqual(limiter.bucket(url, 'schedule').rate, 2)
+        limiter.record(url, 'status', 200)
+        self.assertEqual(limiter.bucket(url, 'status').rate, 6)
+        self.assertEqual(limiter.breaker(url).state, CIRCUIT_CLOSED)
+
+    def test_requests_are_limited(self):
+        limiter = enable_rate_limiting()
+        limiter.reset()
+        try:
+            with FakeJobManager() as fake:
+                job_launcher = joblauncher.JobLauncher(service_url=fake.url,
+                                                       wait_policy=WaitPolicy(initial_interval=.01))
+                job_launcher.schedule_and_launch_job('bbic_wrapper')
+                limiter.limits['status'] = (100, 1)
+                limiter.reset()
+                start = time.time()
+                for _ in range(11):
+                    job_launcher.session_status()
+                self.assertGreaterEqual(time.time() - start, .09)
+                job_launcher.deallocate_and_cancel_job()
+        finally:
+            enable_rate_limiting(False)
+            limiter.limits = dict(joblauncher.settings.RATE_LIMITS)
+            limiter.reset()
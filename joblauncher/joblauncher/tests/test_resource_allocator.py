@@ -0,0 +1,86 @@
+import unittest
+from collections import OrderedDict
+import joblauncher.resource_allocator as resource_allocator
+import joblauncher.settings as settings
+from joblauncher.resource_allocator import ResourceAllocator, WaitPolicy
+from joblauncher.utils import Status
+
+
+class FakeJobManager(object):
+    """ Replaces http_request and answers session status requests with the given codes """
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.requests = []
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, **kwargs):
+        self.requests.append((method, command))
+        if method == 'POST':
+            return Status(201, '', {'session': '1'})
+        if command == 'status':
+            return Status(200, OrderedDict([('code', self.codes.pop(0)), ('hostname', 'node'),
+                                            ('port', '8000')]), {})
+        return Status(200, '', {})
+
+
+class WaitPolicyTests(unittest.TestCase):
+
+    def test_backoff(self):
+        waiter = WaitPolicy(deadline=60, initial_interval=.5, max_interval=2, backoff=2, jitter=0).start()
+
+        delays = [waiter.next_delay(resource_allocator.SESSION_STATUS_SCHEDULED) for _ in range(4)]
+        self.assertEqual(delays, [.5, 1, 2, 2])
+
+        delay = waiter.next_delay(resource_allocator.SESSION_STATUS_STARTING)
+        self.assertEqual(delay, .5)
+
+    def test_deadline(self):
+        waiter = WaitPolicy(deadline=0).start()
+
+        self.assertEqual(waiter.next_delay(resource_allocator.SESSION_STATUS_SCHEDULING), None)
+
+    def test_for_queue(self):
+        policy = WaitPolicy.for_queue('prod', jitter=0)
+
+        self.assertEqual(policy.deadline, settings.SESSION_WAIT_QUEUE_POLICIES['prod']['deadline'])
+        self.assertEqual(policy.jitter, 0)
+        self.assertEqual(WaitPolicy.for_queue('unknown').deadline, settings.SESSION_WAIT_DEADLINE)
+
+
+class ResourceUrlTests(unittest.TestCase):
+
+    def setUp(self):
+        self.original_http_request = resource_allocator.http_request
+
+    def tearDown(self):
+        resource_allocator.http_request = self.original_http_request
+
+    def test_waits_through_intermediate_states(self):
+        resource_allocator.http_request = FakeJobManager([
+            resource_allocator.SESSION_STATUS_SCHEDULING,
+            resource_allocator.SESSION_STATUS_SCHEDULED,
+            resource_allocator.SESSION_STATUS_GETTING_HOSTNAME,
+            resource_allocator.SESSION_STATUS_STARTING,
+            resource_allocator.SESSION_STATUS_RUNNING])
+        allocator = ResourceAllocator(wait_policy=WaitPolicy(initial_interval=0.001, jitter=0))
+
+        self.assertEqual(allocator.resource_url(), 'http://node:8000')
+
+    def test_stops_on_failure(self):
+        fake = FakeJobManager([resource_allocator.SESSION_STATUS_SCHEDULING,
+                               resource_allocator.SESSION_STATUS_FAILED])
+        resource_allocator.http_request = fake
+        allocator = ResourceAllocator()
+
+        self.assertRaises(Exception, allocator.resource_url, WaitPolicy(initial_interval=0.001))
+        self.assertEqual(fake.requests[-1], ('DELETE', None))
+        self.assertEqual(fake.codes, [])
+
+    def test_overload_keeps_session(self):
+        fake = FakeJobManager([])
+        resource_allocator.http_request = lambda method, url, body=None, command=None, *args, **kwargs: \
+            fake(method, url, body, command) if method == 'DELETE' else Status(503, 'Overloaded', {})
+        allocator = ResourceAllocator()
+
+        self.assertRaises(Exception, allocator.session_status)
+        self.assertEqual(fake.requests, [])
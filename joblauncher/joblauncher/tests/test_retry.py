@@ -0,0 +1,126 @@
+import unittest
+from collections import OrderedDict
+import joblauncher.resource_allocator as resource_allocator
+from joblauncher.errors import ConnectionFailedError, ServiceError, ServiceOverloadedError, is_transient
+from joblauncher.resource_allocator import ResourceAllocator, WaitPolicy
+from joblauncher.retry import RetryPolicy
+from joblauncher.utils import Status
+
+
+class FlakyJobManager(object):
+    """
+    Replaces http_request, answering status requests with the given session codes, dropping the
+    connection or answering with the HTTP error codes (5xx) instead
+    """
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, **kwargs):
+        self.requests.append((method, command))
+        if method == 'POST':
+            return Status(201, '', {'session': '1'})
+        if command != 'status':
+            return Status(200, '', {})
+        outcome = self.outcomes.pop(0)
+        if outcome == 'drop':
+            raise ConnectionFailedError('Connection reset', url)
+        if outcome >= 500:
+            return Status(outcome, 'Unavailable', {})
+        return Status(200, OrderedDict([('code', outcome), ('hostname', 'node'), ('port', '8000')]), {})
+
+
+class RetryPolicyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, initial_delay=0)
+
+    def failing(self, *errors):
+        errors = list(errors)
+
+        def function():
+            if errors:
+                raise errors.pop(0)
+            return 'done'
+        return function
+
+    def test_retries_idempotent_requests(self):
+        function = self.failing(ConnectionFailedError('reset'), ServiceOverloadedError(Status(503, '', {})))
+
+        self.assertEqual(self.policy.call(function), 'done')
+
+    def test_does_not_resend_requests_which_may_have_been_processed(self):
+        self.assertRaises(ConnectionFailedError, self.policy.call,
+                          self.failing(ConnectionFailedError('reset')), False)
+        self.assertEqual(self.policy.call(self.failing(ConnectionFailedError('refused', request_sent=False)),
+                                          False), 'done')
+        self.assertEqual(self.policy.call(self.failing(ServiceOverloadedError(Status(429, '', {}))), False),
+                         'done')
+
+    def test_permanent_errors_are_not_retried(self):
+        error = ServiceError(Status(500, 'Internal error', {}))
+
+        self.assertFalse(is_transient(error))
+        self.assertRaises(ServiceError, self.policy.call, self.failing(error))
+
+    def test_attempts_are_bounded(self):
+        function = self.failing(*[ConnectionFailedError('reset')] * 3)
+
+        self.assertRaises(ConnectionFailedError, self.policy.call, function)
+
+    def test_honours_retry_after(self):
+        error = ServiceOverloadedError(Status(503, '', {}, headers={'Retry-After': '2'}))
+        policy = RetryPolicy(initial_delay=0, max_delay=1)
+
+        self.assertEqual(error.retry_after, 2)
+        self.assertEqual(policy.retry_delay(error, True, policy.delays()), 1)
+
+
+class ResumeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.original_http_request = resource_allocator.http_request
+
+    def tearDown(self):
+        resource_allocator.http_request = self.original_http_request
+
+    def allocator(self):
+        return ResourceAllocator(wait_policy=WaitPolicy(initial_interval=0.001, jitter=0),
+                                 retry_policy=RetryPolicy(max_attempts=2, initial_delay=0))
+
+    def test_polls_through_transient_failures(self):
+        fake = FlakyJobManager([resource_allocator.SESSION_STATUS_SCHEDULED, 'drop', 'drop', 502, 503, 503,
+                                resource_allocator.SESSION_STATUS_RUNNING])
+        resource_allocator.http_request = fake
+
+        self.assertEqual(self.allocator().resource_url(), 'http://node:8000')
+        self.assertNotIn(('DELETE', None), fake.requests)
+        self.assertEqual(fake.outcomes, [])
+
+    def test_resumes_the_kept_session(self):
+        fake = FlakyJobManager([resource_allocator.SESSION_STATUS_SCHEDULED] + ['drop'] * 20 +
+                               [resource_allocator.SESSION_STATUS_RUNNING])
+        resource_allocator.http_request = fake
+        allocator = self.allocator()
+
+        self.assertRaises(ConnectionFailedError, allocator.resource_url, WaitPolicy(deadline=0.05))
+        self.assertNotIn(('DELETE', None), fake.requests)
+        fake.outcomes = [resource_allocator.SESSION_STATUS_RUNNING]
+
+        self.assertEqual(allocator.resource_url(), 'http://node:8000')
+        self.assertEqual(fake.requests.count(('POST', None)), 1)
+        self.assertEqual(fake.requests.count(('PUT', 'schedule')), 1)
+
+    def test_permanent_failure_deletes_the_session(self):
+        fake = FlakyJobManager([500])
+        resource_allocator.http_request = fake
+        allocator = self.allocator()
+
+        self.assertRaises(ServiceError, allocator.resource_url)
+        self.assertEqual(fake.requests[-1], ('DELETE', None))
+        self.assertEqual(allocator._cookies, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
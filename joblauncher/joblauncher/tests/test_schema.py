@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import joblauncher
+from joblauncher.errors import ValidationError
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.schema import SCHEDULE_SCHEMA, SCHEMA_CONFIG, SchemaRegistry, _compile
+
+CAMERA_SCHEMA = {'type': 'object', 'required': ['fov'], 'properties': {'fov': {'type': 'number', 'minimum': 0}}}
+
+
+class SchemaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'schemas.json')
+        self.fake = FakeJobManager(job_duration=60, app_schemas={'camera': CAMERA_SCHEMA}).start()
+        self.addCleanup(self.fake.stop)
+
+    def launcher(self, registry=None, **kwargs):
+        return joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=WaitPolicy(initial_interval=.01),
+                                       schema_registry=registry or SchemaRegistry(self.path), **kwargs)
+
+    def test_fallback_validator(self):
+        errors = []
+        check = _compile(SCHEDULE_SCHEMA)
+        check({'nb_nodes': True, 'nb_cpus': 0, 'nb_gpus': 0, 'allocation_time': '1:00:00x'}, '', errors)
+
+        self.assertEqual(len(errors), 3)
+        self.assertIn("allocation_time: '1:00:00x' does not match", ' '.join(errors))
+        self.assertIn("nb_nodes: True is not of type 'integer'", errors)
+        self.assertIn("nb_cpus: 0 does not respect minimum 1", errors)
+        errors = []
+        check({'nb_nodes': 1, 'nb_cpus': 1, 'nb_gpus': 0, 'allocation_time': 90}, '', errors)
+        self.assertEqual(errors, [])
+
+    def test_bulk_errors(self):
+        registry = SchemaRegistry(None)
+        payloads = [{'id': 'a'}, {'id': 'b', 'nb_cpus': '2'}, {'queue': 'prod'}]
+
+        self.assertEqual(sorted(registry.errors(SCHEMA_CONFIG, payloads)), [1, 2])
+        with self.assertRaises(ValidationError) as context:
+            registry.validate_many(SCHEMA_CONFIG, payloads)
+        self.assertEqual(sorted(context.exception.errors), [1, 2])
+        self.assertIn('(and 1 more invalid payloads)', str(context.exception))
+
+        registry.enabled = False
+        registry.validate_many(SCHEMA_CONFIG, payloads)
+
+    def test_invalid_config_is_not_sent(self):
+        status = self.launcher().config_create({'id': 'a', 'nb_nodes': 0})
+
+        self.assertEqual(status.code, 400)
+        self.assertIn('nb_nodes', status.contents)
+        self.assertEqual(self.fake.requests['config_post'], 0)
+
+    def test_invalid_schedule_is_not_sent(self):
+        job = self.launcher(nb_cpus=-1)
+
+        self.assertRaises(ValidationError, job.schedule_and_launch_job, 'a')
+        self.assertEqual(self.fake.requests['session_post'], 0)
+
+    def test_launch_many_validates_up_front(self):
+        job = self.launcher()
+
+        self.assertRaises(ValidationError, job.launch_many, [{'id': 'a'}, {'id': 'b', 'exclusive': 'yes'}])
+        self.assertEqual(sum(self.fake.requests.values()), 0)
+
+    def test_application_schemas_are_cached(self):
+        job = self.launcher()
+        job.schedule_and_launch_job('a')
+
+        self.assertEqual(job._schema('camera'), (CAMERA_SCHEMA, 200))
+        self.assertEqual(list(job._schema_registry.errors('camera', [{'fov': 45}, {'fov': -1}], job)), [1])
+        self.assertEqual(job._obtain_registry(), ({'camera': ['GET', 'PUT']}, 200))
+        self.assertEqual(self.fake.requests['session_registry'], 1)
+        self.assertEqual(self.fake.requests['session_camera/schema'], 1)
+
+        # Another process reuses the schemas cached on disk without any request
+        other = self.launcher()
+        other._renderer = 'a'
+        self.assertEqual(other._schema('camera'), (CAMERA_SCHEMA, 200))
+        self.assertEqual(self.fake.requests['session_registry'], 1)
+
+    def test_new_registry_version_invalidates_schemas(self):
+        job = self.launcher(SchemaRegistry(self.path, ttl=0))
+        job.schedule_and_launch_job('a')
+        job._schema('camera')
+
+        self.fake.app_schemas['camera'] = {'type': 'object'}
+        self.fake.app_schemas['light'] = {'type': 'object'}
+        self.assertEqual(job._schema('camera'), ({'type': 'object'}, 200))
+        self.assertEqual(self.fake.requests['session_camera/schema'], 2)
+
+    def test_cache_of_another_format_is_ignored(self):
+        with open(self.path, 'w') as cache:
+            json.dump({'format': 0, 'applications': {'x': {}}}, cache)
+
+        self.assertEqual(SchemaRegistry(self.path)._entries(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.session_pool import SessionPool, allocation_seconds
+
+
+class SessionPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJobManager(scheduling_delay=.02, starting_delay=.02, job_servers=['bbic_wrapper']).start()
+        self.job_launcher = joblauncher.JobLauncher(service_url=self.fake.url,
+                                                    wait_policy=WaitPolicy(initial_interval=.01))
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def test_allocation_seconds(self):
+        self.assertEqual(allocation_seconds('1:00:00'), 3600)
+        self.assertEqual(allocation_seconds('30'), 1800)
+        self.assertEqual(allocation_seconds('2:30'), 150)
+        self.assertEqual(allocation_seconds('1-2'), 93600)
+        self.assertEqual(allocation_seconds('1-0:1:30'), 86490)
+        self.assertEqual(allocation_seconds(5), 300)
+
+    def test_launch_from_warm_session(self):
+        self.fake.job_duration = .5
+        with SessionPool(self.job_launcher, min_size=2, max_size=2, idle_timeout=0) as pool:
+            self.assertEqual(pool.warm('bbic_wrapper'), 2)
+            self.assertEqual(len(self.fake.sessions), 2)
+            # Starting the wrappers of the warm sessions runs no job
+            self.assertEqual(self.fake.requests['jobs_post'], 0)
+
+            job = self.job_launcher.spawn()
+            job.session_pool = pool
+            self.assertEqual(job.schedule_and_launch_job().code, 200)
+            self.assertEqual(self.fake.requests['session_post'], 2)
+            self.assertEqual(self.fake.requests['jobs_post'], 1)
+            self.assertEqual(pool.size(), 1)
+            self.assertLess(job.get_single_job_status(), 100)
+
+            # Once the job completed, its session goes back to the pool instead of being deleted
+            job.get_continuous_job_status()
+            self.assertEqual(job.deallocate_and_cancel_job().code, 200)
+            self.assertEqual(pool.size(), 2)
+            self.assertEqual(len(self.fake.sessions), 2)
+            self.assertIsNone(job.launched_job_url)
+
+            # A session taken from the pool again runs a new job
+            job.schedule_and_launch_job()
+            self.assertEqual(self.fake.requests['jobs_post'], 2)
+            self.assertLess(job.get_single_job_status(), 100)
+            job.get_continuous_job_status()
+            job.deallocate_and_cancel_job()
+
+            # The third job gets a new session, which is deleted as the pool is full
+            jobs = [self.job_launcher.spawn() for _ in range(3)]
+            for other in jobs:
+                other.session_pool = pool
+                other.schedule_and_launch_job()
+            self.assertEqual(self.fake.requests['session_post'], 3)
+            for other in jobs:
+                other.get_continuous_job_status()
+                other.deallocate_and_cancel_job()
+            self.assertEqual(len(self.fake.sessions), 2)
+
+            self.assertEqual(pool.maintain(), 0)
+            self.assertEqual(pool.size(), 2)
+        self.assertEqual(self.fake.sessions, {})
+
+    def test_wrappers_without_jobs_endpoint_are_not_pooled(self):
+        pool = SessionPool(self.job_launcher, ['other'], min_size=1)
+
+        self.assertEqual(pool.warm('other'), 0)
+        self.assertEqual(self.fake.sessions, {})
+        self.assertEqual(pool.maintain(), 0)
+        self.assertEqual(self.fake.requests['session_post'], 1)
+
+        # The renderer is launched without the pool
+        job = self.job_launcher.spawn('other')
+        job.session_pool = pool
+        self.assertEqual(job.schedule_and_launch_job().code, 200)
+        self.assertEqual(self.fake.requests['session_post'], 2)
+        self.assertEqual(self.fake.requests['jobs_post'], 0)
+        self.assertEqual(len(self.fake.sessions), 1)
+        self.assertRaises(ValueError, pool.acquire, 'other')
+
+    def test_first_session_of_refused_renderer_runs_the_job(self):
+        pool = SessionPool(self.job_launcher)
+        job = self.job_launcher.spawn('other')
+        job.session_pool = pool
+
+        # The session which found out that the renderer cannot be pooled is the launch itself
+        self.assertEqual(job.schedule_and_launch_job().code, 200)
+        self.assertEqual(self.fake.requests['session_post'], 1)
+        self.assertEqual(self.fake.requests['jobs_post'], 0)
+        self.assertFalse(pool.pooled('other'))
+        self.assertEqual(job.deallocate_and_cancel_job().code, 200)
+        self.assertEqual(pool.size(), 0)
+
+    def test_declared_poolable_renderers(self):
+        pool = SessionPool(self.job_launcher, poolable=['bbic_wrapper'])
+        job = self.job_launcher.spawn('other')
+        job.session_pool = pool
+
+        self.assertEqual(job.schedule_and_launch_job().code, 200)
+        self.assertEqual(self.fake.requests['jobs_get'], 0)
+        self.assertTrue(pool.pooled('bbic_wrapper'))
+
+    def test_unsafe_sessions_are_deleted(self):
+        self.fake.job_duration = 60
+        pool = SessionPool(self.job_launcher, min_size=0)
+        job = self.job_launcher.spawn()
+        job.session_pool = pool
+        job.schedule_and_launch_job()
+
+        # The job is still running, so cancelling it deletes the session
+        job.deallocate_and_cancel_job()
+        self.assertEqual(pool.size(), 0)
+        self.assertEqual(self.fake.sessions, {})
+
+        # Sessions about to reach the end of their allocation are not kept
+        self.job_launcher.edit_allocation_settings(_allocation_time='4')
+        pool = SessionPool(self.job_launcher, ['bbic_wrapper'], min_size=1)
+        pool.warm()
+        self.assertEqual(pool.maintain(), 1)
+        self.assertEqual(pool.size(), 1)
+        pool.close()
+        self.assertEqual(self.fake.sessions, {})
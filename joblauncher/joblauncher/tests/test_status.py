@@ -0,0 +1,26 @@
+import unittest
+from joblauncher.utils import Status
+
+
+class StatusTests(unittest.TestCase):
+
+    def test_lazy_json(self):
+        status = Status(200, None, {}, raw=b'{"code": 5, "hostname": "node", "port": "8000"}')
+
+        self.assertEqual(status.raw, b'{"code": 5, "hostname": "node", "port": "8000"}')
+        self.assertEqual(list(status.contents.keys()), ['code', 'hostname', 'port'])
+        self.assertEqual(status.raw, None)
+        self.assertIs(status.contents, status.contents)
+
+    def test_error_text(self):
+        status = Status(404, None, {}, raw=b'Session not found', encoding='utf-8')
+
+        self.assertEqual(status.contents, u'Session not found')
+        self.assertEqual(Status(200, None, {}, raw=b'').contents, '')
+
+    def test_slots(self):
+        status = Status(200, 'contents', None)
+
+        self.assertFalse(hasattr(status, '__dict__'))
+        status.contents = 'changed'
+        self.assertEqual(status.contents, 'changed')
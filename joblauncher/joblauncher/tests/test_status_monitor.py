@@ -0,0 +1,85 @@
+import threading
+import unittest
+import joblauncher.status_monitor as status_monitor
+from joblauncher.status_monitor import StatusMonitor
+from joblauncher.utils import Status
+
+
+class FakeResourceConnectors(object):
+    """ Replaces http_request and answers status requests with the given progress sequence of each job """
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, method, url, body=None, command=None, cookies=None, transport=None, **kwargs):
+        with self.lock:
+            self.requests += 1
+            sequence = self.progress[url]
+            value = sequence.pop(0) if len(sequence) > 1 else sequence[0]
+        if isinstance(value, Exception):
+            raise value
+        return Status(200, {'progress': value}, {})
+
+
+class StatusMonitorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.original_http_request = status_monitor.http_request
+        self.monitor = StatusMonitor(min_interval=.01, max_interval=.05, max_requests_per_second=1000,
+                                     max_failures=2)
+
+    def tearDown(self):
+        self.monitor.stop()
+        status_monitor.http_request = self.original_http_request
+
+    def test_as_completed_and_callbacks(self):
+        status_monitor.http_request = FakeResourceConnectors({
+            'http://slow': [0, 10, 10, 50, 100],
+            'http://fast': [50, 100],
+        })
+        events = []
+
+        self.monitor.track('http://slow', lambda status, event: events.append((status.progress, event)))
+        completed = [status.url for status in self.monitor.as_completed(['http://slow', 'http://fast'], timeout=5)]
+
+        self.assertEqual(completed, ['http://fast', 'http://slow'])
+        self.assertEqual(events, [(0, 'progress'), (10, 'progress'), (50, 'progress'), (100, 'completed')])
+        self.assertEqual(self.monitor.wait('http://slow'), 100)
+        self.assertEqual(self.monitor.table(), {'http://slow': ('completed', 100),
+                                                'http://fast': ('completed', 100)})
+
+    def test_failure(self):
+        status_monitor.http_request = FakeResourceConnectors({'http://broken': [IOError('unreachable')]})
+
+        self.assertRaises(IOError, self.monitor.wait, 'http://broken', 5)
+        self.assertEqual(self.monitor.status('http://broken').state, 'failed')
+
+    def test_request_rate_is_bounded(self):
+        fake = FakeResourceConnectors(dict(('http://job%d' % i, [10]) for i in range(100)))
+        status_monitor.http_request = fake
+        monitor = StatusMonitor(min_interval=0, max_requests_per_second=50)
+        try:
+            for i in range(100):
+                monitor.track('http://job%d' % i)
+            threading.Event().wait(.5)
+        finally:
+            monitor.stop()
+
+        self.assertTrue(fake.requests <= 27)
+
+    def test_tracking_again_does_not_poll_twice(self):
+        fake = FakeResourceConnectors({'http://job': [10]})
+        status_monitor.http_request = fake
+        monitor = StatusMonitor(min_interval=.1, max_interval=.1)
+        try:
+            for _ in range(5):
+                monitor.track('http://job')
+                monitor.untrack('http://job')
+            monitor.track('http://job')
+            threading.Event().wait(.55)
+        finally:
+            monitor.stop()
+
+        self.assertTrue(fake.requests <= 7)
@@ -0,0 +1,81 @@
+import sys
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.status_monitor import StatusMonitor, EVENT_COMPLETED, EVENT_PROGRESS
+from joblauncher.subscription import MODE_EVENTS, MODE_LONG_POLL, MODE_POLL
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from joblauncher.async_subscription import AsyncSubscription
+
+
+class SubscriptionTests(unittest.TestCase):
+
+    def launch(self, push_modes, job_duration=.5):
+        self.fake = FakeJobManager(job_duration=job_duration, push_modes=push_modes).start()
+        self.addCleanup(self.fake.stop)
+        job = joblauncher.JobLauncher(service_url=self.fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+        job.schedule_and_launch_job('a')
+        return job
+
+    def collect(self, subscription):
+        with subscription:
+            events = list(subscription.events(timeout=10))
+        self.assertEqual(events[-1], (EVENT_COMPLETED, 100))
+        self.assertTrue(all(event == EVENT_PROGRESS for event, _ in events[:-1]))
+        progress = [value for _, value in events]
+        self.assertEqual(progress, sorted(set(progress)))
+        return events
+
+    def test_server_sent_events(self):
+        job = self.launch(['events', 'long-poll'])
+        requests = self.fake.requests['resource_connector']
+
+        subscription = job.subscribe()
+        events = self.collect(subscription)
+        self.assertEqual(subscription.mode, MODE_EVENTS)
+        # Every progress change was pushed on a single stream
+        self.assertGreater(len(events), 10)
+        self.assertEqual(self.fake.requests['resource_connector'] - requests, 1)
+
+    def test_long_polling(self):
+        job = self.launch(['long-poll'])
+        requests = self.fake.requests['resource_connector']
+
+        subscription = job.subscribe()
+        events = self.collect(subscription)
+        self.assertEqual(subscription.mode, MODE_LONG_POLL)
+        # One request per progress change, plus the event stream request which was refused
+        self.assertLessEqual(self.fake.requests['resource_connector'] - requests, len(events) + 2)
+
+    def test_polling_fallback(self):
+        job = self.launch([])
+        monitor = StatusMonitor(min_interval=.01, max_interval=.05)
+        self.addCleanup(monitor.stop)
+        received = []
+
+        subscription = job.subscribe(lambda status, event: received.append(event), monitor)
+        self.collect(subscription)
+        self.assertEqual(subscription.mode, MODE_POLL)
+        self.assertEqual(received[-1], EVENT_COMPLETED)
+        self.assertEqual(monitor.table(), {})
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'asyncio client requires Python 3.5+')
+    def test_async_iteration(self):
+        job = self.launch(['events'], job_duration=.2)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        asyncio.set_event_loop(loop)
+
+        with AsyncSubscription(job) as subscription:
+            events = subscription.__aiter__()
+            received = [loop.run_until_complete(events.__anext__())]
+            while received[-1][0] == EVENT_PROGRESS:
+                received.append(loop.run_until_complete(asyncio.wait_for(events.__anext__(), 10)))
+        self.assertEqual(received[-1], (EVENT_COMPLETED, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import itertools
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.sweep import expand_sweep, render, sweep_points
+
+TEMPLATE = {
+    'id': 'bbic',
+    'scheduler_rest_parameters_format': '--script-command "bbic_stack.py {input} --orientation {orientation}" '
+                                        '--host "${rest_hostname}" --port "${rest_port}"',
+    'nb_cpus': '{cpus}',
+    'queue': 'test',
+}
+
+
+class SweepTests(unittest.TestCase):
+
+    def test_render(self):
+        payload = render(TEMPLATE, {'input': 'a.h5', 'orientation': 'coronal', 'cpus': 2})
+
+        self.assertEqual(payload['scheduler_rest_parameters_format'],
+                         '--script-command "bbic_stack.py a.h5 --orientation coronal" '
+                         '--host "${rest_hostname}" --port "${rest_port}"')
+        self.assertEqual(payload['nb_cpus'], 2)
+        self.assertEqual(TEMPLATE['nb_cpus'], '{cpus}')
+
+    def test_points_are_lazy_and_distinct(self):
+        points = sweep_points(({'orientation': orientation} for orientation in itertools.cycle(['a', 'b', 'a'])))
+        self.assertEqual(next(points), {'orientation': 'a'})
+        self.assertEqual(next(points), {'orientation': 'b'})
+
+        grid = {'input': ['a.h5', 'b.h5'], 'orientation': ['coronal', 'sagittal', 'coronal'], 'cpus': 1}
+        specs = list(expand_sweep(TEMPLATE, grid))
+        self.assertEqual(len(specs), 4)
+        self.assertEqual(len(set(spec.renderer_id for spec in specs)), 4)
+        self.assertEqual([spec.renderer_id for spec in expand_sweep(TEMPLATE, grid)],
+                         [spec.renderer_id for spec in specs])
+
+    def test_chunks(self):
+        grid = {'input': ['a.h5', 'b.h5', 'c.h5'], 'orientation': 'coronal', 'cpus': 2}
+        specs = list(expand_sweep(TEMPLATE, grid, chunk_size=2))
+
+        self.assertEqual([len(spec.points) for spec in specs], [2, 1])
+        self.assertEqual(specs[0].payload['nb_cpus'], 4)
+        self.assertEqual(specs[1].payload['nb_cpus'], 2)
+        self.assertEqual(specs[0].payload['scheduler_rest_parameters_format'],
+                         '--script-command "(bbic_stack.py a.h5 --orientation coronal) & '
+                         '(bbic_stack.py b.h5 --orientation coronal) & wait" '
+                         '--host "${rest_hostname}" --port "${rest_port}"')
+        self.assertRaises(ValueError, list, expand_sweep(dict(TEMPLATE, queue='{input}'), grid, chunk_size=2))
+
+    def test_launch(self):
+        with FakeJobManager() as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            grid = [{'input': name, 'orientation': 'coronal', 'cpus': 1} for name in 'abcdefg']
+            launched = job_launcher.launch_sweep(TEMPLATE, grid, chunk_size=3, max_parallel=2)
+
+            self.assertEqual([len(spec.points) for spec, _ in launched], [3, 3, 1])
+            self.assertEqual([job.launch_status.code for _, job in launched], [200, 200, 200])
+            # The configurations created for the sweep are deleted once their jobs are launched
+            self.assertEqual(fake.requests['config_post'], 3)
+            self.assertEqual(fake.configs, {})
+            self.assertEqual(len(fake.sessions), 3)
+            self.assertEqual(sorted(session.schedule['nb_cpus'] for session in fake.sessions.values()), [1, 3, 3])
+            self.assertEqual(sorted(session.renderer_id for session in fake.sessions.values()),
+                             sorted(spec.renderer_id for spec, _ in launched))
+
+            # Launching the sweep again with kept configurations reuses them
+            for _ in range(2):
+                relaunched = job_launcher.launch_sweep(TEMPLATE, grid, 3, keep_configs=True)
+                self.assertEqual([job.launch_status.code for _, job in relaunched], [200, 200, 200])
+                self.assertEqual(len(fake.configs), 3)
+            self.assertEqual(fake.requests['config_post'], 9)
+            job_launcher.cancel_many()
+            self.assertEqual(fake.sessions, {})
+
+    def test_changed_template_gets_new_configurations(self):
+        with FakeJobManager() as fake:
+            job_launcher = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            template = {'id': 'sw', 'command_line': 'run --v1 {x}', 'queue': 'prod'}
+            first = job_launcher.launch_sweep(template, {'x': [1, 2]}, keep_configs=True)
+            template = {'id': 'sw', 'command_line': 'run --v2 {x}', 'queue': 'test'}
+            second = job_launcher.launch_sweep(template, {'x': [1, 2]}, keep_configs=True)
+
+            self.assertEqual([job.launch_status.code for _, job in first + second], [200] * 4)
+            self.assertFalse(set(spec.renderer_id for spec, _ in first) & set(spec.renderer_id for spec, _ in second))
+            self.assertEqual([fake.configs[spec.renderer_id]['command_line'] for spec, _ in second],
+                             ['run --v2 1', 'run --v2 2'])
+            self.assertEqual([fake.configs[spec.renderer_id]['queue'] for spec, _ in second], ['test', 'test'])
+            job_launcher.cancel_many()
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.tracing import Tracer, FORMAT_CHROME, FORMAT_JSONL, enable_tracing, phase_report, read_spans
+
+
+class TracerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_disabled(self):
+        tracer = Tracer()
+
+        self.assertEqual(tracer.start_trace('job'), None)
+        tracer.finish(None)
+        self.assertEqual(tracer.spans(), [])
+
+    def test_span_tree(self):
+        tracer = Tracer(enabled=True, max_spans=2)
+        root = tracer.start_trace('job', renderer_id='a')
+        child = tracer.start_span('launch', root)
+        child.event('session_status', code=1)
+        tracer.finish(child)
+        tracer.finish(child, error='ignored')
+        tracer.finish(root, code=200)
+
+        launch, job = tracer.spans()
+        self.assertEqual((launch.trace_id, launch.parent_id), (job.trace_id, job.span_id))
+        self.assertEqual(job.attributes, {'renderer_id': 'a', 'code': 200})
+        self.assertEqual(launch.attributes, {})
+        self.assertEqual(launch.to_dict()['events'][0]['attributes'], {'code': 1})
+        self.assertEqual(tracer.start_span('orphan', None), None)
+
+    def test_phase_report(self):
+        spans = [{'name': 'queue', 'duration': duration} for duration in range(1, 101)]
+        spans.append({'name': 'run', 'duration': 5})
+        spans.append({'name': 'open', 'duration': None})
+
+        report = phase_report(spans, (50, 90, 99))
+
+        self.assertEqual(sorted(report), ['queue', 'run'])
+        self.assertEqual((report['queue']['p50'], report['queue']['p90'], report['queue']['p99']), (50, 90, 99))
+        self.assertEqual((report['queue']['count'], report['queue']['max']), (100, 100))
+        self.assertEqual(report['queue']['mean'], 50.5)
+        self.assertEqual(report['run']['p50'], 5)
+
+    def test_files(self):
+        for format, name in ((FORMAT_JSONL, 'trace.jsonl'), (FORMAT_CHROME, 'trace.json')):
+            path = os.path.join(self.directory, name)
+            tracer = Tracer(enabled=True, path=path, format=format)
+            for _ in range(2):
+                root = tracer.start_trace('job')
+                span = tracer.start_span('launch', root)
+                span.event('session_status', code=5)
+                tracer.finish(span)
+                tracer.finish(root)
+
+            spans = read_spans(path)
+            self.assertEqual([span['name'] for span in spans], ['launch', 'job'] * 2)
+            self.assertEqual(spans[0]['parent_id'], spans[1]['span_id'])
+            self.assertAlmostEqual(spans[1]['duration'], tracer.spans()[1].duration, places=5)
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, Tracer, format='xml')
+
+
+class LifecycleTracingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = enable_tracing()
+        self.tracer.reset()
+        self.addCleanup(enable_tracing, False)
+
+    def test_launch_and_cancel(self):
+        with FakeJobManager(scheduling_delay=.2, starting_delay=.2) as fake:
+            job = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01,
+                                                                                       max_interval=.02))
+            job.schedule_and_launch_job('a')
+            job.deallocate_and_cancel_job()
+
+        spans = dict((span.name, span) for span in self.tracer.spans())
+        self.assertEqual(sorted(spans), ['job', 'launch', 'queue', 'run', 'session_create', 'session_schedule',
+                                         'start', 'teardown'])
+        root = spans['job']
+        self.assertEqual((root.parent_id, root.attributes), (None, {'renderer_id': 'a', 'queue': None, 'code': 200}))
+        for name in ('launch', 'run', 'teardown'):
+            self.assertEqual(spans[name].parent_id, root.span_id)
+        for name in ('session_create', 'session_schedule', 'queue', 'start'):
+            self.assertEqual(spans[name].parent_id, spans['launch'].span_id)
+        self.assertTrue(all(span.trace_id == root.trace_id for span in spans.values()))
+
+        transitions = [attributes['status'] for span in (spans['queue'], spans['start'])
+                       for _, _, attributes in span.events]
+        self.assertEqual(transitions, ['SCHEDULING', 'SCHEDULED', 'GETTING_HOSTNAME', 'STARTING', 'RUNNING'])
+        self.assertGreaterEqual(spans['queue'].duration, .1)
+        self.assertGreaterEqual(spans['start'].end, spans['queue'].end)
+        self.assertEqual(job._trace, None)
+
+    def test_failed_launch(self):
+        with FakeJobManager(failing_renderers=['broken']) as fake:
+            job = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            self.assertRaises(Exception, job.schedule_and_launch_job, 'broken')
+
+        spans = dict((span.name, span) for span in self.tracer.spans())
+        self.assertIn('error', spans['job'].attributes)
+        self.assertIn('error', spans['launch'].attributes)
+        self.assertNotIn('run', spans)
+
+    def test_untraced_jobs(self):
+        enable_tracing(False)
+        with FakeJobManager() as fake:
+            job = joblauncher.JobLauncher(service_url=fake.url, wait_policy=WaitPolicy(initial_interval=.01))
+            job.schedule_and_launch_job('a')
+            job.deallocate_and_cancel_job()
+
+        self.assertEqual(self.tracer.spans(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import requests
+from joblauncher.transport import Transport
+
+
+class TransportTests(unittest.TestCase):
+
+    def test_session_per_host(self):
+        transport = Transport()
+
+        first = transport.session('http://host-a:8080/nip/session/')
+        self.assertIs(transport.session('http://host-a:8080/nip/config/'), first)
+        self.assertIsNot(transport.session('http://host-b:8080/nip/session/'), first)
+
+        transport.close()
+        self.assertIsNot(transport.session('http://host-a:8080/nip/session/'), first)
+
+    def test_pooled_session_does_not_keep_cookies(self):
+        transport = Transport()
+        session = transport.session('http://host-a:8080/')
+
+        request = requests.Request('GET', 'http://host-a:8080/').prepare()
+        cookie = requests.cookies.create_cookie('session', 'allocator-a')
+        session.cookies.set_cookie_if_ok(cookie, requests.cookies.MockRequest(request))
+        self.assertEqual(len(session.cookies), 0)
+
+    def test_settings(self):
+        transport = Transport(pool_maxsize=4, timeout=3)
+        adapter = transport.session('http://host-a:8080/').get_adapter('http://host-a:8080/')
+
+        self.assertEqual(transport.timeout, 3)
+        self.assertEqual(adapter._pool_maxsize, 4)
@@ -0,0 +1,102 @@
+import time
+import unittest
+import joblauncher
+from joblauncher.fake_server import FakeJobManager
+from joblauncher.resource_allocator import WaitPolicy
+from joblauncher.status_monitor import StatusMonitor
+from joblauncher.workflow import NODE_CANCELLED, NODE_COMPLETED, NODE_FAILED
+
+
+class WorkflowTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJobManager(job_duration=.1, failing_renderers=['broken']).start()
+        self.job_launcher = joblauncher.JobLauncher(service_url=self.fake.url,
+                                                    wait_policy=WaitPolicy(initial_interval=.01))
+        self.monitor = StatusMonitor(min_interval=.01, max_interval=.05, max_requests_per_second=1000)
+
+    def tearDown(self):
+        self.monitor.stop()
+        self.fake.stop()
+
+    def test_dependencies(self):
+        workflow = self.job_launcher.workflow(self.monitor)
+        workflow.add('stack', 'bbic_stack')
+        workflow.add('slices', 'bbic_slices', depends_on=['stack'])
+        workflow.add('thumbnails', 'bbic_thumbnails', depends_on=['stack'])
+        workflow.add('aggregate', self.job_launcher.create_renderer_payload(id='bbic_aggregate'),
+                     depends_on=['slices', 'thumbnails'])
+        report = workflow.run(timeout=30)
+
+        self.assertTrue(report.succeeded)
+        jobs = report.jobs
+        self.assertGreaterEqual(jobs['slices'].launched_at, jobs['stack'].finished_at)
+        self.assertGreaterEqual(jobs['aggregate'].launched_at,
+                                max(jobs['slices'].finished_at, jobs['thumbnails'].finished_at))
+        # Independent jobs run at the same time
+        self.assertLess(jobs['slices'].launched_at, jobs['thumbnails'].finished_at)
+        self.assertEqual([job.name for job in report.critical_path()][::2], ['stack', 'aggregate'])
+        self.assertIn('bbic_aggregate', self.fake.configs)
+        self.assertEqual(self.fake.sessions, {})
+        self.assertIn('Critical path:', str(report))
+
+    def test_failure_cancels_subtree(self):
+        workflow = self.job_launcher.workflow(self.monitor, retries=1)
+        workflow.add('stack', 'bbic_stack')
+        workflow.add('broken', 'broken', depends_on=['stack'])
+        workflow.add('downstream', 'bbic_downstream', depends_on=['broken'])
+        workflow.add('aggregate', 'bbic_aggregate', depends_on=['downstream', 'stack'])
+        workflow.add('independent', 'bbic_independent', depends_on=['stack'])
+        report = workflow.run(timeout=30)
+
+        self.assertEqual(report.states(), {'stack': NODE_COMPLETED, 'broken': NODE_FAILED,
+                                           'downstream': NODE_CANCELLED, 'aggregate': NODE_CANCELLED,
+                                           'independent': NODE_COMPLETED})
+        self.assertEqual(report.jobs['broken'].attempts, 2)
+        self.assertEqual(self.fake.sessions, {})
+
+    def test_failed_configuration_is_not_launched(self):
+        handle = self.fake.handle
+
+        def failing_handle(method, path, cookies, body, headers=None):
+            if method == 'POST' and isinstance(body, dict) and body.get('id') == 'bbic_missing':
+                return 500, 'Internal error', {}
+            return handle(method, path, cookies, body, headers)
+        self.fake.handle = failing_handle
+        workflow = self.job_launcher.workflow(self.monitor, retries=2)
+        workflow.add('stack', 'bbic_stack')
+        workflow.add('missing', self.job_launcher.create_renderer_payload(id='bbic_missing'), depends_on=['stack'])
+        workflow.add('aggregate', 'bbic_aggregate', depends_on=['missing'])
+        report = workflow.run(timeout=30)
+
+        self.assertEqual(report.states(), {'stack': NODE_COMPLETED, 'missing': NODE_FAILED,
+                                           'aggregate': NODE_CANCELLED})
+        self.assertEqual(report.jobs['missing'].attempts, 0)
+        self.assertIn('Internal error', report.jobs['missing'].error)
+        self.assertEqual(self.fake.requests['session_post'], 1)
+
+    def test_timeout_does_not_wait_for_launches(self):
+        self.fake.scheduling_delay = 1
+        workflow = self.job_launcher.workflow(self.monitor)
+        workflow.add('stack', 'bbic_stack')
+        workflow.add('slices', 'bbic_slices', depends_on=['stack'])
+        started = time.time()
+        report = workflow.run(timeout=.2)
+
+        self.assertLess(time.time() - started, .8)
+        self.assertEqual(report.states(), {'stack': NODE_CANCELLED, 'slices': NODE_CANCELLED})
+        # The session launched after the timeout is deallocated once it is running
+        expiry = time.time() + 5
+        while (self.fake.requests['session_post'] == 0 or self.fake.sessions) and time.time() < expiry:
+            time.sleep(.05)
+        self.assertEqual(self.fake.requests['session_post'], 1)
+        self.assertEqual(self.fake.sessions, {})
+
+    def test_invalid_dependencies(self):
+        workflow = self.job_launcher.workflow()
+        workflow.add('a', 'a', depends_on=['b'])
+        workflow.add('b', 'b', depends_on=['c'])
+        self.assertRaises(ValueError, workflow.run)
+        workflow.add('c', 'c', depends_on=['a'])
+        self.assertRaises(ValueError, workflow.run)
+        self.assertRaises(ValueError, workflow.add, 'a', 'a')
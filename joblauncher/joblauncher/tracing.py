@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Lifecycle tracing of launched jobs: one tree of timed spans per job, from the creation of its session
+to its teardown, written to JSON lines or Chrome trace files and aggregated into phase percentiles
+"""
+
+import collections
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import joblauncher.settings as settings
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_CHROME = 'chrome'
+
+
+class Span(object):
+    """ Timed phase of a job, with attributes and timestamped events such as session status transitions """
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'events')
+
+    def __init__(self, name, trace_id, span_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+        self.events = []
+
+    @property
+    def duration(self):
+        """ :return: seconds from the start to the end of the span, or None while it is open """
+        return None if self.end is None else self.end - self.start
+
+    def event(self, name, **attributes):
+        """ Records an instantaneous event during the span """
+        self.events.append((name, time.time(), attributes))
+
+    def to_dict(self):
+        """ :return: dict representation of the span, as written to JSON lines files """
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'events': [{'name': name, 'timestamp': timestamp, 'attributes': attributes}
+                       for name, timestamp, attributes in self.events],
+        }
+
+
+class Tracer(object):
+    """
+    Records the spans of launched jobs. Finished spans are kept in memory, up to a maximum number, for
+    report(), and appended to a JSON lines or Chrome trace file if a path is given. Starting a span
+    costs a single attribute check while disabled.
+    """
+
+    def __init__(self, enabled=False, path=None, format=FORMAT_JSONL, max_spans=settings.TRACING_MAX_SPANS):
+        """
+        :param enabled: whether spans are recorded
+        :param path: file the finished spans are appended to, None to keep them in memory only
+        :param format: FORMAT_JSONL for one span per line, or FORMAT_CHROME for the trace event format of
+        chrome://tracing and Perfetto
+        :param max_spans: number of the latest finished spans kept in memory
+        """
+        if format not in (FORMAT_JSONL, FORMAT_CHROME):
+            raise ValueError('Unknown trace format: ' + str(format))
+        self.enabled = enabled
+        self.path = path
+        self.format = format
+        self._spans = collections.deque(maxlen=max_spans)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_trace(self, name, **attributes):
+        """
+        Starts the root span of a job
+        :return: Span, or None while disabled
+        """
+        if not self.enabled:
+            return None
+        return Span(name, '%016x' % random.getrandbits(64), next(self._ids), None, attributes)
+
+    def start_span(self, name, parent, **attributes):
+        """
+        Starts a child span
+        :param parent: Span of the enclosing phase
+        :return: Span, or None while disabled or without parent
+        """
+        if parent is None or not self.enabled:
+            return None
+        return Span(name, parent.trace_id, next(self._ids), parent.span_id, attributes)
+
+    def finish(self, span, **attributes):
+        """
+        Ends a span and records it
+        :param span: Span returned by start_trace or start_span, ignored if None or already finished
+        :param attributes: attributes added to the span, e.g. its outcome
+        """
+        if span is None or span.end is not None:
+            return
+        span.end = time.time()
+        span.attributes.update(attributes)
+        with self._lock:
+            self._spans.append(span)
+            if self.path is not None:
+                self._write(span)
+
+    def spans(self):
+        """ :return: list of the finished spans kept in memory, oldest first """
+        with self._lock:
+            return list(self._spans)
+
+    def reset(self):
+        """ Forgets the finished spans kept in memory """
+        with self._lock:
+            self._spans.clear()
+
+    def report(self, percentiles=settings.TRACING_PERCENTILES):
+        """ :return: phase_report() of the finished spans kept in memory """
+        return phase_report([span.to_dict() for span in self.spans()], percentiles)
+
+    def _write(self, span):
+        if self.format == FORMAT_JSONL:
+            lines = [json.dumps(span.to_dict(), sort_keys=True)]
+        else:
+            lines = [json.dumps(event, sort_keys=True) + ',' for event in _chrome_events(span)]
+            if not os.path.exists(self.path) or not os.path.getsize(self.path):
+                # The closing bracket of the array is optional, so spans are appended as they finish
+                lines.insert(0, '[')
+        with open(self.path, 'a') as output:
+            output.write('\n'.join(lines) + '\n')
+
+
+def _chrome_events(span):
+    """ :return: trace events of a span, one row per job """
+    thread = int(span.trace_id[:8], 16) >> 1
+    events = [{'name': span.name, 'cat': 'joblauncher', 'ph': 'X', 'ts': span.start * 1e6,
+               'dur': span.duration * 1e6, 'pid': os.getpid(), 'tid': thread,
+               'args': dict(span.attributes, trace_id=span.trace_id, span_id=span.span_id,
+                            parent_id=span.parent_id)}]
+    for name, timestamp, attributes in span.events:
+        events.append({'name': name, 'cat': 'joblauncher', 'ph': 'i', 's': 't', 'ts': timestamp * 1e6,
+                       'pid': os.getpid(), 'tid': thread, 'args': attributes})
+    return events
+
+
+def read_spans(path):
+    """
+    Reads the spans of a JSON lines or Chrome trace file
+    :return: list of dicts holding at least the name and the duration in seconds of each span
+    """
+    with open(path) as trace:
+        text = trace.read().strip()
+    if not text.startswith('['):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not text.endswith(']'):
+        text = text.rstrip(',') + ']'
+    return [dict(event['args'], name=event['name'], start=event['ts'] / 1e6, duration=event['dur'] / 1e6)
+            for event in json.loads(text) if event.get('ph') == 'X']
+
+
+def phase_report(spans, percentiles=settings.TRACING_PERCENTILES):
+    """
+    Aggregates the durations of the spans of many jobs by phase
+    :param spans: dicts holding the name and the duration in seconds of each span
+    :param percentiles: percentiles reported for every phase
+    :return: dict mapping every phase to a dict holding its count, mean, max and 'p<percentile>' durations
+    """
+    durations = collections.defaultdict(list)
+    for span in spans:
+        if span.get('duration') is not None:
+            durations[span['name']].append(span['duration'])
+    report = {}
+    for name, samples in durations.items():
+        samples.sort()
+        phase = {'count': len(samples), 'mean': float(sum(samples)) / len(samples), 'max': samples[-1]}
+        for percentile in percentiles:
+            # Nearest-rank percentile
+            phase['p%g' % percentile] = samples[max(0, int(-(-percentile * len(samples) // 100)) - 1)]
+        report[name] = phase
+    return report
+
+
+_default_tracer = Tracer()
+
+
+def get_tracer():
+    """ Returns the tracer of the job lifecycles, disabled until enabled with enable_tracing() """
+    return _default_tracer
+
+
+def enable_tracing(enabled=True, path=None, format=FORMAT_JSONL):
+    """
+    Starts or stops tracing the lifecycle of every launched job
+    :param path: file the finished spans are appended to, None to keep them in memory only
+    :param format: FORMAT_JSONL or FORMAT_CHROME
+    :return: the Tracer
+    """
+    if format not in (FORMAT_JSONL, FORMAT_CHROME):
+        raise ValueError('Unknown trace format: ' + str(format))
+    _default_tracer.enabled = enabled
+    _default_tracer.path = path
+    _default_tracer.format = format
+    return _default_tracer
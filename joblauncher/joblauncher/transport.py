@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Pooled keep-alive HTTP transport shared by the resource allocators
+"""
+
+import threading
+
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+import joblauncher.settings as settings
+
+
+def _reject_cookie_policy():
+    """
+    Returns a cookie policy preventing a pooled session from remembering server cookies.
+    Cookies are owned by each allocator session and passed with every request.
+    """
+    try:
+        from cookielib import DefaultCookiePolicy
+    except ImportError:
+        from http.cookiejar import DefaultCookiePolicy
+
+    class _RejectCookiePolicy(DefaultCookiePolicy):
+        def set_ok(self, cookie, request):
+            return False
+    return _RejectCookiePolicy()
+
+
+class Transport(object):
+    """
+    Holds one pooled keep-alive requests.Session per host, so that repeated calls to the
+    JobManager and to the resource connectors reuse their TCP connections
+    """
+
+    def __init__(self,
+                 pool_connections=settings.HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+                 pool_block=settings.HTTP_POOL_BLOCK,
+                 timeout=(settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)):
+        """
+        :param pool_connections: number of connection pools cached by each host session
+        :param pool_maxsize: maximum number of keep-alive connections kept per host
+        :param pool_block: block when the pool is exhausted instead of opening extra connections
+        :param timeout: default (connect, read) timeout in seconds applied to every request
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        """
+        Returns the pooled session serving the host of the given URL
+        :param url: any URL on the target host
+        :return: requests.Session
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._create_session()
+                    self._sessions[key] = session
+        return session
+
+    def close(self):
+        """ Closes every pooled connection """
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+    def _create_session(self):
+        # Imported on first use, so that importing the package does not load requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        from requests.cookies import RequestsCookieJar
+
+        session = requests.Session()
+        session.cookies = RequestsCookieJar(policy=_reject_cookie_policy())
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Returns the transport shared by every allocator which was not given its own
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
+
+
+def set_transport(transport):
+    """
+    Replaces the shared transport, e.g. to change pool sizes or timeouts
+    :param transport: Transport instance, or None to recreate one with default settings
+    :return: the previous shared transport
+    """
+    global _default_transport
+    with _default_transport_lock:
+        previous = _default_transport
+        _default_transport = transport
+    return previous
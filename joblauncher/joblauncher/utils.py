@@ -28,12 +28,30 @@
 The visualizer is the remote rendering resource in charge of rendering datasets
 """
 
-import requests
-import pprint
 import sys
 import json
+import time
 from collections import OrderedDict
 
+from .errors import ConnectionFailedError, RequestTimeoutError
+from .metrics import get_metrics
+from .rate_limit import get_rate_limiter
+from .transport import get_transport
+
+if sys.version_info >= (3, 7):
+    # Plain dicts keep the key order of the document, so orjson can stand in for OrderedDict
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+else:
+    orjson = None
+
+try:
+    import simplejson as _json_decoder
+except ImportError:
+    _json_decoder = json
+
 
 HTTP_METHOD_PUT = 'PUT'
 HTTP_METHOD_GET = 'GET'
@@ -42,22 +60,65 @@ HTTP_METHOD_POST = 'POST'
 HTTP_STATUS_OK = 200
 
 
+def json_loads(data):
+    """
+    Decodes a JSON document with the fastest decoder installed, keeping the key order of objects
+    :param data: JSON document, as bytes or text
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return _json_decoder.loads(data, object_pairs_hook=OrderedDict)
+
+
 class Status(object):
     """
-    Holds the execution status of an HTTP request
+    Holds the execution status of an HTTP request. When created from a response body, the body is
+    kept raw and only decoded on first access to contents: JSON for 200 responses, text otherwise.
     """
-    def __init__(self, code, contents, cookies):
+    __slots__ = ('code', 'cookies', 'headers', '_contents', '_raw', '_encoding')
+
+    def __init__(self, code, contents, cookies, headers=None, raw=None, encoding=None):
         self.code = code
-        self.contents = contents
         self.cookies = cookies
+        self.headers = headers
+        self._contents = contents
+        self._raw = raw
+        self._encoding = encoding
+
+    @property
+    def contents(self):
+        if self._raw is not None:
+            raw = self._raw
+            if not raw:
+                self._contents = ''
+            elif self.code == HTTP_STATUS_OK:
+                self._contents = json_loads(raw)
+            else:
+                self._contents = raw.decode(self._encoding or 'utf-8', 'replace')
+            self._raw = None
+        return self._contents
+
+    @contents.setter
+    def contents(self, contents):
+        self._contents = contents
+        self._raw = None
+
+    @property
+    def raw(self):
+        """ Undecoded response body, or None if it was already decoded """
+        return self._raw
 
     def show_response(self):
+        import pprint
         pprint.pprint('HTTP status code: ' + str(self.code))
         pprint.pprint('Contents: ' + str(self.contents))
         pprint.pprint('Cookies:' + str(self.cookies))
 
 
-def http_request(method, url, body=None, command=None, cookies=None):
+def http_request(method, url, body=None, command=None, cookies=None, transport=None, timeout=None,
+                 headers=None):
     """
     Perform http requests to the given URL and return the applications' response
     :param method: the type of HTTP request, PUT or GET are supported
@@ -65,46 +126,110 @@ def http_request(method, url, body=None, command=None, cookies=None):
     :param body: optional body for PUT requests
     :param command: the type of HTTP command to be executed on the target app
     :param cookies: the cookies to add to the request header
+    :param transport: pooled Transport to send the request with, the shared one if None
+    :param timeout: (connect, read) timeout in seconds, the transport default if None
+    :param headers: optional additional request headers
     :return: JSON-encoded response of the request
     """
+    # Imported on first use, so that importing the package does not load requests
+    import requests
     full_url = url
     request = None
     if command is not None:
         full_url = full_url + command
+    if transport is None:
+        transport = get_transport()
+    if timeout is None:
+        timeout = transport.timeout
+    limiter = get_rate_limiter()
+    if limiter.enabled:
+        limiter.acquire(url, command)
+    metrics = get_metrics()
+    if metrics.enabled:
+        start = time.time()
     try:
+        session = transport.session(full_url)
+        options = {'cookies': cookies, 'timeout': timeout, 'headers': headers}
         if method == HTTP_METHOD_POST:
             if body == '':
-                request = requests.post(full_url, cookies=cookies)
+                request = session.post(full_url, **options)
             else:
-                request = requests.post(full_url, json=body, cookies=cookies)
+                request = session.post(full_url, json=body, **options)
         elif method == HTTP_METHOD_PUT:
             if body == '':
-                request = requests.put(full_url, cookies=cookies)
+                request = session.put(full_url, **options)
             else:
-                request = requests.put(full_url, json=body, cookies=cookies)
+                request = session.put(full_url, json=body, **options)
         elif method == HTTP_METHOD_GET:
-            request = requests.get(full_url, cookies=cookies)
+            request = session.get(full_url, **options)
             if request.status_code == 502:
+                if metrics.enabled:
+                    _observe(metrics, method, url, command, start, request)
+                if limiter.enabled:
+                    limiter.record(url, command, request.status_code)
+                request.close()
                 raise requests.exceptions.ConnectionError('Bad Gateway 502')
         elif method == HTTP_METHOD_DELETE:
             if body == '':
-                request = requests.delete(full_url, cookies=cookies)
-            else:
-                request = requests.delete(full_url, json=json.dumps(body), cookies=cookies)
-        js = ''
-        if request.content:
-            if request.status_code == 200:
-                js = request.json(object_pairs_hook=OrderedDict)
+                request = session.delete(full_url, **options)
             else:
-                js = request.text
-        response = Status(request.status_code, js, request.cookies)
+                request = session.delete(full_url, json=json.dumps(body), **options)
+        response = Status(request.status_code, None, request.cookies, request.headers,
+                          raw=request.content, encoding=request.encoding)
+        if metrics.enabled:
+            _observe(metrics, method, url, command, start, request)
+        if limiter.enabled:
+            limiter.record(url, command, request.status_code, request.headers)
+        # Releases the connection back to the pool of the transport
         request.close()
-    except requests.exceptions.ConnectionError:
-        raise Exception('ERROR: Failed to connect to Application, did you start it with the '
-                        '--zeroeq-http-server command line option?')
+    except requests.exceptions.ConnectionError as error:
+        if metrics.enabled and request is None:
+            _observe(metrics, method, url, command, start)
+        if limiter.enabled and request is None:
+            limiter.record(url, command)
+        raise ConnectionFailedError('ERROR: Failed to connect to Application, did you start it with the '
+                                    '--zeroeq-http-server command line option? ' + str(error), full_url,
+                                    False if isinstance(error, requests.exceptions.ConnectTimeout) else None)
+    except requests.exceptions.Timeout as error:
+        if metrics.enabled:
+            _observe(metrics, method, url, command, start)
+        if limiter.enabled:
+            limiter.record(url, command)
+        raise RequestTimeoutError('Request timed out: ' + str(error), full_url)
     return response
 
 
+def _observe(metrics, method, url, command, start, request=None):
+    """
+    Records a request in the metrics, labelled by the command or else the last segment of the URL
+    """
+    operation = command.strip('/') if command else url.rstrip('/').rsplit('/', 1)[-1]
+    if request is None:
+        metrics.observe(method, operation, 'error', time.time() - start)
+    else:
+        metrics.observe(method, operation, request.status_code, time.time() - start,
+                        len(request.request.body or ''), len(request.content))
+
+
+def parallel_map(function, items, max_parallel):
+    """
+    Applies a blocking function to many items on a pool of worker threads
+    :param function: the function to call for each item
+    :param items: list of items
+    :param max_parallel: maximum number of calls running at the same time
+    :return: list of results, in input order
+    """
+    if not items:
+        return []
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(max(1, min(max_parallel, len(items))))
+    try:
+        return pool.map(function, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def in_notebook():
     """
     Returns ``True`` if the module is running in IPython kernel,
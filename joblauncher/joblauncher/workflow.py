@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=R0801
+
+"""
+Workflows of jobs depending on each other, each job being launched as soon as its dependencies completed
+"""
+
+import logging
+import threading
+import time
+
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+import joblauncher.settings as settings
+from joblauncher.errors import ServiceError
+from joblauncher.status_monitor import StatusMonitor, EVENT_COMPLETED, EVENT_PROGRESS
+from joblauncher.utils import parallel_map, Status, HTTP_STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+NODE_PENDING = 'pending'
+NODE_LAUNCHING = 'launching'
+NODE_RUNNING = 'running'
+NODE_COMPLETED = 'completed'
+NODE_FAILED = 'failed'
+NODE_CANCELLED = 'cancelled'
+
+_FINAL_STATES = (NODE_COMPLETED, NODE_FAILED, NODE_CANCELLED)
+
+# Events of the workflow loop, next to the completed and failed events of the status monitor
+_EVENT_LAUNCHED = 'launched'
+
+
+class WorkflowJob(object):
+    """ Job of a workflow, with its dependencies, state and timings """
+
+    def __init__(self, name, renderer, depends_on, retries):
+        """
+        :param name: name of the job in the workflow
+        :param renderer: Job identifier, or renderer payload created when the workflow runs
+        :param depends_on: names of the jobs which have to complete first
+        :param retries: number of times the job is launched again after failing
+        """
+        self.name = name
+        self.renderer = renderer
+        self.depends_on = tuple(depends_on)
+        self.retries = retries
+        self.state = NODE_PENDING
+        self.attempts = 0
+        self.job = None
+        self.url = None
+        self.error = None
+        self.launched_at = None
+        self.running_at = None
+        self.finished_at = None
+
+    @property
+    def renderer_id(self):
+        return self.renderer['id'] if isinstance(self.renderer, dict) else self.renderer
+
+    def __repr__(self):
+        return 'WorkflowJob(%r, %s)' % (self.name, self.state)
+
+
+class WorkflowReport(object):
+    """ Final states and timings of the jobs of a workflow run """
+
+    def __init__(self, jobs, started, finished):
+        self.jobs = jobs
+        self.started = started
+        self.finished = finished
+
+    @property
+    def succeeded(self):
+        return all(job.state == NODE_COMPLETED for job in self.jobs.values())
+
+    def states(self):
+        """ :return: dict mapping the name of every job to its final state """
+        return dict((name, job.state) for name, job in self.jobs.items())
+
+    def critical_path(self):
+        """
+        Follows back, from the last job to complete, the dependency which completed last each time
+        :return: list of the WorkflowJobs which determined the duration of the workflow, first one first
+        """
+        completed = [job for job in self.jobs.values() if job.state == NODE_COMPLETED]
+        if not completed:
+            return []
+        path = [max(completed, key=lambda job: job.finished_at)]
+        while path[-1].depends_on:
+            path.append(max((self.jobs[name] for name in path[-1].depends_on), key=lambda job: job.finished_at))
+        return path[::-1]
+
+    def __str__(self):
+        lines = ['Workflow %s in %.1f s' % ('completed' if self.succeeded else 'failed',
+                                            self.finished - self.started)]
+        for name, job in sorted(self.jobs.items()):
+            lines.append('  %-20s %-10s attempts %d' % (name, job.state, job.attempts))
+        lines.append('Critical path:')
+        for job in self.critical_path():
+            lines.append('  %-20s queued %7.1f s, ran %7.1f s' % (
+                job.name, job.running_at - job.launched_at, job.finished_at - job.running_at))
+        return '\n'.join(lines)
+
+
+class Workflow(object):
+    """
+    Runs jobs declaring their dependencies: launches every job whose dependencies completed at the
+    same time, and launches dependents as soon as the status monitor reports their inputs complete.
+    A failed job is launched again up to its number of retries, after which the jobs depending on
+    it, directly or not, are cancelled.
+    """
+
+    def __init__(self, launcher, monitor=None, max_parallel=settings.DEFAULT_MAX_PARALLEL_LAUNCHES, retries=0,
+                 fail_fast=False):
+        """
+        :param launcher: JobLauncher whose allocation settings and transport the sessions use
+        :param monitor: StatusMonitor polling the running jobs, a private one if None
+        :param max_parallel: maximum number of jobs being launched or cancelled at the same time
+        :param retries: default number of times a failed job is launched again
+        :param fail_fast: cancel the whole workflow once a job failed for good
+        """
+        self.launcher = launcher
+        self.monitor = monitor
+        self.max_parallel = max_parallel
+        self.retries = retries
+        self.fail_fast = fail_fast
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._cleanup = None
+
+    def add(self, name, renderer, depends_on=(), retries=None):
+        """
+        Adds a job to the workflow
+        :param name: name of the job in the workflow
+        :param renderer: Job identifier, or renderer payload created when the workflow runs
+        :param depends_on: names of the jobs which have to complete first
+        :param retries: number of times the job is launched again after failing, the workflow default if None
+        :return: WorkflowJob
+        """
+        if name in self.jobs:
+            raise ValueError('Duplicate workflow job: ' + name)
+        job = WorkflowJob(name, renderer, depends_on, self.retries if retries is None else retries)
+        self.jobs[name] = job
+        return job
+
+    def run(self, timeout=None):
+        """
+        Runs the workflow until every job completed, failed or was cancelled
+        :param timeout: seconds after which the remaining jobs are cancelled, never if None
+        :return: WorkflowReport
+        """
+        from multiprocessing.pool import ThreadPool
+        self._check()
+        monitor = self.monitor or StatusMonitor(self.launcher._transport)
+        # Launches may wait long for their allocation, deallocations get their own threads
+        pool = ThreadPool(max(1, self.max_parallel))
+        self._cleanup = ThreadPool(max(1, self.max_parallel))
+        self._cancelled = False
+        events = Queue()
+        started = time.time()
+        expiry = None if timeout is None else started + timeout
+        timed_out = False
+        try:
+            configured = [job for job in self.jobs.values() if isinstance(job.renderer, dict)]
+            statuses = parallel_map(self._create_config, [job.renderer for job in configured], self.max_parallel)
+            for job, status in zip(configured, statuses):
+                if status.code not in (HTTP_STATUS_OK, 201, 409) and job.state not in _FINAL_STATES:
+                    # Launching the job would fail as many times as it is retried
+                    self._abandon(job, status.contents)
+
+            self._launch_ready(pool, events)
+            while any(job.state not in _FINAL_STATES for job in self.jobs.values()):
+                try:
+                    remaining = None if expiry is None else max(0, expiry - time.time())
+                    event, job, attempt, details = events.get(timeout=remaining)
+                except Empty:
+                    logger.info('Workflow timed out, cancelling the remaining jobs')
+                    timed_out = True
+                    self._cancel(self.jobs.values())
+                    break
+                if attempt != job.attempts or job.state in _FINAL_STATES:
+                    # Outcome of a cancelled launch, or of an earlier attempt
+                    if event == _EVENT_LAUNCHED and details.launch_status.code == 200:
+                        self._deallocate(details)
+                    continue
+                self._handle(event, job, details, monitor, pool, events)
+        finally:
+            for job in self.jobs.values():
+                if job.url is not None:
+                    monitor.untrack(job.url)
+            if self.monitor is None:
+                monitor.stop()
+            if timed_out:
+                # Pending launches are dropped, and the running ones deallocate their session themselves
+                with self._lock:
+                    self._cancelled = True
+                pool.terminate()
+            else:
+                pool.close()
+                pool.join()
+            # Launches which returned after the workflow was cancelled
+            while not events.empty():
+                event, _, _, details = events.get()
+                if event == _EVENT_LAUNCHED and details.launch_status.code == 200:
+                    self._deallocate(details)
+            self._cleanup.close()
+            self._cleanup.join()
+        return WorkflowReport(self.jobs, started, time.time())
+
+    def _check(self):
+        """ Checks that every dependency exists and that the dependencies hold no cycle """
+        for job in self.jobs.values():
+            for name in job.depends_on:
+                if name not in self.jobs:
+                    raise ValueError('Unknown dependency %s of workflow job %s' % (name, job.name))
+        visited = set()
+        for name in self.jobs:
+            stack = [(name, iter(self.jobs[name].depends_on))]
+            path_set = set([name])
+            while stack:
+                current, dependencies = stack[-1]
+                dependency = next(dependencies, None)
+                if dependency is None:
+                    visited.add(current)
+                    path_set.discard(current)
+                    stack.pop()
+                elif dependency in path_set:
+                    raise ValueError('Workflow dependencies hold a cycle through ' + dependency)
+                elif dependency not in visited:
+                    path_set.add(dependency)
+                    stack.append((dependency, iter(self.jobs[dependency].depends_on)))
+
+    def _handle(self, event, job, details, monitor, pool, events):
+        if event == _EVENT_LAUNCHED:
+            job.job = details
+            if details.launch_status.code != 200:
+                self._failed(job, details.launch_status.contents, pool, events)
+                return
+            job.state = NODE_RUNNING
+            job.running_at = time.time()
+            # Sessions are deallocated from the thread pool, tracking is stopped by URL
+            job.url = details.launched_job_url
+            attempt = job.attempts
+            monitor.track(details, lambda status, monitor_event: monitor_event != EVENT_PROGRESS and events.put(
+                (monitor_event, job, attempt, status)))
+        elif event == EVENT_COMPLETED:
+            job.state = NODE_COMPLETED
+            job.finished_at = time.time()
+            monitor.untrack(job.url)
+            self._deallocate(job.job)
+            self._launch_ready(pool, events)
+        else:
+            monitor.untrack(job.url)
+            self._deallocate(job.job)
+            self._failed(job, details.error, pool, events)
+
+    def _failed(self, job, error, pool, events):
+        job.error = error
+        if job.attempts <= job.retries:
+            logger.info('Workflow job %s failed, launching it again: %s' % (job.name, error))
+            self._launch(job, pool, events)
+            return
+        self._abandon(job, error)
+
+    def _abandon(self, job, error):
+        """ Fails a job for good, and cancels the jobs depending on it, or the whole workflow if failing fast """
+        logger.info('Workflow job %s failed: %s' % (job.name, error))
+        job.error = error
+        job.state = NODE_FAILED
+        job.finished_at = time.time()
+        if self.fail_fast:
+            self._cancel(self.jobs.values())
+        else:
+            self._cancel(self._dependents(job.name))
+
+    def _dependents(self, name):
+        """ Returns the jobs depending on a job, directly or not """
+        dependents = []
+        names = set([name])
+        changed = True
+        while changed:
+            changed = False
+            for job in self.jobs.values():
+                if job.name not in names and names.intersection(job.depends_on):
+                    names.add(job.name)
+                    dependents.append(job)
+                    changed = True
+        return dependents
+
+    def _cancel(self, jobs):
+        for job in jobs:
+            if job.state in _FINAL_STATES:
+                continue
+            if job.state == NODE_RUNNING:
+                self._deallocate(job.job)
+            # Launching jobs are deallocated once their launch returns
+            job.state = NODE_CANCELLED
+            job.finished_at = time.time()
+
+    def _launch_ready(self, pool, events):
+        for job in self.jobs.values():
+            if job.state == NODE_PENDING and \
+                    all(self.jobs[name].state == NODE_COMPLETED for name in job.depends_on):
+                self._launch(job, pool, events)
+
+    def _launch(self, job, pool, events):
+        job.state = NODE_LAUNCHING
+        job.attempts += 1
+        job.launched_at = time.time()
+        attempt = job.attempts
+        queue = job.renderer.get('queue', self.launcher._queue) if isinstance(job.renderer, dict) \
+            else self.launcher._queue
+        pool.apply_async(self._launch_session, (job, attempt, queue, events))
+
+    def _create_config(self, payload):
+        try:
+            return self.launcher.config_create(payload)
+        except Exception as error:
+            logger.info('Failed to create the job settings: ' + str(error))
+            if isinstance(error, ServiceError):
+                return error.status
+            return Status(400, str(error), '')
+
+    def _launch_session(self, job, attempt, queue, events):
+        if self._cancelled:
+            return
+        launched = self.launcher.launch_session(job.renderer_id, queue)
+        with self._lock:
+            if not self._cancelled:
+                events.put((_EVENT_LAUNCHED, job, attempt, launched))
+                return
+        # The workflow timed out while the job was being launched
+        if launched.launch_status.code == 200:
+            launched.deallocate_and_cancel_job()
+
+    def _deallocate(self, job):
+        self._cleanup.apply_async(job.deallocate_and_cancel_job)
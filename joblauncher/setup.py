@@ -19,6 +19,9 @@ setup(name='joblauncher',
       license='GNU LGPL',
       packages=['joblauncher'],
       install_requires=requirements,
+      entry_points={
+          'console_scripts': ['joblauncher = joblauncher.cli:main'],
+      },
       test_suite='nose.collector',
       tests_require=['nose'],
       )
\ No newline at end of file